@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the diskgraph utility. Run the individual modules, e.g.:
+
+python -m bench.sgraph_bench
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Benchmark comparing the streaming DOT writer (DiskGraph.writedot) with building
+a pydot graph and serializing it (DiskGraph.todot().to_string()).
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+from cStringIO import StringIO
+from diskgraph.diskgraph import DiskGraph, pydot
+from diskgraph.sysinfo import SysInfo
+from bench.objects import made_up_objects
+from bench.measure import timed
+
+SIZES = [1000, 10000, 50000]
+
+def run(sizes=SIZES, out=sys.stdout):
+    out.write("%10s %12s %12s %10s\n" % ("nodes", "writedot (s)", "pydot (s)", "speedup"))
+    for size in sizes:
+        dg = DiskGraph(SysInfo.from_objects(made_up_objects(size)))
+        native = timed(lambda: dg.writedot(StringIO()))
+        if pydot is None:
+            out.write("%10d %12.4f %12s %10s\n" % (dg.order, native, "-", "-"))
+            continue
+        viapydot = timed(lambda: dg.todot().to_string())
+        out.write("%10d %12.4f %12.4f %9.1fx\n" % (dg.order, native, viapydot, viapydot / native))
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of merging the snapshots of many hosts into one graph, with
+different numbers of worker processes. Each host gets a snapshot of a small
+synthetic topology.
+
+Usage: python -m bench.fleet_bench [hosts]
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+from diskgraph.sysinfo import SysInfo
+from diskgraph import snapshot
+from diskgraph.fleet import load_fleet
+from bench.synthetic import Topology
+
+HOSTS = 500
+
+def run(hosts=HOSTS, out=sys.stdout):
+    tmp = tempfile.mkdtemp()
+    try:
+        sysinfo = SysInfo(Topology().collectors())
+        for i in range(hosts):
+            snapshot.save(sysinfo, os.path.join(tmp, "host%03d.json.gz" % i))
+        cpus = multiprocessing.cpu_count()
+        out.write("%d hosts, %d objects each, %d CPUs\n" % (hosts, len(sysinfo.objects), cpus))
+        out.write("%10s %12s %10s %10s\n" % ("processes", "load (s)", "vertices", "speedup"))
+        single = None
+        processes = 1
+        while processes <= cpus:
+            start = time.time()
+            fg = load_fleet(tmp, processes)
+            elapsed = time.time() - start
+            single = single or elapsed
+            out.write("%10d %12.3f %10d %9.1fx\n" % (processes, elapsed, fg.order, single / elapsed))
+            processes *= 2
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of I/O load sampling on a large synthetic topology: the time to
+parse /proc/diskstats, compute the rates and aggregate them over the graph,
+which is what each sample costs in watch mode.
+
+Usage: python -m bench.iostats_bench [scale]
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+import time
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import SysInfo
+from diskgraph.iostats import Sampler, parse_diskstats
+from bench.synthetic import Topology
+from bench.suite import SCALES
+
+ROUNDS = 5
+
+def run(scale="large", out=sys.stdout):
+    topology = Topology(**SCALES[scale])
+    dg = DiskGraph(SysInfo(topology.collectors(), timeout=None))
+    readings = [topology.proc_diskstats(tick) for tick in range(ROUNDS + 1)]
+    clock = iter(range(ROUNDS + 1)).next
+    sampler = Sampler(1, read=lambda: parse_diskstats(readings.pop(0)), clock=clock, sleep=lambda s: None)
+    out.write("%d nodes, %d devices in diskstats\n" % (dg.order, len(parse_diskstats(readings[0]))))
+    for _ in range(ROUNDS):
+        start = time.time()
+        stats = sampler.sample()
+        sampled = time.time()
+        dg.set_iostats(stats, sampler.names)
+        io = dg.io()
+        done = time.time()
+        out.write("sample %7.2f ms, aggregate %7.2f ms, %d nodes with figures\n" %
+                  ((sampled - start) * 1000, (done - sampled) * 1000, len(io)))
+
+if __name__ == "__main__":
+    run(*sys.argv[1:])
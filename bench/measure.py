@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Helpers for timing the code under benchmark, shared by the benchmarks.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import time
+
+def timed(fn):
+    """Return the time of running fn once, in seconds."""
+    start = time.time()
+    fn()
+    return time.time() - start
+
+def best_of(fn, rounds):
+    """Return the smallest time of running fn rounds times, and the result of
+    the last run."""
+    times = []
+    for _ in range(rounds):
+        start = time.time()
+        result = fn()
+        times.append(time.time() - start)
+    return min(times), result
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Report of the memory used by the objects of made-up object pools, per object
+and per type. Sizes are those of the objects themselves plus everything they
+own (attribute dicts, strings, tuples), counting shared values only once.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+from bench.objects import made_up_objects
+
+SIZES = [1000, 10000, 100000]
+
+def attributes(obj):
+    values = list(getattr(obj, "__dict__", {}).values())
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            if hasattr(obj, name):
+                values.append(getattr(obj, name))
+    return values
+
+def value_size(value, seen):
+    if id(value) in seen or value is None or isinstance(value, bool):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(value_size(v, seen) for v in value)
+    return size
+
+def deep_size(objects, seen):
+    """Return the size of the given objects and the values they own, skipping
+    anything in seen (which is updated)."""
+    size = 0
+    for obj in objects:
+        size += sys.getsizeof(obj)
+        if hasattr(obj, "__dict__"):
+            size += sys.getsizeof(obj.__dict__)
+        size += sum(value_size(v, seen) for v in attributes(obj))
+    return size
+
+def run(out=sys.stdout):
+    out.write("%10s %14s %14s\n" % ("objects", "total (kB)", "per object (B)"))
+    for count in SIZES:
+        objects = made_up_objects(count)
+        for o in objects:
+            str(o)
+        size = deep_size(objects, set())
+        out.write("%10d %14.0f %14.1f\n" % (len(objects), size / 1024.0, float(size) / len(objects)))
+    out.write("\n%-20s %14s\n" % ("type", "per object (B)"))
+    by_type = {}
+    for o in made_up_objects(SIZES[0]):
+        by_type.setdefault(o.__class__.__name__, []).append(o)
+    seen = set()
+    for name in sorted(by_type):
+        objects = by_type[name]
+        out.write("%-20s %14.1f\n" % (name, float(deep_size(objects, seen)) / len(objects)))
+
+if __name__ == "__main__":
+    run()
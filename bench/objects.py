@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""Made-up object pools for the benchmarks.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+from diskgraph.sysinfo import *
+
+def made_up_objects(count):
+    """Return about count objects: disks with a partition each, holding PVs of a
+    volume group with one LV and file system per disk."""
+    disks = max(1, count // 5)
+    objects = []
+    for i in range(disks):
+        objects += [Partition(["8", str(i * 16), "1048576", "sd%d" % i], whole_disk=True),
+                    Partition(["8", str(i * 16 + 1), "1048000", "sd%dp1" % i], whole_disk=False,
+                              disk_name="sd%d" % i),
+                    LvmPhysicalVolume(["/dev/sd%dp1" % i, "1073152000"]),
+                    LvmLogicalVolume(["lv%d" % i, "vg", "1073152000"]),
+                    MountedFileSystem(["/dev/mapper/vg-lv%d" % i, "1073152000", "0", "0", "0%", "/srv/%d" % i])]
+    objects.append(LvmVolumeGroup(["vg", str(disks * 1073152000), ["/dev/sd%dp1" % i for i in range(disks)], "0"]))
+    return objects
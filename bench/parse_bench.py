@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of parsing /proc/partitions, /proc/swaps and /proc/mdstat, using
+synthetic files with a large number of entries.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+from diskgraph.sysinfo import *
+from bench.measure import best_of
+from bench.synthetic import disk_name
+
+ENTRIES = 50000
+ROUNDS = 5
+
+def partitions_text(count):
+    """A /proc/partitions with count entries: disks with one partition each."""
+    lines = ["major minor  #blocks  name", ""]
+    for i in range(count // 2):
+        disk = disk_name(i)
+        lines.append("%4d %7d %10d %s" % (8, i * 16, 1048576, disk))
+        lines.append("%4d %7d %10d %s1" % (8, i * 16 + 1, 1048000, disk))
+    return "\n".join(lines) + "\n"
+
+def swaps_text(count):
+    lines = ["Filename\t\t\t\tType\t\tSize\tUsed\tPriority"]
+    lines += ["/dev/sd%d\t\t\t\tpartition\t497660\t0\t-%d" % (i, i) for i in range(count)]
+    return "\n".join(lines) + "\n"
+
+def mdstat_text(count):
+    lines = ["Personalities : [raid1] [raid6] [raid5] [raid4]"]
+    for i in range(count):
+        lines.append("md%d : active raid1 sd%da1[1] sd%db1[0] sd%dc1[2](F)" % (i, i, i, i))
+        lines.append("      244195904 blocks [2/2] [UU]")
+        lines.append("")
+    lines.append("unused devices: <none>")
+    return "\n".join(lines) + "\n"
+
+def run(out=sys.stdout, entries=ENTRIES):
+    out.write("%-18s %10s %12s %14s\n" % ("file", "entries", "parse (s)", "per entry (us)"))
+    for name, text, parse in [("/proc/partitions", partitions_text(entries), Partition.parse),
+                              ("/proc/swaps", swaps_text(entries), SwapArea.parse),
+                              ("/proc/mdstat", mdstat_text(entries), RaidArray.parse)]:
+        count = len(parse(text))
+        elapsed, _ = best_of(lambda: parse(text), ROUNDS)
+        out.write("%-18s %10d %12.4f %14.2f\n" % (name, count, elapsed, elapsed * 1e6 / count))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of device queries on a large synthetic topology: the time to build
+the lookup index, and the time per query in each direction.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+import time
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import SysInfo
+from diskgraph.query import DeviceIndex, ABOVE, BELOW
+from bench.synthetic import Topology
+from bench.suite import SCALES
+
+def run(scale="large", out=sys.stdout):
+    topology = Topology(**SCALES[scale])
+    dg = DiskGraph(SysInfo(topology.collectors(), timeout=None))
+    start = time.time()
+    index = DeviceIndex(dg)
+    out.write("%d nodes, index built in %.3fs\n" % (dg.order, time.time() - start))
+    specs = [("disk", topology.disks[0], [ABOVE]),
+             ("mount point", "/srv/lv0", [BELOW]),
+             ("major:minor", "8:1", [ABOVE, BELOW]),
+             ("LV", "/dev/mapper/vg0-lv0", [ABOVE, BELOW])]
+    for what, spec, directions in specs:
+        start = time.time()
+        result = index.query(spec, directions)
+        elapsed = time.time() - start
+        out.write("%-12s %-22s %6d nodes %8.2f ms\n" %
+                  (what, spec, sum(len(result[d]) for d in directions), elapsed * 1000))
+
+if __name__ == "__main__":
+    run(*sys.argv[1:])
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of rolling up figures over graphs of increasing size, where many
+disks with free space hold the PVs of one volume group with many LVs. Every
+disk reaches all the file systems of the VG, so a rollup that is not linear
+in the size of the graph shows up as a growing time per node.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import *
+from diskgraph.rollup import rollup
+from bench.measure import timed
+
+SIZES = [(10, 100), (100, 1000), (1000, 10000)]
+
+def shared_vg_objects(disks, lvs):
+    """Return disks with a partition each that leaves some space free, the
+    partitions being PVs of one volume group with lvs LVs, each with a mounted
+    file system."""
+    objects = []
+    for i in range(disks):
+        objects += [Partition(["8", str(i * 16), "1048576", "sd%d" % i], whole_disk=True),
+                    Partition(["8", str(i * 16 + 1), "1048000", "sd%dp1" % i], whole_disk=False,
+                              disk_name="sd%d" % i),
+                    LvmPhysicalVolume(["/dev/sd%dp1" % i, "1073152000"])]
+    lv_size = disks * 1073152000 // (lvs + 1)
+    for i in range(lvs):
+        objects += [LvmLogicalVolume(["lv%d" % i, "vg", str(lv_size)]),
+                    MountedFileSystem(["/dev/mapper/vg-lv%d" % i, str(lv_size), str(lv_size // 2), "0", "50%",
+                                       "/srv/%d" % i])]
+    objects.append(LvmVolumeGroup(["vg", str(disks * 1073152000), ["/dev/sd%dp1" % i for i in range(disks)],
+                                   str(lv_size)]))
+    return objects
+
+def run(out=sys.stdout):
+    out.write("%8s %8s %8s %12s %14s\n" % ("disks", "LVs", "nodes", "rollup (s)", "per node (us)"))
+    for disks, lvs in SIZES:
+        dg = DiskGraph(SysInfo.from_objects(shared_vg_objects(disks, lvs)))
+        elapsed = timed(lambda: rollup(dg))
+        out.write("%8d %8d %8d %12.4f %14.2f\n" % (disks, lvs, dg.order, elapsed, elapsed * 1e6 / dg.order))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark for SimpleGraph. Builds graphs shaped like a disk graph (a root
+with a number of disks, each disk having a few partitions, and every other
+partition shared by a RAID-like vertex) and times building and traversing them at
+increasing sizes. The time per vertex should stay flat as the graph grows.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import sys
+from diskgraph.sgraph import SimpleGraph
+from bench.measure import timed
+
+SIZES = [10, 100, 1000, 10000, 100000]
+
+def make_adjacency(order):
+    """Return (root, adjacency) for a graph with roughly the given order."""
+    adj = {0: []}
+    v = 1
+    while v < order:
+        disk = v
+        adj[0].append(disk)
+        adj[disk] = [disk + 1, disk + 2, disk + 3]
+        adj[disk + 1] = [disk + 4]
+        adj[disk + 2] = [disk + 4]
+        adj[disk + 3] = []
+        adj[disk + 4] = []
+        v += 5
+    return 0, adj
+
+def run(sizes=SIZES, out=sys.stdout):
+    out.write("%10s %10s %12s %12s %12s %12s\n" % ("vertices", "edges", "build (s)", "visit (s)",
+                                                   "edges (s)", "us/vertex"))
+    for size in sizes:
+        root, adj = make_adjacency(size)
+        graph = []
+        build = timed(lambda: graph.append(SimpleGraph(adj.__getitem__, root)))
+        g = graph[0]
+        visit = timed(lambda: sum(1 for _ in g.visit(root)))
+        edges = timed(lambda: sum(1 for _ in g.visitEdges(root)))
+        nedges = sum(len(heads) for heads in adj.itervalues())
+        total = build + visit + edges
+        out.write("%10d %10d %12.4f %12.4f %12.4f %12.2f\n" % (g.order, nedges, build, visit, edges,
+                                                              total * 1e6 / g.order))
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or SIZES)
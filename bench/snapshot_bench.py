@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Benchmark comparing live collection (SysInfo with the default collectors, on
+the current machine) with loading the same information from a snapshot, plus the
+time to save and load snapshots of larger, made-up object pools.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import sys
+import shutil
+import tempfile
+from diskgraph.sysinfo import *
+from diskgraph import snapshot
+from bench.objects import made_up_objects
+from bench.measure import best_of
+
+SIZES = [100, 1000, 10000]
+ROUNDS = 5
+
+def run(out=sys.stdout):
+    tmp = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmp, "live.json")
+        sysinfo = SysInfo()
+        snapshot.save(sysinfo, fn)
+        live, _ = best_of(SysInfo, ROUNDS)
+        load, _ = best_of(lambda: snapshot.load(fn), ROUNDS)
+        out.write("This machine (%d objects): live collection %.4fs, snapshot load %.4fs (%.0fx)\n\n" %
+                  (len(sysinfo.objects), live, load, live / max(load, 1e-9)))
+        out.write("%10s %12s %12s %12s %12s\n" % ("objects", "save (s)", "load (s)", "save gz (s)", "load gz (s)"))
+        for size in SIZES:
+            made_up = SysInfo.from_objects(made_up_objects(size))
+            times = []
+            for name in ("made_up.json", "made_up.json.gz"):
+                fn = os.path.join(tmp, name)
+                times.append(best_of(lambda: snapshot.save(made_up, fn), ROUNDS)[0])
+                times.append(best_of(lambda: snapshot.load(fn), ROUNDS)[0])
+            out.write("%10d %12.4f %12.4f %12.4f %12.4f\n" % tuple([len(made_up.objects)] + times))
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    run()
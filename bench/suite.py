@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite that times the stages of producing a graph, one at a time,
+on synthetic topologies of increasing size:
+
+    parse     - SysInfo, running collectors that parse generated text
+    build     - DiskGraph
+    traverse  - visitEdges from the root
+    rollup    - rollup of the figures of every node
+    writedot  - DiskGraph.writedot
+    todot     - DiskGraph.todot, if pydot is installed
+
+The results are written as JSON, so that runs on different commits can be
+compared. Usage:
+
+    python -m bench.suite [--scale small|medium|large ...] [--rounds N] [--output FILE]
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from cStringIO import StringIO
+from diskgraph.diskgraph import DiskGraph, pydot
+from diskgraph.sysinfo import SysInfo
+from diskgraph.rollup import rollup
+from bench.synthetic import Topology
+from bench.measure import best_of
+
+SCALES = {
+    "small": dict(disks=16, partitions=3, raid_sets=4, vgs=2, lvs=100, swaps=2),
+    "medium": dict(disks=256, partitions=4, raid_sets=32, vgs=8, lvs=2000, swaps=8),
+    "large": dict(disks=2048, partitions=4, raid_sets=256, vgs=32, lvs=20000, swaps=16),
+}
+ROUNDS = 3
+
+def time_stages(topology, rounds=ROUNDS):
+    """Time each stage on the given topology. Return a dict with the time of
+    each stage in seconds and the sizes of the result."""
+    collectors = topology.collectors()
+    stages = {}
+    stages["parse"], sysinfo = best_of(lambda: SysInfo(collectors, timeout=None), rounds)
+    stages["build"], dg = best_of(lambda: DiskGraph(sysinfo), rounds)
+    stages["traverse"], edges = best_of(lambda: list(dg.visitEdges(dg.root)), rounds)
+    stages["rollup"], _ = best_of(lambda: rollup(dg), rounds)
+    stages["writedot"], _ = best_of(lambda: dg.writedot(StringIO()), rounds)
+    if pydot is not None:
+        stages["todot"], _ = best_of(lambda: dg.todot().to_string(), rounds)
+    return {"objects": len(sysinfo.objects), "vertices": dg.order, "edges": len(edges), "seconds": stages}
+
+def git_commit():
+    try:
+        with open("/dev/null", "w") as devnull:
+            return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(scales, rounds=ROUNDS):
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "created": time.time(),
+        "rounds": rounds,
+        "scales": {},
+    }
+    for name in scales:
+        result = time_stages(Topology(**SCALES[name]), rounds)
+        result["topology"] = SCALES[name]
+        results["scales"][name] = result
+    return results
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Time the stages of building a disk graph.")
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES),
+                        help="Topology size (may be repeated; default small and medium)")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="Runs per stage; the best time is kept")
+    parser.add_argument("--output", help="File to write the JSON results to (default stdout)")
+    return parser.parse_args(args)
+
+def main(args):
+    results = run(args.scale or ["small", "medium"], args.rounds)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main(parse_args(sys.argv[1:]))
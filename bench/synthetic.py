@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Generator of synthetic but realistic system information at a configurable
+scale: the contents of /proc/partitions, /proc/mdstat, /proc/swaps and
+/proc/diskstats and the output of pvs, vgs, lvs and df, in the formats the
+collectors parse.
+
+The topology is: disks with a number of partitions each. The first partition
+of the first disks are paired into RAID 1 arrays, the arrays and the second
+partition of every disk are LVM physical volumes, spread over the volume groups,
+which hold the logical volumes. Every logical volume has a mounted file system,
+and the last partition of some disks is a swap area.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+from diskgraph.sysinfo import *
+
+__all__ = ["Topology", "SyntheticCollector", "disk_name"]
+
+BLOCK_SIZE = 1024
+DISK_BLOCKS = 1953514584        # a 2 TB disk
+
+def disk_name(i):
+    """Return the kernel name of the i:th SCSI disk: sda to sdz, then sdaa and
+    so on."""
+    letters = ""
+    i += 1
+    while i > 0:
+        i, rem = divmod(i - 1, 26)
+        letters = chr(ord("a") + rem) + letters
+    return "sd" + letters
+
+class SyntheticCollector(object):
+    """A collector that parses a piece of generated text, so that SysInfo can
+    be run on a synthetic topology."""
+    def __init__(self, name, parse, text):
+        self.__name__ = name
+        self.parse = parse
+        self.text = text
+
+    def generate(self):
+        return self.parse(self.text)
+
+class Topology(object):
+    def __init__(self, disks=16, partitions=3, raid_sets=4, vgs=2, lvs=100, swaps=2):
+        self.disks = [disk_name(i) for i in range(disks)]
+        self.partitions = max(2, partitions)
+        self.raid_sets = min(raid_sets, disks // 2)
+        self.vgs = ["vg%d" % i for i in range(max(1, vgs))]
+        self.lvs = lvs
+        self.swaps = min(swaps, disks) if self.partitions > 2 else 0
+        self.partition_blocks = DISK_BLOCKS // self.partitions
+
+    def partition_names(self, disk):
+        return ["%s%d" % (disk, n) for n in range(1, self.partitions + 1)]
+
+    def raid_arrays(self):
+        """Return a list of (name, member partition names)."""
+        return [("md%d" % i, ["%s1" % self.disks[2 * i], "%s1" % self.disks[2 * i + 1]])
+                for i in range(self.raid_sets)]
+
+    def physical_volumes(self):
+        """Return a list of (name, byte size, VG name)."""
+        size = self.partition_blocks * BLOCK_SIZE
+        names = [name for name, _ in self.raid_arrays()] + ["%s2" % disk for disk in self.disks]
+        return [("/dev/%s" % name, size, self.vgs[i % len(self.vgs)]) for i, name in enumerate(names)]
+
+    def volume_groups(self):
+        """Return a list of (name, byte size, PV names, LV names)."""
+        pvs = self.physical_volumes()
+        result = []
+        for i, vg in enumerate(self.vgs):
+            pv_names = [name for name, _, owner in pvs if owner == vg]
+            size = sum(size for _, size, owner in pvs if owner == vg)
+            lv_names = ["lv%d" % n for n in range(i, self.lvs, len(self.vgs))]
+            result.append((vg, size, pv_names, lv_names))
+        return result
+
+    def lv_size(self, vg_size, lv_count):
+        return vg_size // (lv_count + 1)
+
+    def proc_partitions(self):
+        lines = ["major minor  #blocks  name", ""]
+        for i, disk in enumerate(self.disks):
+            minor = (i * 16) % 256
+            lines.append("%4d %7d %10d %s" % (8 + i * 16 // 256, minor, DISK_BLOCKS, disk))
+            for n, name in enumerate(self.partition_names(disk)):
+                lines.append("%4d %7d %10d %s" % (8 + i * 16 // 256, minor + n + 1, self.partition_blocks, name))
+        for i, (name, _) in enumerate(self.raid_arrays()):
+            lines.append("%4d %7d %10d %s" % (9, i, self.partition_blocks, name))
+        return "\n".join(lines) + "\n"
+
+    def proc_mdstat(self):
+        lines = ["Personalities : [raid1]"]
+        for name, members in self.raid_arrays():
+            lines.append("%s : active raid1 %s" % (name, " ".join("%s[%d]" % (m, i) for i, m in enumerate(members))))
+            lines.append("      %d blocks super 1.2 [2/2] [UU]" % self.partition_blocks)
+            lines.append("")
+        lines.append("unused devices: <none>")
+        return "\n".join(lines) + "\n"
+
+    def proc_swaps(self):
+        lines = ["Filename\t\t\t\tType\t\tSize\tUsed\tPriority"]
+        lines += ["/dev/%s%d\t\t\t\tpartition\t%d\t0\t-%d" % (disk, self.partitions, self.partition_blocks, i + 2)
+                  for i, disk in enumerate(self.disks[:self.swaps])]
+        return "\n".join(lines) + "\n"
+
+    def pvs_output(self):
+        return "".join("  %s %d\n" % (name, size) for name, size, _ in self.physical_volumes())
+
+    def vgs_output(self):
+        lines = []
+        for name, size, pv_names, lv_names in self.volume_groups():
+            free = size - self.lv_size(size, len(lv_names)) * len(lv_names)
+            lines += ["  %s %d %s %d\n" % (name, size, pv, free) for pv in pv_names]
+        return "".join(lines)
+
+    def lvs_output(self):
+        lines = []
+        for name, size, _, lv_names in self.volume_groups():
+            lines += ["  %s %s %d\n" % (lv, name, self.lv_size(size, len(lv_names))) for lv in lv_names]
+        return "".join(lines)
+
+    def df_output(self):
+        lines = ["Filesystem     1B-blocks      Used Available Capacity Mounted on"]
+        for name, size, _, lv_names in self.volume_groups():
+            lv_size = self.lv_size(size, len(lv_names))
+            lines += ["/dev/mapper/%s-%s %d %d %d 50%% /srv/%s" % (name, lv, lv_size, lv_size // 2, lv_size // 2, lv)
+                      for lv in lv_names]
+        return "\n".join(lines) + "\n"
+
+    def proc_diskstats(self, tick=0, busy=10):
+        """Return the contents of /proc/diskstats for the devices in
+        /proc/partitions. The counters of one device in busy grow with tick;
+        those of the others stay the same, like those of idle devices."""
+        lines = []
+        for i, line in enumerate(self.proc_partitions().splitlines()[2:]):
+            major, minor, _, name = line.split()
+            n = (tick if i % busy == 0 else 1) * (int(minor) + 1)
+            lines.append("%4s %7s %s %d 0 %d 0 %d 0 %d 0 0 %d %d 0 0 0 0" % (
+                major, minor, name, n, n * 8, n, n * 8, n, n * 2))
+        return "\n".join(lines) + "\n"
+
+    def collectors(self):
+        """Return collectors that parse the generated text, for SysInfo."""
+        return [SyntheticCollector("Partition", Partition.parse, self.proc_partitions()),
+                SyntheticCollector("RaidArray", RaidArray.parse, self.proc_mdstat()),
+                SyntheticCollector("LvmPhysicalVolume", LvmPhysicalVolume.parse, self.pvs_output()),
+                SyntheticCollector("LvmVolumeGroup", LvmVolumeGroup.parse, self.vgs_output()),
+                SyntheticCollector("LvmLogicalVolume", LvmLogicalVolume.parse, self.lvs_output()),
+                SyntheticCollector("MountedFileSystem", MountedFileSystem.parse, self.df_output()),
+                SyntheticCollector("SwapArea", SwapArea.parse, self.proc_swaps())]
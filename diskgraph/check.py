@@ -12,44 +12,68 @@ __author__ = "Per Rovegård"
 __version__ = "1.2"
 __license__ = "BSD-3-Clause"
 
-import os.path
-from subprocess import check_output, CalledProcessError
+import os
+from functools import wraps
 
 def file_exists(path):
     return os.path.exists(path)
 
 def cmd_exists(cmd):
-    try:
-        check_output(["which", cmd])
-        return True
-    except CalledProcessError:
-        return False
+    """Check whether the command is an executable file in one of the PATH
+    directories, like which does but without running it.
+    """
+    for d in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        path = os.path.join(d, cmd)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return True
+    return False
+
+def cached(check):
+    """Decorator for Checker methods, that makes the check run the first time it's
+    asked for and then remembers the result.
+    """
+    @wraps(check)
+    def wrapper(self):
+        try:
+            return self._results[check.__name__]
+        except KeyError:
+            result = self._results[check.__name__] = check(self)
+            return result
+    return wrapper
 
 class Checker(object):
     def __init__(self):
-        self._has_swaps = file_exists("/proc/swaps")
-        self._has_partitions = file_exists("/proc/partitions")
-        self._has_mdstat = file_exists("/proc/mdstat")
-        self._has_lvm_commands = cmd_exists("pvs") and cmd_exists("vgs") and cmd_exists("lvs")
-        self._has_df_command = cmd_exists("df")
+        self._results = {}
 
+    @cached
     def has_partitions(self):
-        return self._has_partitions
+        return file_exists("/proc/partitions")
 
+    @cached
     def has_mdstat(self):
-        return self._has_mdstat
+        return file_exists("/proc/mdstat")
 
+    @cached
     def has_lvm_commands(self):
-        return self._has_lvm_commands
+        return cmd_exists("pvs") and cmd_exists("vgs") and cmd_exists("lvs")
 
+    @cached
     def has_df_command(self):
-        return self._has_df_command
+        return cmd_exists("df")
+
+    @cached
+    def has_mountinfo(self):
+        return file_exists("/proc/self/mountinfo")
 
+    @cached
     def has_swaps(self):
-        return self._has_swaps
+        return file_exists("/proc/swaps")
+
+    @cached
+    def has_sys_block(self):
+        return file_exists("/sys/block")
 
 try:
     checker
 except NameError:
     checker = Checker()
-
@@ -3,9 +3,10 @@
 """Main script for diskgraph, a utility that creates a graph of disks, partitions, etc.
 present on the current Linux server.
 
-This script must be run as root, since the LVM commands require that.
+This script must be run as root, since the LVM commands require that, unless the
+topology is read from sysfs (--sysfs).
 
-Pydot (http://code.google.com/p/pydot) is used to create a PNG image of the graph.
+Graphviz (dot) is used to create images (PNG, SVG, etc.) of the graph.
 
 Created and tested by Per Rovegård on a server running Ubuntu 11.04 with Python 2.7.1.
 
@@ -18,41 +19,333 @@ __version__ = "1.2"
 __license__ = "BSD-3-Clause"
 
 import os, sys
+import argparse
+import json
+import cProfile
 from check import checker
+from timing import profiler
 from diskgraph import DiskGraph
 from sysinfo import SysInfo
+from sysfs import sysfs_collectors
+from watch import Watcher, SIGNALS, DEFAULT_INTERVAL, DEFAULT_DEBOUNCE, signals_for
+import snapshot
+from fleet import load_fleet
+from query import DeviceIndex, format_text, ABOVE, BELOW
+from render import RenderCache, render_targets, render_bytes, format_of, default_cache_dir, DEFAULT_MAX_BYTES
+from server import GraphService, serve, DEFAULT_BIND, DEFAULT_PORT, DEFAULT_TTL
+from iostats import Sampler
+from style import Styler, METRICS, parse_thresholds, parse_gradient
 
-if not checker.has_partitions():
-    sys.exit("The file /proc/partitions must exist.\n")
+environment_checked = False
 
-if not checker.has_df_command():
-    print "No df command found - mounted file systems won't be included."
+def check_environment(args):
+    """Exit if the system can't be graphed, and warn about what won't be
+    included. Only the first call checks; the flag is set once the checks
+    have passed, so that a failed check fails every time."""
+    global environment_checked
+    if environment_checked:
+        return
+    verify_environment(args)
+    environment_checked = True
 
-if not checker.has_mdstat():
-    print "No /proc/mdstat file - software RAID arrays won't be included."
+def verify_environment(args):
+    if not checker.has_partitions() and not args.sysfs:
+        sys.exit("The file /proc/partitions must exist.\n")
 
-if not checker.has_swaps():
-    print "No /proc/swaps file - swap areas won't be included."
+    if not checker.has_mountinfo() and not checker.has_df_command():
+        print >> sys.stderr, "No /proc/self/mountinfo file or df command found - mounted file systems won't be included."
 
-if not checker.has_lvm_commands():
-    print "No LVM commands founds - LVM entities won't be included."
+    if not checker.has_mdstat() and not args.sysfs:
+        print >> sys.stderr, "No /proc/mdstat file - software RAID arrays won't be included."
 
-# Currently, only the LVM commands require root privileges.
-if checker.has_lvm_commands() and __name__ == "__main__":
-    if os.geteuid() != 0:
-        sys.exit("Only root can run this script, because the LVM commands need that.\n")
+    if not checker.has_swaps():
+        print >> sys.stderr, "No /proc/swaps file - swap areas won't be included."
 
-def main(fn):
-    dg = DiskGraph(SysInfo())
+    if args.sysfs:
+        # The sysfs collector replaces the LVM commands, so no root privileges needed.
+        return
+
+    if not checker.has_lvm_commands():
+        print >> sys.stderr, "No LVM commands founds - LVM entities won't be included."
+
+    if not checker.has_sys_block():
+        print >> sys.stderr, "No /sys/block directory - device-mapper devices (multipath, dm-crypt) won't be included."
+
+    # Currently, only the LVM commands require root privileges.
+    if checker.has_lvm_commands():
+        if os.geteuid() != 0:
+            sys.exit("Only root can run this script, because the LVM commands need that.\n")
+
+def collect(args):
+    if args.snapshot and (args.max_age is None or snapshot.is_fresh(args.snapshot, args.max_age)):
+        with profiler.timer("snapshot.load"):
+            return snapshot.load(args.snapshot)
+    check_environment(args)
+    collectors = sysfs_collectors(args.sysfs_root) if args.sysfs else None
+    sysinfo = SysInfo(collectors)
+    for name in sysinfo.missing:
+        if name in sysinfo.errors:
+            print >> sys.stderr, "Collecting %s failed (%s) - those entities won't be included." % (
+                name, sysinfo.errors[name])
+        else:
+            print >> sys.stderr, "Collecting %s timed out - those entities won't be included." % name
+    for fn in set([args.save_snapshot, args.snapshot]) - set([None]):
+        with profiler.timer("snapshot.save"):
+            snapshot.save(sysinfo, fn)
+    return sysinfo
+
+def render_cache(args):
+    if args.no_cache:
+        return None
+    return RenderCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+
+def write(dg, args):
     print "Graph contains %d entities." % (dg.order - 1, )
-    g = dg.todot()
-    print "Writing PNG image to %s..." % fn
-    g.write_png(fn)
+    targets = [(fn, format_of(fn)) for fn in args.output]
+    print "Writing %s..." % ", ".join("%s image to %s" % (fmt.upper(), fn) for fn, fmt in targets)
+    for fn in render_targets(dg.dottext(), targets, render_cache(args)):
+        print "The graph hasn't changed; reused the cached image for %s." % fn
     print "All done!"
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print "Usage: %s <output file>" % sys.argv[0]
-        sys.exit(1)
-    main(sys.argv[1])
+def io_sampler(args):
+    if args.iostats is None:
+        return None
+    return Sampler(args.iostats)
+
+def styler(args):
+    """Return the Styler that colors the nodes as the arguments tell."""
+    if args.color_by is None:
+        return None
+    scale = args.thresholds or args.gradient
+    if scale is True:
+        # --gradient without colors
+        scale = METRICS[args.color_by].gradient()
+    return Styler(args.color_by, scale)
+
+def sample_io(dg, sampler):
+    """Give the graph the I/O load since the previous sample, if sampling."""
+    if sampler is not None:
+        dg.set_iostats(sampler.sample(), sampler.names)
+    return dg
+
+def serve_graph(args):
+    cache = render_cache(args)
+    sampler = io_sampler(args)
+    service = GraphService(lambda: collect(args), lambda text, fmt: render_bytes(text, fmt, cache), args.ttl,
+                           build=lambda sysinfo: sample_io(DiskGraph(sysinfo, args.rollup, styler(args)), sampler))
+    if args.snapshot is None or args.max_age is not None:
+        # check now, since a failed check can't end the server from inside a request
+        check_environment(args)
+    serve(service, args.bind, args.port)
+
+def query(args):
+    index = DeviceIndex(sample_io(DiskGraph(collect(args)), io_sampler(args)))
+    directions = [ABOVE] if args.above else [BELOW] if args.below else [ABOVE, BELOW]
+    results = []
+    unknown = []
+    for spec in args.device:
+        try:
+            results.append(index.query(spec, directions, args.rollup))
+        except KeyError:
+            unknown.append(spec)
+    if args.json:
+        print json.dumps(results, indent=2, sort_keys=True)
+    else:
+        print "\n\n".join(format_text(result) for result in results)
+    if unknown:
+        sys.exit("Nothing is known as %s." % ", ".join(unknown))
+
+def run(args):
+    if args.command == "serve":
+        serve_graph(args)
+        return
+    if args.command == "query":
+        query(args)
+        return
+    if args.fleet:
+        write(load_fleet(args.fleet, args.jobs, not args.no_clusters, args.rollup, styler(args)), args)
+        return
+    sampler = io_sampler(args)
+    if not args.watch:
+        write(sample_io(DiskGraph(collect(args), args.rollup, styler(args)), sampler), args)
+        return
+    watcher = Watcher(signals_for(args.signals.split(",")), args.interval, args.debounce)
+    dg = None
+    # with I/O sampling, the graph is recreated every interval, with the load since the last time
+    ticks = watcher.ticks() if sampler else (True for _ in watcher.changes())
+    for changed in ticks:
+        if dg is None:
+            dg = DiskGraph(collect(args), args.rollup, styler(args))
+        elif changed:
+            # only what has changed since the last snapshot is expanded again
+            dg.update(collect(args))
+        write(sample_io(dg, sampler), args)
 
+def main(args):
+    if args.profile:
+        profiler.enable()
+    cprofile = cProfile.Profile() if args.cprofile else None
+    try:
+        if cprofile:
+            cprofile.runcall(run, args)
+        else:
+            run(args)
+    finally:
+        # also when watch mode is interrupted
+        if cprofile:
+            cprofile.dump_stats(args.cprofile)
+        if args.profile:
+            profiler.save(args.profile)
+
+def collect_arguments():
+    """Return a parser of the arguments that all commands share: where the
+    information comes from, and profiling."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--sysfs", action="store_true",
+                        help="read disks, partitions, RAID arrays and device-mapper devices "
+                             "from sysfs instead of /proc and the LVM commands (doesn't need root)")
+    parser.add_argument("--sysfs-root", default="/sys", metavar="DIR",
+                        help="where sysfs is mounted (default: %(default)s)")
+    parser.add_argument("--save-snapshot", metavar="FILE",
+                        help="save the collected information to a snapshot file (gzip'd if FILE ends with .gz)")
+    parser.add_argument("--snapshot", metavar="FILE",
+                        help="create the graph from a snapshot file instead of collecting information")
+    parser.add_argument("--max-age", type=float, metavar="SECONDS",
+                        help="with --snapshot, only use the snapshot if it's younger than this; "
+                             "otherwise collect information and save it to the snapshot file")
+    parser.add_argument("--rollup", action="store_true",
+                        help="show the free space and file system usage on and above each node, "
+                             "counting shared space once")
+    parser.add_argument("--iostats", type=float, metavar="SECONDS",
+                        help="sample the I/O load from /proc/diskstats over SECONDS, and show IOPS, "
+                             "throughput, queue depth and utilisation for each node (in watch mode, "
+                             "the graph is then recreated every --interval with the load since the last time)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write the time spent in each stage (collectors, graph building, DOT "
+                             "generation, rendering) and object and edge counts to FILE as JSON")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="run under cProfile and write the statistics to FILE (for pstats)")
+    return parser
+
+def thresholds_type(spec):
+    try:
+        return parse_thresholds(spec)
+    except ValueError, e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def gradient_type(spec):
+    try:
+        return parse_gradient(spec)
+    except ValueError, e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def style_arguments():
+    """Return a parser of the arguments of the commands that draw the graph:
+    how the nodes are colored."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--color-by", choices=sorted(METRICS),
+                        help="color the nodes by a metric instead of by type: how full the file systems "
+                             "on or above them are, their share of free space, their I/O utilisation "
+                             "(needs --iostats) or how degraded a RAID array is")
+    scale = parser.add_mutually_exclusive_group()
+    scale.add_argument("--thresholds", type=thresholds_type, metavar="SPEC",
+                       help="with --color-by, the colors of nodes whose metric is above the given "
+                            "percentages, e.g. 80:orange,90:red, or below them, e.g. <20:orange,<10:red "
+                            "(default: depends on the metric)")
+    scale.add_argument("--gradient", type=gradient_type, nargs="?", const=True, metavar="FROM:TO",
+                       help="with --color-by, blend the color of every node with a metric between two "
+                            "colors, e.g. #33cc33:#ff0000 (default: green to red, from good to bad)")
+    return parser
+
+def cache_arguments():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--cache-dir", default=default_cache_dir(), metavar="DIR",
+                        help="where to keep rendered images for reuse (default: %(default)s)")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, metavar="MB",
+                        help="maximum size of the image cache (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="always render the image with Graphviz")
+    return parser
+
+def render_parser():
+    parser = argparse.ArgumentParser(description="Create a graph of disks, partitions, etc.",
+                                     epilog="Other commands: %s. Run dgmain.py COMMAND -h for their options." % ", ".join(
+                                         sorted(c for c in COMMANDS if c != "render")),
+                                     parents=[collect_arguments(), style_arguments(), cache_arguments()])
+    parser.add_argument("output", nargs="+",
+                        help="the image file(s) to write; the format is given by the extension "
+                             "(e.g. png, svg or json)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, and recreate the graph whenever the storage topology changes")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, metavar="SECONDS",
+                        help="how often to check for changes in watch mode (default: %(default)s)")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, metavar="SECONDS",
+                        help="how long changes must have settled before the graph is recreated "
+                             "(default: %(default)s)")
+    parser.add_argument("--signals", default=",".join(sorted(SIGNALS)), metavar="NAMES",
+                        help="comma-separated change signals to watch (default: %(default)s)")
+    parser.add_argument("--fleet", metavar="DIR",
+                        help="create one graph of many hosts from the snapshots in DIR, one file per "
+                             "host named after it (e.g. web01.json.gz)")
+    parser.add_argument("--jobs", type=int, metavar="N",
+                        help="with --fleet, the number of processes that load snapshots "
+                             "(default: one per CPU)")
+    parser.add_argument("--no-clusters", action="store_true",
+                        help="with --fleet, don't draw a box around the nodes of each host")
+    return parser
+
+def serve_parser():
+    parser = argparse.ArgumentParser(prog="dgmain.py serve",
+                                     description="Serve the graph over HTTP as /graph.png, /graph.svg and "
+                                                 "/graph.json, collecting information when it's asked for.",
+                                     parents=[collect_arguments(), style_arguments(), cache_arguments()])
+    parser.add_argument("--bind", default=DEFAULT_BIND, metavar="ADDRESS",
+                        help="the address to listen on; give 0.0.0.0 to listen on all addresses "
+                             "(default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="the port to listen on (default: %(default)s)")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, metavar="SECONDS",
+                        help="how long collected information is reused (default: %(default)s)")
+    return parser
+
+def query_parser():
+    parser = argparse.ArgumentParser(prog="dgmain.py query",
+                                     description="Show what is stacked on a device or mount point, and "
+                                                 "what it sits on, without creating an image.",
+                                     parents=[collect_arguments()])
+    parser.add_argument("device", nargs="+",
+                        help="a device name (sdf1), /dev or /dev/mapper path, mount point or "
+                             "major:minor pair (8:17)")
+    direction = parser.add_mutually_exclusive_group()
+    direction.add_argument("--above", action="store_true", help="only show what is stacked on the device")
+    direction.add_argument("--below", action="store_true", help="only show what the device sits on")
+    parser.add_argument("--json", action="store_true", help="write the answer as JSON")
+    return parser
+
+COMMANDS = {
+    "render": render_parser,
+    "serve": serve_parser,
+    "query": query_parser,
+}
+
+def parse_args(argv):
+    """Parse the command line. The first argument may name a command; without
+    one, the graph is rendered to the files given."""
+    command = "render"
+    if argv and argv[0] in COMMANDS:
+        command, argv = argv[0], argv[1:]
+    parser = COMMANDS[command]()
+    args = parser.parse_args(argv)
+    args.command = command
+    if command == "render" and args.fleet and args.watch:
+        parser.error("--fleet can't be combined with --watch")
+    if command == "render" and args.fleet and args.iostats is not None:
+        parser.error("--fleet can't be combined with --iostats")
+    if command != "query":
+        if args.color_by is None and (args.thresholds or args.gradient):
+            parser.error("--thresholds and --gradient need --color-by")
+        if args.color_by == "io" and args.iostats is None:
+            parser.error("--color-by io needs --iostats")
+    return args
+
+if __name__ == "__main__":
+    main(parse_args(sys.argv[1:]))
@@ -13,63 +13,181 @@ __version__ = "1.2"
 __license__ = "BSD-3-Clause"
 
 import re
-import pydot
+from cStringIO import StringIO
 from sysinfo import *
 from sgraph import SimpleGraph
-
-colors = {
-    Partition: lambda p: "gold" if p.is_disk() else "chartreuse1",
-    RaidArray: "cadetblue",
-    LvmPhysicalVolume: "chocolate",
-    LvmVolumeGroup: "coral",
-    LvmLogicalVolume: "mediumorchid1",
-    MountedFileSystem: ("navy", "white"),
-    FreeSpace: ("red", "white"),
-    SwapArea: "mediumslateblue",
-}
-
-def nn(node):
-    return str(node).replace("\n", "\\n")
-
-def get_color(node, c):
-    if isinstance(c, basestring):
-        return c
-    else:
-        return c(node)
-
-def get_fillcolor(node):
-    c = colors.get(node.__class__)
-    if c:
-        if isinstance(c, tuple):
-            # (fillcolor, fontcolor)
-            return get_color(node, c[0])
-        return get_color(node, c)
-
-def get_fontcolor(node):
-    c = colors.get(node.__class__)
-    if isinstance(c, tuple):
-        # (fillcolor, fontcolor)
-        return get_color(node, c[1])
+from timing import profiler
+from rollup import rollup, rollup_text, post_order
+from iostats import aggregate, io_text
+from style import colors, color_dict, Styler
+import dot
+
+try:
+    import pydot
+except ImportError:
+    # only needed for todot; writedot doesn't use it
+    pydot = None
 
 def style_dict(node):
-    d = {}
-    fillc = get_fillcolor(node)
-    if fillc:
-        d["style"] = "filled"
-        d["fillcolor"] = fillc
-    fontc = get_fontcolor(node)
-    if fontc:
-        d["fontcolor"] = fontc
-    d["label"] = nn(node)
+    d = color_dict(node)
+    d["label"] = str(node)
+    return d
+
+def annotated_style_dict(node, lines, color=None):
+    """Return the style of the node, with the given lines of text (those that
+    aren't None) added to the label. color is the color attributes of the node
+    (see Styler.colors); by default, they are those of its type."""
+    d = color_dict(node) if color is None else dict(color)
+    d["label"] = str(node)
+    for line in lines:
+        if line:
+            d["label"] += "\n" + line
+    return d
+
+def node_dict(node, figures=None, io=None):
+    """Return a description of the node as a dict, for JSON output. figures are
+    the rolled up figures of the node (see rollup) and io its I/O figures (see
+    iostats), if any."""
+    d = {"id": dot.identity_id(node), "type": node.__class__.__name__,
+         "typename": node.gettypename(), "name": node.name}
+    if hasattr(node, "byte_size"):
+        d["byte_size"] = node.byte_size
+    if figures is not None:
+        d["rollup"] = figures.asdict()
+    if io is not None:
+        d["io"] = io.asdict()
     return d
 
 class DiskGraph(SimpleGraph):
-    def __init__(self, sysinfo):
+    def __init__(self, sysinfo, rollup_labels=False, styler=None):
+        """With rollup_labels, node labels include the free space and file
+        system usage rolled up to the node. styler colors the nodes; by
+        default, they are colored by type."""
+        self.rollup_labels = rollup_labels
+        self.styler = styler or Styler()
+        self._colors = None
+        self._figures = None
+        self.iostats = None
+        self._io = None
+        self._post_order = None
         self.pool = sysinfo.objects
-        SimpleGraph.__init__(self, self.headfinder, Root())
+        self.index = getattr(sysinfo, "index", None)
+        if self.index is None:
+            self.index = SysObjectIndex(self.pool)
+        with profiler.timer("build"):
+            SimpleGraph.__init__(self, self.headfinder, Root())
+        self._count()
+
+    def _count(self):
+        if profiler.enabled:
+            profiler.count("vertices", self.order)
+            profiler.count("edges", sum(len(heads) for heads in self._graph.values()))
 
     def headfinder(self, v):
-        return v.expand(self.pool)
+        return v.expand(self.index)
+
+    def update(self, sysinfo):
+        """Patch the graph in place, so that it becomes the graph of the given
+        snapshot. Only the vertices whose heads may have changed are expanded
+        again, i.e. the parents of added, removed and changed objects and the
+        changed objects themselves. Returns the result of diff_objects.
+        """
+        self._figures = None
+        self._io = None
+        self._post_order = None
+        self._colors = None
+        with profiler.timer("update"):
+            added, removed, changed = diff_objects(self.pool, sysinfo.objects)
+            # Keep the instances of unchanged objects, since they are the vertices.
+            kept = dict((o.identity, o) for o in self.pool)
+            for old, new in changed:
+                kept[new.identity] = new
+            self.pool = [kept.get(o.identity, o) for o in sysinfo.objects]
+            self.index = SysObjectIndex(self.pool)
+
+            gone = removed + [old for old, new in changed]
+            stale = set()
+            orphans = set()
+            for old in gone:
+                stale.update(self.tailsFor(old))
+            for new in added + [new for old, new in changed]:
+                stale.update(p for p in self.index.parents_of(new) if p in self._graph)
+                if new.is_child_of(self.root):
+                    stale.add(self.root)
+            for old in gone:
+                stale.discard(old)
+                orphans.update(self.headsFor(old))
+                self.removeVertex(old)
+            for v in stale:
+                orphans.update(self._reexpand(v))
+            for v in orphans:
+                self._prune(v)
+        self._count()
+        return added, removed, changed
+
+    def _reexpand(self, vertex):
+        """Recompute the heads of the vertex, expanding heads that are new to the
+        graph. Returns the previous heads.
+        """
+        previous = list(self.headsFor(vertex))
+        pending = [vertex]
+        while pending:
+            v = pending.pop()
+            heads = self.headfinder(v)
+            pending += [h for h in heads if not h in self._graph and not h in pending]
+            self.setHeads(v, heads)
+        return previous
+
+    def _prune(self, vertex):
+        """Remove the vertex, and what's below it, if nothing leads to it anymore."""
+        if vertex in self._graph and vertex != self.root and not self.tailsFor(vertex):
+            heads = self.headsFor(vertex)
+            self.removeVertex(vertex)
+            for h in heads:
+                self._prune(h)
+
+    def rollup(self):
+        """Return a dict from each vertex to its rolled up Figures. They are
+        computed once per graph, and again after an update."""
+        if self._figures is None:
+            self._figures = rollup(self)
+        return self._figures
+
+    def set_iostats(self, stats, names=None):
+        """Set the I/O figures of the devices, as returned by Sampler.sample,
+        after which node labels include them. names maps device names to device
+        numbers, for devices whose number isn't known."""
+        self.iostats = (stats, names)
+        self._io = None
+        self._colors = None
+
+    def io(self):
+        """Return a dict from each vertex to its IoStats, aggregated from the
+        figures set with set_iostats (empty if none are set)."""
+        if self.iostats is None:
+            return {}
+        if self._io is None:
+            if self._post_order is None:
+                # the same for every sample, until the graph is updated
+                self._post_order = post_order(self)
+            stats, names = self.iostats
+            self._io = aggregate(self, stats, names, self._post_order)
+        return self._io
+
+    def colors(self):
+        """Return a dict from each vertex to its color attributes, computed by
+        the styler for all vertices at once."""
+        if self._colors is None:
+            self._colors = self.styler.colors(self, list(self._graph))
+        return self._colors
+
+    def style(self, node):
+        lines = []
+        if self.rollup_labels:
+            lines.append(rollup_text(self.rollup().get(node)))
+        if self.iostats is not None:
+            lines.append(io_text(self.io().get(node)))
+        return annotated_style_dict(node, lines, self.colors().get(node))
 
     def dump(self):
         self._print(self.root, 0)
@@ -79,18 +197,37 @@ class DiskGraph(SimpleGraph):
         for head in self.headsFor(v):
             self._print(head, level + 1)
 
+    def writedot(self, out):
+        """Write the graph in the DOT language to the file-like object out."""
+        with profiler.timer("dot"):
+            dot.write_dot(self.visitEdges(self.root), out, self.style, node_id=dot.identity_id)
+
+    def dottext(self):
+        """Return the graph in the DOT language. The text is the same for the
+        same topology, so it can be used as a cache key for rendered images.
+        """
+        out = StringIO()
+        self.writedot(out)
+        return out.getvalue()
+
+    def pydot_style(self, node):
+        # pydot quotes attribute values, but leaves their newlines as they are
+        return dict((k, v.replace("\n", "\\n")) for k, v in self.style(node).iteritems())
+
     def todot(self):
+        if pydot is None:
+            raise ImportError("pydot is needed to create a pydot graph")
         g = pydot.Dot("diskgraph", graph_type="digraph")
         nodes = {}
         for (tail, head) in self.visitEdges(self.root):
             hnode = nodes.get(head)
             if not hnode:
-                hnode = pydot.Node(str(len(nodes)), **style_dict(head))
+                hnode = pydot.Node(dot.quote(dot.identity_id(head)), **self.pydot_style(head))
                 g.add_node(hnode)
                 nodes[head] = hnode
             tnode = nodes.get(tail)
             if not tnode:
-                tnode = pydot.Node(str(len(nodes)), **style_dict(tail))
+                tnode = pydot.Node(dot.quote(dot.identity_id(tail)), **self.pydot_style(tail))
                 g.add_node(tnode)
                 nodes[tail] = tnode
             g.add_edge(pydot.Edge(tnode, hnode))
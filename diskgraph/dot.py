@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Module for writing a graph in the DOT language and for rendering it with
+Graphviz, without building an object model of the graph first. Part of the
+diskgraph utility.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import subprocess
+
+__all__ = [
+    "write_dot",
+    "render",
+    "layout",
+    "render_laid_out",
+    "identity_id",
+]
+
+def quote(value):
+    """Quote a value as a DOT string. Newlines become \\n, which Graphviz shows as
+    line breaks in labels."""
+    return '"%s"' % str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def attr_list(attrs):
+    return ", ".join("%s=%s" % (k, quote(v)) for k, v in sorted(attrs.iteritems()))
+
+def flatten(value):
+    if isinstance(value, tuple):
+        return "/".join(flatten(v) for v in value)
+    return str(value)
+
+def identity_id(v):
+    """Node ID derived from the identity of a sysinfo object, e.g.
+    "LvmLogicalVolume/vg/lv". It stays the same from one run to the next.
+    """
+    return flatten(v.identity)
+
+def write_dot(edges, out, style, name="diskgraph", node_id=None, cluster=None):
+    """Write a digraph with the given edges to the file-like object out, as the
+    edges are visited. A node is declared, with the attributes that style
+    returns for it, the first time it's seen. Nodes are identified by what
+    node_id returns for them, or numbered in the order they're seen if no
+    node_id function is given.
+
+    If a cluster function is given, nodes for which it returns a name are
+    declared in a cluster subgraph of that name, which Graphviz draws as a box
+    around them. The nodes must then all be declared before the edges, so the
+    edges are collected first.
+    """
+    out.write("digraph %s {\n" % name)
+    ids = {}
+    used = set()
+
+    def declare(v):
+        nid = node_id(v) if node_id else str(len(ids))
+        if nid in used:
+            nid = "%s#%d" % (nid, len(ids))
+        used.add(nid)
+        ids[v] = quote(nid)
+        return "%s [%s];\n" % (ids[v], attr_list(style(v)))
+
+    if cluster is None:
+        for tail, head in edges:
+            for v in (head, tail):
+                if not v in ids:
+                    out.write(declare(v))
+            out.write("%s -> %s;\n" % (ids[tail], ids[head]))
+    else:
+        edges = list(edges)
+        clusters = {}
+        order = []
+        for tail, head in edges:
+            for v in (head, tail):
+                if not v in ids:
+                    c = cluster(v)
+                    if not c in clusters:
+                        clusters[c] = []
+                        order.append(c)
+                    clusters[c].append(declare(v))
+        for c in order:
+            if c is None:
+                out.write("".join(clusters[c]))
+            else:
+                out.write("subgraph %s {\nlabel=%s;\n%s}\n" % (quote("cluster_%s" % c), quote(c), "".join(clusters[c])))
+        for tail, head in edges:
+            out.write("%s -> %s;\n" % (ids[tail], ids[head]))
+    out.write("}\n")
+
+def render(write, fn, fmt="png", command="dot"):
+    """Render a graph with Graphviz to the file fn. The write function is called
+    with a pipe to Graphviz, to which it should write the graph.
+    """
+    proc = subprocess.Popen([command, "-T%s" % fmt, "-o", fn], stdin=subprocess.PIPE)
+    try:
+        write(proc.stdin)
+    finally:
+        proc.stdin.close()
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+def layout(write, command="dot"):
+    """Lay out a graph with Graphviz and return the laid out graph, in the DOT
+    language with node positions. The write function is called with a pipe to
+    Graphviz, to which it should write the graph.
+    """
+    proc = subprocess.Popen([command, "-Tdot"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        write(proc.stdin)
+    finally:
+        proc.stdin.close()
+    text = proc.stdout.read()
+    if proc.wait() != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+    return text
+
+def render_laid_out(text, targets, command="neato"):
+    """Render a laid out graph (see layout) to a number of (file name, format)
+    targets, in parallel. The layout isn't done again; neato -n2 uses the node
+    positions in the graph as they are.
+    """
+    commands = [[command, "-n2", "-T%s" % fmt, "-o", fn] for fn, fmt in targets]
+    procs = []
+    try:
+        for args in commands:
+            procs.append(subprocess.Popen(args, stdin=subprocess.PIPE))
+        for proc in procs:
+            # the processes read all input before rendering, so they render concurrently
+            try:
+                proc.stdin.write(text)
+            except IOError:
+                # the process has died (EPIPE); its exit status tells why
+                pass
+            proc.stdin.close()
+        for proc in procs:
+            proc.wait()
+    finally:
+        # if something went wrong, the processes that are left are killed
+        for proc in procs:
+            if proc.returncode is None:
+                proc.stdin.close()
+                try:
+                    proc.kill()
+                except OSError:
+                    pass
+                proc.wait()
+    for args, proc in zip(commands, procs):
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, " ".join(args))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Module for combining the snapshots of many hosts into one graph, with each
+host as a subtree below the root. Part of the diskgraph utility.
+
+The snapshots are read from a directory, one file per host, named after the
+host (e.g. web01.json.gz). Each snapshot is loaded and its graph built in a
+worker process; the parent process only merges the resulting edges. Nodes get
+IDs prefixed with their host name, e.g. "web01:Partition/sda1", so the same
+device on different hosts gives different nodes.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import multiprocessing
+from cStringIO import StringIO
+from sysinfo import SysObject, Root
+from sgraph import SimpleGraph
+from diskgraph import DiskGraph, annotated_style_dict
+from rollup import rollup, rollup_text
+from style import Styler
+from timing import profiler
+import snapshot
+import dot
+
+__all__ = [
+    "Host",
+    "FleetGraph",
+    "load_host",
+    "load_fleet",
+    "snapshot_files",
+]
+
+SNAPSHOT_EXTENSIONS = (".json", ".json.gz")
+
+class Host(SysObject):
+    __slots__ = fields = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+def host_name(fn):
+    """Return the host name of a snapshot file, i.e. its name without extension."""
+    name = os.path.basename(fn)
+    for ext in SNAPSHOT_EXTENSIONS:
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+def snapshot_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(SNAPSHOT_EXTENSIONS))
+
+def load_host(fn):
+    """Load the snapshot of a host and build its graph. Return a tuple of the
+    host name, the vertices of the graph except the root, and the edges as
+    (tail, head) positions in the vertex list, where the root is -1. That is
+    much cheaper to send back from a worker process than the graph itself.
+    """
+    dg = DiskGraph(snapshot.load(fn))
+    pos = {dg.root: -1}
+    vertices = []
+    edges = []
+    for tail, head in dg.visitEdges(dg.root):
+        if not head in pos:
+            pos[head] = len(vertices)
+            vertices.append(head)
+        edges.append((pos[tail], pos[head]))
+    return host_name(fn), vertices, edges
+
+class FleetGraph(SimpleGraph):
+    """The graph of a number of hosts, each a Host node below the root with the
+    graph of the host below it.
+    """
+    def __init__(self, hosts, clusters=True, rollup_labels=False, styler=None):
+        """hosts is a list of tuples as returned by load_host. With clusters,
+        the nodes of each host are drawn in a box of their own. With
+        rollup_labels, node labels include rolled up free space and file system
+        usage. styler colors the nodes (see style.Styler); by default by type.
+        """
+        self.clusters = clusters
+        self.rollup_labels = rollup_labels
+        self.styler = styler or Styler()
+        self._figures = None
+        self._colors = None
+        self.host_of = {}
+        root = Root()
+        heads = {root: []}
+        for name, vertices, edges in hosts:
+            host = Host(name)
+            heads[root].append(host)
+            heads[host] = []
+            self.host_of[host] = name
+            for v in vertices:
+                heads[v] = []
+                self.host_of[v] = name
+            for tail, head in edges:
+                heads[host if tail < 0 else vertices[tail]].append(vertices[head])
+        SimpleGraph.__init__(self, lambda v: heads.get(v, []), root)
+
+    def node_id(self, v):
+        if isinstance(v, (Root, Host)):
+            return dot.identity_id(v)
+        return "%s:%s" % (self.host_of[v], dot.identity_id(v))
+
+    def cluster_of(self, v):
+        return self.host_of.get(v)
+
+    def rollup(self):
+        if self._figures is None:
+            self._figures = rollup(self)
+        return self._figures
+
+    def colors(self):
+        if self._colors is None:
+            self._colors = self.styler.colors(self, list(self._graph))
+        return self._colors
+
+    def style(self, node):
+        lines = [rollup_text(self.rollup().get(node))] if self.rollup_labels else []
+        return annotated_style_dict(node, lines, self.colors().get(node))
+
+    def writedot(self, out):
+        """Write the graph in the DOT language to the file-like object out."""
+        with profiler.timer("dot"):
+            dot.write_dot(self.visitEdges(self.root), out, self.style, node_id=self.node_id,
+                          cluster=self.cluster_of if self.clusters else None)
+
+    def dottext(self):
+        out = StringIO()
+        self.writedot(out)
+        return out.getvalue()
+
+def load_fleet(directory, processes=None, clusters=True, rollup_labels=False, styler=None):
+    """Load the snapshots in the directory and return a FleetGraph of them. The
+    snapshots are loaded by a pool of processes (by default one per CPU), or
+    in this process if processes is 1.
+    """
+    files = snapshot_files(directory)
+    if not files:
+        raise ValueError("No snapshots in %s" % directory)
+    with profiler.timer("fleet.load"):
+        if processes == 1:
+            hosts = map(load_host, files)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                hosts = pool.map(load_host, files)
+            finally:
+                pool.close()
+                pool.join()
+    profiler.count("hosts", len(hosts))
+    with profiler.timer("fleet.merge"):
+        return FleetGraph(hosts, clusters, rollup_labels, styler)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Module for sampling the I/O load of block devices from /proc/diskstats, so
+that the graph can show where the load is. Part of the diskgraph utility.
+
+/proc/diskstats has a line of cumulative counters per block device, keyed by
+its major:minor device number. Two readings some seconds apart give, for each
+device:
+
+    iops          reads and writes completed per second
+    read_bytes    bytes read per second
+    write_bytes   bytes written per second
+    queue_depth   average number of requests in flight
+    utilisation   percentage of the time the device was busy
+
+Nodes that are block devices (disks, partitions, RAID arrays, device-mapper
+devices and logical volumes) get the figures of their device, and file systems
+those of the device they are mounted from. Other nodes (PVs, VGs, swap areas,
+the root) get the figures of the nodes they sit on combined: rates and queue
+depths are summed, and the utilisation is that of the busiest device.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import time
+from sysinfo import *
+from sysinfo import tosize, read_file, SECTOR_SIZE
+from rollup import post_order
+from timing import profiler
+
+__all__ = [
+    "IoStats",
+    "Sampler",
+    "parse_diskstats",
+    "io_rates",
+    "aggregate",
+    "io_text",
+]
+
+DISKSTATS = "/proc/diskstats"
+DEFAULT_SAMPLE_INTERVAL = 2
+
+class IoStats(object):
+    __slots__ = ("iops", "read_bytes", "write_bytes", "queue_depth", "utilisation")
+
+    def __init__(self, iops, read_bytes, write_bytes, queue_depth, utilisation):
+        self.iops = iops
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+        self.queue_depth = queue_depth
+        self.utilisation = utilisation
+
+    def asdict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    @classmethod
+    def combine(cls, stats):
+        """Return the combined figures of a number of devices."""
+        return IoStats(sum(s.iops for s in stats), sum(s.read_bytes for s in stats),
+                       sum(s.write_bytes for s in stats), sum(s.queue_depth for s in stats),
+                       max(s.utilisation for s in stats))
+
+IDLE = IoStats(0, 0, 0, 0, 0)
+
+def parse_diskstats(text):
+    """Parse the contents of /proc/diskstats. Return a dict from device number
+    (major, minor) to a tuple of the device name and the rest of its line, the
+    counters. The counters are only parsed (see counters) for devices whose
+    line has changed between two readings; most devices are usually idle.
+    """
+    readings = {}
+    for line in text.splitlines():
+        f = line.split(None, 3)
+        if len(f) == 4:
+            readings[(int(f[0]), int(f[1]))] = (f[2], f[3])
+    return readings
+
+def counters(text):
+    """Return the counters of a device that matter here, from the rest of its
+    line in /proc/diskstats: reads completed, sectors read, writes completed,
+    sectors written, milliseconds spent doing I/O and weighted milliseconds
+    spent doing I/O. Returns None for a line that is too short.
+    """
+    f = text.split()
+    if len(f) < 11:
+        return None
+    return int(f[0]), int(f[2]), int(f[4]), int(f[6]), int(f[9]), int(f[10])
+
+def io_rates(before, after, seconds):
+    """Return a dict from device number to the IoStats of the device between two
+    readings (as returned by parse_diskstats) taken the given number of seconds
+    apart. Devices that are only in one of the readings are left out.
+    """
+    stats = {}
+    if seconds <= 0:
+        return stats
+    ms = seconds * 1000.0
+    for devno, (name, now) in after.iteritems():
+        then = before.get(devno)
+        if then is None:
+            continue
+        if then[1] == now:
+            stats[devno] = IDLE
+            continue
+        now, then = counters(now), counters(then[1])
+        if now is None or then is None:
+            continue
+        reads, sectors_read, writes, sectors_written, io_ms, weighted_ms = [
+            max(n - t, 0) for n, t in zip(now, then)]
+        stats[devno] = IoStats((reads + writes) / seconds, sectors_read * SECTOR_SIZE / seconds,
+                               sectors_written * SECTOR_SIZE / seconds, weighted_ms / ms,
+                               min(100.0, io_ms * 100 / ms))
+    return stats
+
+def read_diskstats():
+    return parse_diskstats(read_file(DISKSTATS))
+
+class Sampler(object):
+    """Samples /proc/diskstats. Each sample gives the load since the previous
+    one; the first sample takes two readings interval seconds apart.
+    """
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, read=read_diskstats, clock=time.time, sleep=time.sleep):
+        self.interval = interval
+        self.read = read
+        self.clock = clock
+        self.sleep = sleep
+        self._last = None
+        self.names = {}
+
+    def sample(self):
+        """Return a dict from device number to the IoStats of the device since
+        the previous sample."""
+        if self._last is None:
+            self._last = (self.clock(), self.read())
+            self.sleep(self.interval)
+        with profiler.timer("iostats.sample"):
+            then, before = self._last
+            now, after = self.clock(), self.read()
+            self._last = (now, after)
+            stats = io_rates(before, after, now - then)
+            # names, for devices whose number isn't known (e.g. RAID arrays from mdstat)
+            self.names = dict((reading[0], devno) for devno, reading in after.iteritems())
+        return stats
+
+# nodes that have figures of their own in /proc/diskstats, if their number or name is known
+BLOCK_DEVICES = (Partition, RaidArray, DeviceMapper, LvmLogicalVolume)
+
+def kernel_name(node):
+    if isinstance(node, (Partition, RaidArray)):
+        return node.name
+    return getattr(node, "kernel_name", None)
+
+def aggregate(graph, stats, names=None, order=None):
+    """Return a dict from each vertex of the graph to its IoStats, given the
+    IoStats of each device by device number and, optionally, a dict from device
+    name to device number. Vertices without figures are left out. order is the
+    post order of the graph (see rollup.post_order), if known.
+    """
+    names = names or {}
+    io = {}
+    with profiler.timer("iostats.aggregate"):
+        # each vertex after those it sits on
+        for v in reversed(order or post_order(graph)):
+            devno = getattr(v, "kernel_major_minor", None)
+            if devno is not None:
+                s = stats.get(tuple(devno))
+            elif isinstance(v, BLOCK_DEVICES):
+                s = stats.get(names.get(kernel_name(v)))
+            elif isinstance(v, (Root, FreeSpace)):
+                continue
+            else:
+                below = [io[t] for t in graph.tailsFor(v) if t in io]
+                if len(below) > 1:
+                    s = IoStats.combine(below)
+                else:
+                    s = below[0] if below else None
+            if s is not None:
+                io[v] = s
+        disks = [io[h] for h in graph.headsFor(graph.root) if h in io]
+        if disks:
+            io[graph.root] = IoStats.combine(disks)
+    return io
+
+def io_text(stats):
+    """Return a line of text with the I/O figures, for node labels, or None if
+    there are none."""
+    if stats is None:
+        return None
+    return "%.0f IOPS, r %s/s, w %s/s, q %.1f, %.0f%% busy" % (
+        stats.iops, tosize(stats.read_bytes), tosize(stats.write_bytes), stats.queue_depth, stats.utilisation)
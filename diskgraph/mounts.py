@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Module for finding mounted file systems from /proc/self/mountinfo and their
+sizes with statvfs, without running df. Part of the diskgraph utility.
+
+df stats every mount, so a single stale NFS or FUSE mount makes it hang and the
+file systems are lost from the graph. Here, mounts that aren't backed by a block
+device (network, FUSE and pseudo file systems) are skipped before any system
+call is made, and the statvfs calls for the rest run in a small pool of threads,
+where a call that doesn't return in time is given up on.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import re
+import time
+import threading
+import Queue
+from timing import profiler
+
+__all__ = [
+    "Mount",
+    "parse_mountinfo",
+    "is_block_mount",
+    "statvfs_all",
+]
+
+MOUNTINFO = "/proc/self/mountinfo"
+STATVFS_WORKERS = 4
+STATVFS_TIMEOUT = 5
+
+# File systems that are mounted from a device path but aren't on a local block
+# device, or whose statvfs goes through a user space daemon.
+NETWORK_FS_TYPES = frozenset(["nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "ceph", "glusterfs",
+                              "lustre", "9p", "fuse", "fuseblk"])
+
+class Mount(object):
+    __slots__ = ("devno", "source", "mount_point", "fs_type")
+
+    def __init__(self, devno, source, mount_point, fs_type):
+        self.devno = devno
+        self.source = source
+        self.mount_point = mount_point
+        self.fs_type = fs_type
+
+def unescape(field):
+    """Undo the octal escaping of spaces, tabs, newlines and backslashes in
+    mountinfo fields."""
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+def parse_mountinfo(text):
+    """Parse the contents of /proc/self/mountinfo. Each line is
+
+        id parent major:minor root mount_point options [optional...] - type source super_options
+
+    Returns a list of Mount objects, in mount order.
+    """
+    mounts = []
+    for line in text.splitlines():
+        parts = line.split()
+        if not "-" in parts:
+            continue
+        sep = parts.index("-")
+        major, minor = parts[2].split(":")
+        mounts.append(Mount((int(major), int(minor)), unescape(parts[sep + 2]), unescape(parts[4]),
+                            parts[sep + 1]))
+    return mounts
+
+def is_block_mount(mount):
+    """Tell whether the mount is of a file system on a local block device, which
+    is what statvfs can be trusted not to hang on."""
+    fs_type = mount.fs_type.split(".", 1)[0]
+    return mount.source.startswith("/dev/") and not fs_type in NETWORK_FS_TYPES
+
+def statvfs_all(paths, workers=STATVFS_WORKERS, timeout=STATVFS_TIMEOUT, statvfs=os.statvfs):
+    """Call statvfs for each path in at most workers threads. Return a dict from
+    path to the statvfs result, for the calls that succeeded within timeout
+    seconds of being started. A call that hangs ties up its thread for good, so
+    when all threads hang, the paths that are left are given up on.
+    """
+    tasks = Queue.Queue()
+    for path in paths:
+        tasks.put(path)
+    done = Queue.Queue()
+    started = {}
+
+    def work():
+        while True:
+            try:
+                path = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            started[path] = time.time()
+            try:
+                result = statvfs(path)
+            except OSError:
+                result = None
+            done.put((path, result))
+
+    threads = [threading.Thread(target=work, name="statvfs") for _ in range(min(workers, len(paths)))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    results = {}
+    finished = set()
+    hung = set()
+    while len(finished) < len(set(paths)):
+        running = [t for p, t in started.items() if not p in finished]
+        wait = min(running) + timeout - time.time() if running else timeout
+        try:
+            path, result = done.get(timeout=max(wait, 0))
+        except Queue.Empty:
+            now = time.time()
+            for p, t in started.items():
+                if not p in finished and now - t >= timeout:
+                    finished.add(p)
+                    hung.add(p)
+            if len(hung) >= len(threads):
+                break
+            continue
+        if path in hung:
+            # too late, but its thread is free again
+            hung.discard(path)
+            continue
+        finished.add(path)
+        if result is not None:
+            results[path] = result
+    profiler.count("statvfs_timeouts", len(set(paths)) - len(finished) + len(hung))
+    return results
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Module for answering questions such as "what is stacked on /dev/sdf?" or
+"which disk backs /srv?" from a graph, without rendering it. Part of the
+diskgraph utility.
+
+A DeviceIndex maps the ways a user may name a node to the node: device names
+(sdf1, md0, dm-3), /dev paths, /dev/mapper paths, /dev/<vg>/<lv> paths, VG
+names, mount points and major:minor pairs. The index is built in one pass over
+the graph, after which a lookup is a dict lookup and a query costs only the
+size of its answer.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+from sysinfo import *
+from sysinfo import tosize
+from diskgraph import node_dict
+from timing import profiler
+
+__all__ = [
+    "DeviceIndex",
+    "format_text",
+    "ABOVE",
+    "BELOW",
+]
+
+# Directions of a query: the nodes stacked on a node, or those it sits on.
+ABOVE = "above"
+BELOW = "below"
+
+def devno_key(devno):
+    return "%d:%d" % tuple(devno)
+
+def lookup_keys(node):
+    """Return the names under which the node can be looked up, including its
+    major:minor device number if it is known."""
+    keys = name_keys(node)
+    devno = getattr(node, "kernel_major_minor", None)
+    if devno:
+        keys.append(devno_key(devno))
+    return keys
+
+def name_keys(node):
+    if isinstance(node, (Partition, RaidArray)):
+        return [node.name, "/dev/%s" % node.name]
+    if isinstance(node, DeviceMapper):
+        return [node.kernel_name, "/dev/%s" % node.kernel_name, "/dev/mapper/%s" % node.name]
+    if isinstance(node, LvmLogicalVolume):
+        return ["/dev/mapper/%s" % node.mapper_name(), "/dev/%s/%s" % (node.vg_name, node.name),
+                "%s/%s" % (node.vg_name, node.name)]
+    if isinstance(node, MountedFileSystem):
+        return [node.name]
+    if isinstance(node, LvmVolumeGroup):
+        return [node.name]
+    return []
+
+class DeviceIndex(object):
+    def __init__(self, dg):
+        self.dg = dg
+        self._nodes = {}
+        with profiler.timer("query.index"):
+            # block devices first, so that they win over e.g. a VG of the same name
+            block_devices = []
+            others = []
+            for v in dg.visit(dg.root):
+                if isinstance(v, (Partition, RaidArray, DeviceMapper, LvmLogicalVolume)):
+                    block_devices.append(v)
+                else:
+                    others.append(v)
+            for v in block_devices + others:
+                for key in lookup_keys(v):
+                    self._nodes.setdefault(key, v)
+
+    def find(self, spec):
+        """Return the node named by spec, or None if there is none."""
+        node = self._nodes.get(spec)
+        if node is None and len(spec) > 1:
+            node = self._nodes.get(spec.rstrip("/"))
+        if node is None and spec.startswith("/dev/"):
+            # e.g. /dev/disk/by-id/... or /dev/vg/lv, which are symlinks
+            node = self._nodes.get(os.path.realpath(spec))
+        return node
+
+    def above(self, node):
+        """Return the nodes stacked on the node, directly or indirectly."""
+        return list(self.dg.descendants(node))
+
+    def below(self, node):
+        """Return the nodes that the node sits on, directly or indirectly."""
+        return [v for v in self.dg.ancestors(node) if v is not self.dg.root]
+
+    def query(self, spec, directions=(ABOVE, BELOW), rollup=False):
+        """Return the answer to a query as a dict, suitable for JSON: the node
+        named by spec and, for each direction, the nodes in that direction.
+        With rollup, the node also has its rolled up figures, and if the graph
+        has I/O figures (see DiskGraph.set_iostats), the node has those.
+        Raises KeyError if no node is named by spec.
+        """
+        node = self.find(spec)
+        if node is None:
+            raise KeyError(spec)
+        figures = self.dg.rollup().get(node) if rollup else None
+        result = {"query": spec, "node": node_dict(node, figures, self.dg.io().get(node))}
+        for direction in directions:
+            nodes = self.above(node) if direction == ABOVE else self.below(node)
+            result[direction] = [node_dict(v) for v in nodes]
+        return result
+
+def describe(d):
+    """Return a line of text describing a node dict."""
+    s = "%s %s" % (d["typename"], d["name"])
+    if "byte_size" in d:
+        s += " (%s)" % tosize(d["byte_size"])
+    if "rollup" in d:
+        figures = d["rollup"]
+        s += ", %s allocated, %s free" % (tosize(figures["allocated"]), tosize(figures["free"]))
+        if figures["fs_size"]:
+            s += ", file systems %s of %s used" % (tosize(figures["fs_used"]), tosize(figures["fs_size"]))
+    if "io" in d:
+        io = d["io"]
+        s += ", %.0f IOPS, %.0f%% busy" % (io["iops"], io["utilisation"])
+    return s
+
+def format_text(result):
+    """Return the answer to a query (see DeviceIndex.query) as text."""
+    lines = [describe(result["node"])]
+    for direction, title in ((ABOVE, "Stacked on it:"), (BELOW, "Sits on:")):
+        if direction in result:
+            lines.append(title)
+            lines += ["  %s" % describe(d) for d in result[direction]] or ["  nothing"]
+    return "\n".join(lines)
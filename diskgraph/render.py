@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Module for rendering graphs with Graphviz, reusing previously rendered images
+when the graph hasn't changed. Part of the diskgraph utility.
+
+Rendered images are kept in a cache directory, named by a hash of the DOT text of
+the graph and the output format. The cache is bounded in size; the least recently
+used images are removed when it grows too large.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import shutil
+import tempfile
+import hashlib
+import dot
+from timing import profiler
+
+__all__ = [
+    "RenderCache",
+    "render_dot",
+    "render_targets",
+    "render_bytes",
+    "format_of",
+    "default_cache_dir",
+]
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "diskgraph")
+
+def digest(text):
+    return hashlib.sha1(text).hexdigest()
+
+class RenderCache(object):
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, "%s.%s" % (key, fmt))
+
+    def fetch(self, key, fmt, fn):
+        """Copy the cached image for the key and format to fn, if there is one.
+        Returns whether there was.
+        """
+        path = self.path(key, fmt)
+        try:
+            shutil.copyfile(path, fn)
+        except IOError:
+            return False
+        # mark as recently used
+        os.utime(path, None)
+        return True
+
+    def store(self, key, fmt, fn):
+        """Store a copy of the image in fn in the cache."""
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # created by another thread or process meanwhile
+                if not os.path.isdir(self.directory):
+                    raise
+        path = self.path(key, fmt)
+        # a temporary file of its own, since threads may store the same image at once
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            shutil.copyfile(fn, tmp)
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used images until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # being stored by another thread or process
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+def format_of(fn, default="png"):
+    """Return the output format for a file name, given by its extension."""
+    ext = os.path.splitext(fn)[1]
+    return ext[1:].lower() if ext else default
+
+def render_targets(text, targets, cache=None):
+    """Render the graph in the DOT text with Graphviz to a number of (file name,
+    format) targets. Targets for which the cache has an image of the same graph
+    are copied from there. If more than one target needs rendering, the graph is
+    laid out once and the targets are rendered from that layout in parallel.
+    Returns the file names of the targets that came from the cache.
+    """
+    key = digest(text)
+    cached = [fn for fn, fmt in targets if cache and cache.fetch(key, fmt, fn)]
+    missing = [(fn, fmt) for fn, fmt in targets if not fn in cached]
+    with profiler.timer("render"):
+        if len(missing) == 1:
+            dot.render(lambda out: out.write(text), missing[0][0], missing[0][1])
+        elif missing:
+            dot.render_laid_out(dot.layout(lambda out: out.write(text)), missing)
+    profiler.count("rendered", len(missing))
+    profiler.count("reused", len(cached))
+    if cache:
+        for fn, fmt in missing:
+            cache.store(key, fmt, fn)
+    return cached
+
+def render_dot(text, fn, fmt="png", cache=None):
+    """Render the graph in the DOT text to the file fn with Graphviz, unless the
+    cache has an image of the same graph. Returns True if the image came from
+    the cache.
+    """
+    return bool(render_targets(text, [(fn, fmt)], cache))
+
+def render_bytes(text, fmt="png", cache=None):
+    """Render the graph in the DOT text and return the image."""
+    fd, fn = tempfile.mkstemp(suffix=".%s" % fmt)
+    os.close(fd)
+    try:
+        render_targets(text, [(fn, fmt)], cache)
+        with open(fn, "rb") as image:
+            return image.read()
+    finally:
+        os.remove(fn)
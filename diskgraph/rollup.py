@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Module for rolling up capacity figures over a graph. Part of the diskgraph
+utility.
+
+Every node gets the following figures, in bytes:
+
+    capacity   the size of the node itself (for the root, that of all disks)
+    allocated  how much of the node the nodes directly on it use
+    free       the unallocated space on the node and everything stacked on it,
+               i.e. free space on disks and in volume groups
+    fs_size    the size of the file systems mounted on or above the node
+    fs_used    how much of those file systems is used
+
+The figures are computed in a single post-order traversal, where each node's
+figures are derived from those of its heads. Free space and file systems
+reachable along more than one path (e.g. a VG whose PVs are on RAID arrays on
+the same disks) are counted once, and a file system mounted at several places
+(bind mounts) is counted once. To do that without a set per vertex, vertices
+share sets of contributors and their totals where they can (see Contributors).
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+from sysinfo import *
+from sysinfo import tosize
+from timing import profiler
+
+__all__ = [
+    "Figures",
+    "rollup",
+    "rollup_text",
+]
+
+class Figures(object):
+    __slots__ = ("capacity", "allocated", "free", "fs_size", "fs_used")
+
+    def __init__(self, capacity, allocated, free, fs_size, fs_used):
+        self.capacity = capacity
+        self.allocated = allocated
+        self.free = free
+        self.fs_size = fs_size
+        self.fs_used = fs_used
+
+    def asdict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+def post_order(graph):
+    """Return the vertices of the graph, each after all of its heads."""
+    visited = set([graph.root])
+    stack = [(graph.root, iter(graph.headsFor(graph.root)))]
+    order = []
+    while stack:
+        v, heads = stack[-1]
+        for h in heads:
+            if not h in visited:
+                visited.add(h)
+                stack.append((h, iter(graph.headsFor(h))))
+                break
+        else:
+            stack.pop()
+            order.append(v)
+    return order
+
+def free_of(node, capacity, allocated):
+    """Return the unallocated space of the node itself."""
+    if isinstance(node, LvmVolumeGroup):
+        return node.free_space
+    if (isinstance(node, Partition) and node.is_disk()) or (isinstance(node, DeviceMapper) and node.path_count):
+        return capacity - allocated
+    return 0
+
+class Contributors(object):
+    """The free space owners and file systems on or above a vertex, as a base
+    set shared by many vertices plus the few extra ones of this vertex. Sets
+    are only merged where paths with different bases rejoin, and a base is
+    summed up once, however many vertices share it."""
+    __slots__ = ("base", "extra")
+
+    def __init__(self, base=frozenset(), extra=frozenset()):
+        self.base = base
+        self.extra = extra
+
+    def __nonzero__(self):
+        return bool(self.base or self.extra)
+
+def merge(parts, own):
+    """Return the Contributors that are the union of those in parts and the
+    contributors in own, reusing one of parts if the others and own add
+    nothing to it."""
+    parts = dict((id(p), p) for p in parts if p).values()
+    if not own and len(parts) == 1:
+        return parts[0]
+    bases = dict((id(p.base), p.base) for p in parts if p.base).values()
+    base = max(bases, key=len) if bases else frozenset()
+    extra = frozenset(own).union(*[p.extra for p in parts])
+    others = [b for b in bases if b is not base]
+    if not all(b <= base for b in others):
+        return Contributors(base.union(extra, *others))
+    if others:
+        extra -= base
+    if len(extra) > len(base):
+        # rebase, so that each vertex copies no more than it adds
+        return Contributors(base | extra)
+    return Contributors(base, extra)
+
+def totals(found, own_free):
+    """Return the free space, file system size and file system usage of the
+    contributors in found, and the file systems among them by path."""
+    free = sum(own_free.get(c, 0) for c in found)
+    file_systems = dict((c.path, c) for c in found if isinstance(c, MountedFileSystem))
+    return (free, sum(fs.byte_size for fs in file_systems.values()),
+            sum(fs.used_size or 0 for fs in file_systems.values()), file_systems)
+
+def rollup(graph):
+    """Return a dict from each vertex of the graph to its Figures. FreeSpace
+    vertices are left out, since their space counts as free on their owners.
+    """
+    figures = {}
+    contributors = {}
+    own_free = {}
+    # the totals of each base, by identity
+    base_totals = {}
+    with profiler.timer("rollup"):
+        for v in post_order(graph):
+            if isinstance(v, FreeSpace):
+                continue
+            heads = [h for h in graph.headsFor(v) if not isinstance(h, FreeSpace)]
+            if hasattr(v, "byte_size"):
+                capacity = v.byte_size or 0
+                if isinstance(v, LvmVolumeGroup):
+                    allocated = capacity - v.free_space
+                else:
+                    allocated = min(capacity, sum(getattr(h, "byte_size", 0) or 0 for h in heads))
+            else:
+                # the root, or a host of a fleet
+                capacity = sum(figures[h].capacity for h in heads)
+                allocated = sum(figures[h].allocated for h in heads)
+            own = []
+            free = free_of(v, capacity, allocated)
+            if free > 0 or isinstance(v, MountedFileSystem):
+                own_free[v] = max(free, 0)
+                own.append(v)
+            found = contributors[v] = merge([contributors[h] for h in heads], own)
+            shared = [h for h in heads if contributors[h] is found]
+            if shared:
+                f = figures[shared[0]]
+                figures[v] = Figures(capacity, allocated, f.free, f.fs_size, f.fs_used)
+                continue
+            key = id(found.base)
+            if key not in base_totals:
+                base_totals[key] = totals(found.base, own_free)
+            free, fs_size, fs_used, file_systems = base_totals[key]
+            more_free, _, _, more_file_systems = totals(found.extra, own_free)
+            more_file_systems = [fs for path, fs in more_file_systems.items() if not path in file_systems]
+            figures[v] = Figures(capacity, allocated, free + more_free,
+                                 fs_size + sum(fs.byte_size for fs in more_file_systems),
+                                 fs_used + sum(fs.used_size or 0 for fs in more_file_systems))
+    profiler.count("rollup_nodes", len(figures))
+    return figures
+
+def rollup_text(figures):
+    """Return a line of text with the free space and file system usage in the
+    figures, for node labels, or None if there is nothing to tell."""
+    if figures is None:
+        return None
+    parts = []
+    if figures.fs_size:
+        parts.append("used %s of %s" % (tosize(figures.fs_used), tosize(figures.fs_size)))
+    if figures.free:
+        parts.append("free %s" % tosize(figures.free))
+    return ", ".join(parts) or None
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Module with an HTTP server that serves the graph as an image, collecting
+information and rendering only when the graph is asked for. Part of the
+diskgraph utility.
+
+The graph is served at /graph.png, /graph.svg and /graph.json (Graphviz JSON).
+The collected graph is reused for a number of seconds (the TTL), and requests
+that arrive while information is being collected wait for that collection
+rather than starting their own. Responses carry an ETag, which is a hash of the
+graph and so stays the same as long as the topology does, and a Last-Modified
+time, which is when the topology last changed. A browser that polls with
+If-None-Match or If-Modified-Since gets a 304 response, without anything being
+rendered.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import time
+import threading
+import BaseHTTPServer
+import SocketServer
+from email.utils import formatdate, parsedate_tz, mktime_tz
+from diskgraph import DiskGraph
+from render import digest, render_bytes
+from timing import profiler
+
+__all__ = [
+    "GraphService",
+    "GraphServer",
+    "serve",
+]
+
+DEFAULT_BIND = "127.0.0.1"
+DEFAULT_PORT = 8090
+DEFAULT_TTL = 60
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "json": "application/json",
+}
+
+INDEX = """<!DOCTYPE html>
+<html><head><title>diskgraph</title></head>
+<body><img src="graph.svg" alt="diskgraph"></body></html>
+"""
+
+class GraphService(object):
+    """Collects and renders the graph on demand, for the request handlers.
+
+    collect is called without arguments and returns a SysInfo; build is called
+    with the SysInfo and returns the graph; render is called with DOT text and a
+    format and returns the rendered image. clock returns the current time in
+    seconds.
+    """
+    def __init__(self, collect, render=render_bytes, ttl=DEFAULT_TTL, clock=time.time, build=DiskGraph):
+        self.collect = collect
+        self.build = build
+        self.render = render
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._text = None
+        self._etag = None
+        self._collected = None
+        self._modified = None
+        self._images = {}
+        self._render_locks = {}
+
+    def _refresh(self):
+        if self._collected is not None and self.clock() - self._collected < self.ttl:
+            return
+        text = self.build(self.collect()).dottext()
+        self._collected = self.clock()
+        etag = digest(text)
+        if etag != self._etag:
+            self._text = text
+            self._etag = etag
+            self._modified = self._collected
+            self._images = {}
+
+    def current(self):
+        """Return the ETag and modification time of the graph, collecting
+        information if the graph is older than the TTL. Concurrent callers
+        share one collection.
+        """
+        with self._lock:
+            self._refresh()
+            return self._etag, self._modified
+
+    def image(self, fmt):
+        """Return a tuple of the graph rendered in the given format, its ETag
+        and its modification time. Images are rendered once per topology.
+        """
+        with self._lock:
+            self._refresh()
+            text, etag, modified, images = self._text, self._etag, self._modified, self._images
+            render_lock = self._render_locks.setdefault(fmt, threading.Lock())
+        # Rendering is slow, so only requests for the same format wait for it.
+        # If the graph changes meanwhile, the image goes to the old cache.
+        with render_lock:
+            if not fmt in images:
+                with profiler.timer("serve.render"):
+                    images[fmt] = self.render(text, fmt)
+            return images[fmt], etag, modified
+
+class GraphRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    server_version = "diskgraph/%s" % __version__
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/index.html"):
+            self.respond(200, "text/html", INDEX)
+            return
+        fmt = path[len("/graph."):] if path.startswith("/graph.") else None
+        if not fmt in CONTENT_TYPES:
+            self.send_error(404)
+            return
+        service = self.server.service
+        try:
+            etag, modified = service.current()
+            if self.not_modified(etag, modified):
+                self.send_response(304)
+                self.send_validators(etag, modified)
+                self.end_headers()
+                return
+            body, etag, modified = service.image(fmt)
+        except Exception, e:
+            self.send_error(500, "Creating the graph failed: %s" % e)
+            return
+        self.respond(200, CONTENT_TYPES[fmt], body, etag, modified)
+
+    def not_modified(self, etag, modified):
+        if_none_match = self.headers.getheader("If-None-Match")
+        if if_none_match is not None:
+            return '"%s"' % etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.getheader("If-Modified-Since")
+        if if_modified_since is not None:
+            since = parsedate_tz(if_modified_since)
+            return since is not None and int(modified) <= mktime_tz(since)
+        return False
+
+    def send_validators(self, etag, modified):
+        self.send_header("ETag", '"%s"' % etag)
+        self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+        # always check with the server, which is cheap thanks to the validators
+        self.send_header("Cache-Control", "no-cache")
+
+    def respond(self, code, content_type, body, etag=None, modified=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_validators(etag, modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+class GraphServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """HTTP server that handles each request in a thread of its own."""
+    daemon_threads = True
+
+    def __init__(self, address, service, handler=GraphRequestHandler):
+        BaseHTTPServer.HTTPServer.__init__(self, address, handler)
+        self.service = service
+
+def serve(service, bind=DEFAULT_BIND, port=DEFAULT_PORT):
+    server = GraphServer((bind, port), service)
+    print "Serving the graph at http://%s:%d/" % (bind or "localhost", server.server_port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
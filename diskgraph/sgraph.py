@@ -12,6 +12,8 @@ __author__ = "Per Rovegård"
 __version__ = "1.2"
 __license__ = "BSD-3-Clause"
 
+from itertools import islice
+
 __all__ = [
     "SimpleGraph"
 ]
@@ -24,6 +26,9 @@ class SimpleGraph(object):
     def __init__(self, headfinder, root):
         self._headfinder = headfinder
         self._graph = {}
+        self._tails = {}
+        # the tails of each vertex as a set too, for membership checks
+        self._tail_sets = {}
         self._build(root)
         self._root = root
 
@@ -33,7 +38,7 @@ class SimpleGraph(object):
 
     @property
     def order(self):
-        return len(self._graph.keys())
+        return len(self._graph)
 
     def _build(self, root):
         self._graph[root] = []
@@ -41,40 +46,69 @@ class SimpleGraph(object):
             heads = self._headfinder(v)
             for h in heads:
                 self._graph[v].append(h)
-                if not h in self._graph.keys():
+                self._addTail(h, v)
+                if not h in self._graph:
                     # not seen this one before
                     self._graph[h] = []
 
+    def _addTail(self, vertex, tail):
+        tail_set = self._tail_sets.setdefault(vertex, set())
+        if not tail in tail_set:
+            tail_set.add(tail)
+            self._tails.setdefault(vertex, []).append(tail)
+
+    def _removeTail(self, vertex, tail):
+        tail_set = self._tail_sets.get(vertex)
+        if tail_set and tail in tail_set:
+            tail_set.remove(tail)
+            self._tails[vertex].remove(tail)
+
+    def _walk(self, start, neighbours):
+        visited = set()
+        stack = [start]
+        while stack:
+            v = stack.pop()
+            if v in visited:
+                continue
+            visited.add(v)
+            yield v
+            # push in reverse so that the first neighbour is popped first
+            stack.extend(n for n in reversed(neighbours(v)) if not n in visited)
+
     def visit(self, start):
         """Visit the graph starting at the given vertex. This is a generator
         function that will return each visited vertex in turn. The graph is 
         visited using the DFS algorithm and heads are visited left-to-right
         (i.e. first-to-last).
         """
-        visited = []
-        vertices = [start]
-        while vertices:
-            v = vertices.pop(0)
-            visited.append(v)
-            yield v
-            heads = [h for h in self.headsFor(v) if not h in visited]
-            vertices = heads + vertices
+        return self._walk(start, self.headsFor)
+
+    def descendants(self, vertex):
+        """Return a generator of all vertices reachable from the given vertex,
+        in DFS order, excluding the vertex itself.
+        """
+        return islice(self._walk(vertex, self.headsFor), 1, None)
+
+    def ancestors(self, vertex):
+        """Return a generator of all vertices from which the given vertex can be
+        reached, in DFS order over the tails, excluding the vertex itself.
+        """
+        return islice(self._walk(vertex, self.tailsFor), 1, None)
 
     def visitEdges(self, start):
         """Visit the edges in the graph starting at the given vertex. This is
         a generated function that will return each visited edge in turn.
         """
-        visited = []
-        queue = [(None, start)]
-        while queue:
-            e = queue.pop(0)
+        visited = set()
+        stack = [(None, start)]
+        while stack:
+            e = stack.pop()
             if e[0]:
                 yield e
             if e[1] in visited:
                 continue
-            visited.append(e[1])
-            edges = [(e[1], h) for h in self.headsFor(e[1])]
-            queue = edges + queue
+            visited.add(e[1])
+            stack.extend((e[1], h) for h in reversed(self.headsFor(e[1])))
 
     def headsFor(self, vertex):
         """Return a list of the heads of the given vertex, i.e. the vertices (if
@@ -86,7 +120,7 @@ class SimpleGraph(object):
         """Return a list of the tails of the given vertex, i.e. the vertices (if
         any) that are on the opposite end of any edges terminating in the given
         vertex."""
-        return [v for v in self._graph.keys() if vertex in self._graph[v]]
+        return self._tails.get(vertex, [])
 
     def addHead(self, vertex, head):
         """Add a head for a given vertex. This effectively also adds an edge from
@@ -94,5 +128,26 @@ class SimpleGraph(object):
         """
         heads = self._graph[vertex]
         heads.append(head)
+        self._addTail(head, vertex)
 
+    def setHeads(self, vertex, heads):
+        """Replace the heads of the given vertex, adding the vertex to the graph
+        if it's not already there. Heads that aren't vertices in the graph are
+        not added as vertices.
+        """
+        for h in self._graph.get(vertex, []):
+            self._removeTail(h, vertex)
+        self._graph[vertex] = []
+        for h in heads:
+            self._graph[vertex].append(h)
+            self._addTail(h, vertex)
 
+    def removeVertex(self, vertex):
+        """Remove the given vertex from the graph, along with all edges from and
+        to it.
+        """
+        for h in self._graph.pop(vertex, []):
+            self._removeTail(h, vertex)
+        self._tail_sets.pop(vertex, None)
+        for t in self._tails.pop(vertex, []):
+            self._graph[t] = [h for h in self._graph[t] if h != vertex]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Module for saving the objects collected by the sysinfo module to a snapshot file,
+and for loading them again. A graph can then be created from a snapshot instead of
+by collecting information from the system, e.g. on another machine. Part of the
+diskgraph utility.
+
+A snapshot is a JSON document, gzip'd if the file name ends with .gz:
+
+{"format": "diskgraph-snapshot", "version": 1, "created": <seconds since epoch>,
+ "missing": [<names of collectors that timed out>],
+ "objects": [[<type name>, <field value>, ...], ...]}
+
+where the field values are those of the fields of the type, in order.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import gzip
+import json
+import time
+from sysinfo import *
+from sysinfo import intern_name
+
+__all__ = [
+    "save",
+    "load",
+    "is_fresh",
+]
+
+FORMAT = "diskgraph-snapshot"
+VERSION = 1
+
+# The object types that can be stored in a snapshot, by name.
+TYPES = dict((cls.__name__, cls) for cls in
+             [Partition, LvmPhysicalVolume, LvmVolumeGroup, LvmLogicalVolume, RaidArray, DeviceMapper,
+              MountedFileSystem, SwapArea])
+
+# Fields that are tuples; JSON turns them into lists.
+TUPLE_FIELDS = set(["kernel_major_minor", "pv_names", "partition_names", "slave_names"])
+
+def open_snapshot(fn, mode, compressed):
+    if compressed:
+        return gzip.open(fn, mode)
+    return open(fn, mode)
+
+def to_str(value):
+    """Turn the unicode strings that json returns into plain strings, like the
+    ones the collectors produce."""
+    if isinstance(value, unicode):
+        return intern_name(value)
+    if isinstance(value, list):
+        return [to_str(v) for v in value]
+    return value
+
+def save(sysinfo, fn):
+    doc = {
+        "format": FORMAT,
+        "version": VERSION,
+        "created": time.time(),
+        "missing": sysinfo.missing,
+        "objects": [[o.__class__.__name__] + list(o.state()) for o in sysinfo.objects],
+    }
+    # write to a temporary file and rename, so that readers never see half a snapshot
+    tmp = "%s.%d.tmp" % (fn, os.getpid())
+    with open_snapshot(tmp, "wb", fn.endswith(".gz")) as fd:
+        json.dump(doc, fd, separators=(",", ":"))
+    os.rename(tmp, fn)
+
+def load_object(record):
+    cls = TYPES.get(record[0])
+    if cls is None:
+        raise ValueError("Unknown object type in snapshot: %s" % record[0])
+    values = [to_str(v) for v in record[1:]]
+    return cls.from_state([tuple(v) if f in TUPLE_FIELDS and v is not None else v
+                           for f, v in zip(cls.fields, values)])
+
+def load(fn):
+    """Load a snapshot, and return a SysInfo with its objects."""
+    with open_snapshot(fn, "rb", fn.endswith(".gz")) as fd:
+        doc = json.load(fd)
+    if doc.get("format") != FORMAT:
+        raise ValueError("%s is not a diskgraph snapshot" % fn)
+    if doc.get("version") != VERSION:
+        raise ValueError("Unsupported snapshot version %s in %s" % (doc.get("version"), fn))
+    return SysInfo.from_objects([load_object(r) for r in doc["objects"]], to_str(doc.get("missing", [])))
+
+def is_fresh(fn, max_age):
+    """Check whether the snapshot file exists and is younger than max_age seconds."""
+    try:
+        return time.time() - os.path.getmtime(fn) < max_age
+    except OSError:
+        return False
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Module for coloring the nodes of a graph, either by type (the colors table)
+or by a metric, so that full file systems, degraded arrays and busy disks stand
+out. Part of the diskgraph utility.
+
+The metrics are:
+
+    full       how full the file systems on or above the node are
+    free       the share of the node that is free, unallocated or in the file
+               systems on or above it
+    io         how busy the device of the node was (needs I/O figures)
+    degraded   the share of the devices of a RAID array that are missing
+
+A metric value between 0 and 1 is turned into a color by a scale: either
+thresholds (e.g. orange above 80% and red above 90%) or a gradient between two
+colors. Nodes without a value, or below the first threshold, get their color
+by type.
+
+A Styler computes the colors of all nodes in one pass, a class at a time: the
+colors table is looked up once per class, and a metric computes the values of
+all nodes of a class at once.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import re
+from sysinfo import *
+from timing import profiler
+
+__all__ = [
+    "colors",
+    "color_dict",
+    "Threshold",
+    "Gradient",
+    "Metric",
+    "METRICS",
+    "Styler",
+    "parse_thresholds",
+    "parse_gradient",
+]
+
+colors = {
+    Partition: lambda p: "gold" if p.is_disk() else "chartreuse1",
+    RaidArray: "cadetblue",
+    LvmPhysicalVolume: "chocolate",
+    LvmVolumeGroup: "coral",
+    LvmLogicalVolume: "mediumorchid1",
+    DeviceMapper: lambda d: "gold" if d.path_count else "plum",
+    MountedFileSystem: ("navy", "white"),
+    FreeSpace: ("red", "white"),
+    SwapArea: "mediumslateblue",
+}
+
+def get_color(node, c):
+    if isinstance(c, basestring):
+        return c
+    else:
+        return c(node)
+
+def get_fillcolor(node):
+    c = colors.get(node.__class__)
+    if c:
+        if isinstance(c, tuple):
+            # (fillcolor, fontcolor)
+            return get_color(node, c[0])
+        return get_color(node, c)
+
+def get_fontcolor(node):
+    c = colors.get(node.__class__)
+    if isinstance(c, tuple):
+        # (fillcolor, fontcolor)
+        return get_color(node, c[1])
+
+def color_attributes(fillc, fontc=None):
+    d = {}
+    if fillc:
+        d["style"] = "filled"
+        d["fillcolor"] = fillc
+    if fontc:
+        d["fontcolor"] = fontc
+    return d
+
+def color_dict(node):
+    """Return the color attributes of the node, by its type."""
+    return color_attributes(get_fillcolor(node), get_fontcolor(node))
+
+def class_colors(cls, nodes, table, shared):
+    """Return the color attributes of the nodes, which are all of the given
+    class, by the colors table. Nodes with the same colors share attributes,
+    which are kept in the dict shared."""
+    c = table.get(cls)
+    fillc, fontc = c if isinstance(c, tuple) else (c, None)
+    if not callable(fillc) and not callable(fontc):
+        return [shared_attributes(shared, fillc, fontc)] * len(nodes)
+    return [shared_attributes(shared, get_color(n, fillc) if fillc else None, get_color(n, fontc) if fontc else None)
+            for n in nodes]
+
+def shared_attributes(shared, fillc, fontc=None):
+    d = shared.get((fillc, fontc))
+    if d is None:
+        d = shared[(fillc, fontc)] = color_attributes(fillc, fontc)
+    return d
+
+class Threshold(object):
+    """Scale that gives the color of the highest limit the value is above (or,
+    with below, of the lowest limit it is below). steps is a list of (limit,
+    color), in any order."""
+    def __init__(self, steps, below=False):
+        # the limit that matters most last
+        self.steps = sorted(steps, key=lambda step: step[0], reverse=below)
+        self.below = below
+
+    def color(self, value):
+        result = None
+        for limit, color in self.steps:
+            if (value < limit) if self.below else (value > limit):
+                result = color
+        return result
+
+class Gradient(object):
+    """Scale that blends from one color (at 0) to another (at 1). The colors
+    are given as #rrggbb."""
+    def __init__(self, start, end):
+        self.start = rgb(start)
+        self.end = rgb(end)
+
+    def color(self, value):
+        value = min(max(value, 0.0), 1.0)
+        return "#%02x%02x%02x" % tuple(int(round(s + (e - s) * value)) for s, e in zip(self.start, self.end))
+
+HEX_COLOR = re.compile("^#[0-9a-fA-F]{6}$")
+
+def rgb(color):
+    if not HEX_COLOR.match(color):
+        raise ValueError("Not a #rrggbb color: %s" % color)
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+GREEN = "#33cc33"
+RED = "#ff0000"
+
+def fs_full(nodes, graph):
+    return [float(n.used_size) / n.byte_size if n.byte_size and n.used_size is not None else None for n in nodes]
+
+def fs_free(nodes, graph):
+    return [1 - v if v is not None else None for v in fs_full(nodes, graph)]
+
+def rolled_up_full(nodes, graph):
+    figures = graph.rollup()
+    values = []
+    for n in nodes:
+        f = figures.get(n)
+        values.append(float(f.fs_used) / f.fs_size if f is not None and f.fs_size else None)
+    return values
+
+def rolled_up_free(nodes, graph):
+    # Space that is allocated but neither free nor in a file system (e.g. swap
+    # or an unmounted LV) tells nothing, so nodes with only such space have no
+    # value. Space shared along several paths may make the sum exceed the capacity.
+    figures = graph.rollup()
+    values = []
+    for n in nodes:
+        f = figures.get(n)
+        if f is None or not f.capacity or not (f.free or f.fs_size):
+            values.append(None)
+        else:
+            values.append(min(1.0, float(f.free + f.fs_size - f.fs_used) / f.capacity))
+    return values
+
+def io_utilisation(nodes, graph):
+    io = graph.io()
+    values = []
+    for n in nodes:
+        s = io.get(n)
+        values.append(s.utilisation / 100.0 if s is not None else None)
+    return values
+
+def raid_degradation(nodes, graph):
+    return [n.degradation() for n in nodes]
+
+class Metric(object):
+    """A metric: functions that compute the values of a list of nodes of one
+    class (given the nodes and the graph), by class, plus a function for other
+    classes (or None if they have no value). low_is_bad tells which way the
+    default gradient goes."""
+    def __init__(self, by_class, default, thresholds, low_is_bad=False):
+        self.by_class = by_class
+        self.default = default
+        self.thresholds = thresholds
+        self.low_is_bad = low_is_bad
+
+    def values(self, cls, nodes, graph):
+        values_of = self.by_class.get(cls, self.default)
+        if values_of is None:
+            return [None] * len(nodes)
+        return values_of(nodes, graph)
+
+    def gradient(self):
+        return Gradient(RED, GREEN) if self.low_is_bad else Gradient(GREEN, RED)
+
+METRICS = {
+    "full": Metric({MountedFileSystem: fs_full, FreeSpace: None}, rolled_up_full,
+                   Threshold([(0.8, "orange"), (0.9, "red")])),
+    "free": Metric({MountedFileSystem: fs_free, FreeSpace: None}, rolled_up_free,
+                   Threshold([(0.2, "orange"), (0.1, "red")], below=True), low_is_bad=True),
+    "io": Metric({FreeSpace: None}, io_utilisation, Threshold([(0.5, "orange"), (0.8, "red")])),
+    "degraded": Metric({RaidArray: raid_degradation}, None, Threshold([(0, "red")])),
+}
+
+class Styler(object):
+    """Computes the color attributes of the nodes of a graph, by type or, given
+    a metric name (see METRICS), by metric. scale is a Threshold or Gradient;
+    by default the thresholds of the metric."""
+    def __init__(self, metric=None, scale=None, table=colors):
+        self.metric = METRICS[metric] if metric is not None else None
+        self.scale = scale or (self.metric.thresholds if self.metric else None)
+        self.table = table
+
+    def colors(self, graph, nodes):
+        """Return a dict from each of the nodes to its color attributes, which
+        must not be modified. The graph is what metrics get their figures from."""
+        with profiler.timer("style"):
+            by_class = {}
+            for n in nodes:
+                by_class.setdefault(n.__class__, []).append(n)
+            result = {}
+            shared = {}
+            for cls, members in by_class.iteritems():
+                attributes = class_colors(cls, members, self.table, shared)
+                if self.metric is not None:
+                    for i, value in enumerate(self.metric.values(cls, members, graph)):
+                        color = self.scale.color(value) if value is not None else None
+                        if color is not None:
+                            attributes[i] = shared_attributes(shared, color)
+                result.update(zip(members, attributes))
+        return result
+
+def parse_thresholds(spec):
+    """Parse thresholds given as comma-separated percentage:color pairs, e.g.
+    80:orange,90:red for colors above the percentages, or <20:orange,<10:red
+    for colors below them."""
+    steps = []
+    below = None
+    for item in spec.split(","):
+        limit, sep, color = item.strip().partition(":")
+        if not sep or not color:
+            raise ValueError("Not a percentage:color pair: %s" % item)
+        this_below = limit.startswith("<")
+        if below is not None and this_below != below:
+            raise ValueError("Thresholds must all be above or all below: %s" % spec)
+        below = this_below
+        try:
+            steps.append((float(limit.lstrip("<")) / 100, color))
+        except ValueError:
+            raise ValueError("Not a percentage: %s" % limit)
+    return Threshold(steps, below)
+
+def parse_gradient(spec):
+    """Parse a gradient given as two colors, e.g. #33cc33:#ff0000."""
+    start, sep, end = spec.partition(":")
+    if not sep:
+        raise ValueError("Not a pair of colors: %s" % spec)
+    return Gradient(start, end)
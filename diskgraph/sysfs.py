@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Module for collecting the block device topology (disks, partitions, RAID arrays
+and device-mapper devices) from sysfs. Part of the diskgraph utility.
+
+Unlike the /proc and LVM based collectors in the sysinfo module, this doesn't
+need root privileges and doesn't run any commands. LVM logical volumes show up
+as device-mapper devices.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+from sysinfo import Partition, RaidArray, DeviceMapper, MountedFileSystem, SwapArea
+from sysinfo import SECTOR_SIZE, read_attr, list_dir, read_devno, read_sectors
+
+__all__ = [
+    "SysfsTopology",
+    "sysfs_collectors",
+]
+
+SYSFS_ROOT = "/sys"
+
+class SysfsTopology(object):
+    """Collector that reads the block devices under <root>/block. Whole disks are
+    those backed by a device (sd, hd, nvme, vd, xvd, mmcblk, ...); their
+    partitions are found as subdirectories with a partition attribute. Devices
+    with an md directory are RAID arrays, and devices with a dm directory are
+    device-mapper devices; how they stack is read from their slaves directory.
+    """
+    def __init__(self, root=SYSFS_ROOT):
+        self.root = root
+
+    def generate(self):
+        block = os.path.join(self.root, "block")
+        devices = [(read_devno(os.path.join(block, name)), name) for name in list_dir(block)]
+        objects = []
+        for devno, name in sorted(devices):
+            path = os.path.join(block, name)
+            if os.path.isdir(os.path.join(path, "md")):
+                objects.append(self._raid_array(path, name, devno))
+            elif os.path.isdir(os.path.join(path, "dm")):
+                objects.append(DeviceMapper.from_sysfs(path, name))
+            elif os.path.exists(os.path.join(path, "device")) and read_sectors(path) > 0:
+                objects.append(self._partition(path, name, devno, whole_disk=True))
+                objects += self._partitions(path, name)
+        return objects
+
+    def _partitions(self, disk_path, disk_name):
+        parts = []
+        for name in list_dir(disk_path):
+            path = os.path.join(disk_path, name)
+            number = read_attr(os.path.join(path, "partition"))
+            if number is not None:
+                parts.append((int(number), name, path))
+        return [self._partition(path, name, read_devno(path), whole_disk=False, disk_name=disk_name)
+                for number, name, path in sorted(parts)]
+
+    def _partition(self, path, name, devno, **kwargs):
+        blocks = read_sectors(path) * SECTOR_SIZE // 1024
+        return Partition([devno[0], devno[1], blocks, name], **kwargs)
+
+    def _raid_array(self, path, name, devno):
+        blocks = read_sectors(path) * SECTOR_SIZE // 1024
+        device_count = read_attr(os.path.join(path, "md", "raid_disks"))
+        degraded = read_attr(os.path.join(path, "md", "degraded"))
+        counts = (None, None)
+        if device_count is not None and degraded is not None:
+            # RAID 0 and linear arrays have no degraded attribute
+            counts = (int(device_count), int(device_count) - int(degraded))
+        return RaidArray(([name] + sorted(list_dir(os.path.join(path, "slaves"))), blocks), devno, *counts)
+
+def sysfs_collectors(root=SYSFS_ROOT):
+    """Return the collectors to use when the topology is read from sysfs."""
+    return [SysfsTopology(root), MountedFileSystem, SwapArea]
@@ -12,9 +12,15 @@ __author__ = "Per Rovegård"
 __version__ = "1.2"
 __license__ = "BSD-3-Clause"
 
+import os
 import subprocess
-import re
+import json
+import sys
+import time
+import threading
 from check import checker
+from timing import profiler
+from mounts import MOUNTINFO, parse_mountinfo, is_block_mount, statvfs_all
 
 __all__ = [
     "SysInfo",
@@ -23,21 +29,165 @@ __all__ = [
     "LvmPhysicalVolume",
     "LvmVolumeGroup",
     "LvmLogicalVolume",
+    "LvmReport",
     "RaidArray",
+    "DeviceMapper",
     "MountedFileSystem",
     "SwapArea",
     "FreeSpace",
+    "SysObjectIndex",
+    "collapse_multipath",
+    "diff_objects",
 ]
 
 BLOCK_SIZE = 1024
 FREE_SPACE_LIMIT = 100 * 1024 * 1024
+COLLECTOR_TIMEOUT = 60
+SYS_BLOCK = "/sys/block"
+SECTOR_SIZE = 512
 
-def open_file(f):
+def read_file(f):
     with open(f) as fd:
-        return [re.split("\\s+", line.strip()) for line in fd if line != ""]
+        return fd.read()
+
+def split_lines(text):
+    """Split text into lines of whitespace-separated fields. Blank lines are
+    kept (as empty lists) so that headers can be skipped by position.
+    """
+    return [line.split() for line in text.splitlines()]
+
+def open_file(f):
+    return split_lines(read_file(f))
+
+def split_output(output):
+    """Split command output into lines of whitespace-separated fields, skipping
+    blank lines.
+    """
+    return [line.split() for line in output.split("\n") if line.strip()]
+
+def exec_cmd(args, stderr=None, timeout=None):
+    """Run a command and return its output, like subprocess.check_output. The
+    command is killed if it runs for more than timeout seconds, which by default
+    are those left until the deadline of the collector running in the current
+    thread (see run_collectors), so that a hung command doesn't outlive it.
+    A killed command raises CalledProcessError.
+    """
+    if timeout is None:
+        deadline = getattr(threading.current_thread(), "deadline", None)
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill, [proc])
+        timer.daemon = True
+        timer.start()
+    try:
+        output = proc.communicate()[0]
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, args[0], output)
+    return output
+
+def kill(proc):
+    try:
+        proc.kill()
+    except OSError:
+        # already gone
+        pass
+
+def read_attr(path, default=None):
+    """Return the stripped contents of a sysfs attribute file."""
+    try:
+        with open(path) as fd:
+            return fd.read().strip()
+    except IOError:
+        return default
+
+def list_dir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
 
-def exec_cmd(args):
-    return (re.split("\\s+", line.strip()) for line in subprocess.check_output(args).split("\n") if line != "")
+def read_devno(path):
+    """Return the (major, minor) tuple of the device in the given sysfs directory."""
+    major, minor = read_attr(os.path.join(path, "dev"), "0:0").split(":")
+    return (int(major), int(minor))
+
+def devno_keys(devno):
+    """Return the index keys of a device number (major, minor), if it is known."""
+    if devno:
+        return [("devno", tuple(devno))]
+    return []
+
+def read_sectors(path):
+    return int(read_attr(os.path.join(path, "size"), "0"))
+
+def is_letters(s):
+    return s.isalpha() and s.islower()
+
+def is_disk_name(name):
+    """Tell whether a kernel device name is that of a whole disk: IDE (hda),
+    SCSI (sda, and sdaa and so on after sdz), virtio (vda), Xen (xvda), NVMe
+    namespaces (nvme0n1) and MMC (mmcblk0).
+    """
+    if name.startswith("hd"):
+        return len(name) == 3 and is_letters(name[2:])
+    for prefix in ("sd", "vd", "xvd"):
+        if name.startswith(prefix):
+            return 1 <= len(name) - len(prefix) <= 4 and is_letters(name[len(prefix):])
+    if name.startswith("nvme"):
+        controller, n, namespace = name[4:].partition("n")
+        return controller.isdigit() and n == "n" and namespace.isdigit()
+    if name.startswith("mmcblk"):
+        return name[6:].isdigit()
+    return False
+
+def partition_disk_name(name):
+    """Return the name of the disk that a partition name such as sda1 or
+    nvme0n1p1 belongs to, or None if the name is not that of a partition.
+    """
+    disk_name = name.rstrip("0123456789")
+    if disk_name == name:
+        return None
+    if is_disk_name(disk_name):
+        return disk_name
+    # disks whose names end with a digit have a p before the partition number
+    if disk_name.endswith("p") and is_disk_name(disk_name[:-1]):
+        return disk_name[:-1]
+    return None
+
+def raid_member_name(token):
+    """Return the device name of an mdstat member token such as sdb1[1] or
+    sdc1[2](F), or None if the token does not name a member.
+    """
+    start = token.find("[")
+    end = token.find("]", start)
+    if start < 1 or end < 0 or not token[start + 1:end].isdigit():
+        return None
+    return token[:start]
+
+def raid_device_counts(line):
+    """Return the number of devices and of active devices from the [n/m] token
+    of a size line in /proc/mdstat (e.g. [3/2] for a degraded RAID 5 array), or
+    a tuple of Nones if there is no such token (e.g. for RAID 0)."""
+    for token in line:
+        if token.startswith("[") and token.endswith("]") and "/" in token:
+            total, active = token[1:-1].split("/", 1)
+            if total.isdigit() and active.isdigit():
+                return int(total), int(active)
+    return None, None
+
+def intern_name(name):
+    """Intern a device or volume name. The same names recur in many objects
+    (e.g. the VG name of every LV), so they are stored only once.
+    """
+    if isinstance(name, unicode):
+        name = name.encode("utf-8")
+    return intern(name)
 
 suffixes = ["B", "kB", "MB", "GB", "TB", "PB"]
 def tosize(bytesize):
@@ -49,7 +199,19 @@ def tosize(bytesize):
     return "%.2f%s" % (size, suffixes[idx])
 
 class SysObject(object):
+    # The attributes that make up the state of the object.
+    fields = ()
+    # There can be tens of thousands of objects, so they don't get a __dict__.
+    # Subclasses list their attributes in __slots__.
+    __slots__ = ("_label",)
+
     def __str__(self):
+        label = getattr(self, "_label", None)
+        if label is None:
+            label = self._label = self.label()
+        return label
+
+    def label(self):
         s = "%s\n%s" % (self.gettypename(), self.name)
         if hasattr(self, "byte_size"):
             s += "\n%s" % tosize(self.byte_size)
@@ -58,7 +220,32 @@ class SysObject(object):
     def gettypename(self):
         return self.__class__.__name__
 
+    def key(self):
+        return self.name
+
+    @property
+    def identity(self):
+        """The identity of the object, which is the same for the same entity in
+        different snapshots: the type name plus a type specific key.
+        """
+        return (self.__class__.__name__, self.key())
+
+    def state(self):
+        return tuple(getattr(self, f, None) for f in self.fields)
+
+    @classmethod
+    def from_state(cls, state):
+        """Create an object from a state as returned by the state method."""
+        obj = cls.__new__(cls)
+        # fields added after the state was saved get None
+        state = list(state) + [None] * (len(cls.fields) - len(state))
+        for f, value in zip(cls.fields, state):
+            setattr(obj, f, value)
+        return obj
+
     def expand(self, candidates):
+        if isinstance(candidates, SysObjectIndex):
+            return candidates.children_of(self)
         return [c for c in candidates if c.is_child_of(self)]
 
     @classmethod
@@ -68,45 +255,133 @@ class SysObject(object):
     def is_child_of(self, tail):
         return False
 
+    def parent_keys(self):
+        """Return the index keys that this object is filed under. A tail that
+        offers one of these keys among its child keys is a parent of this object.
+        Must agree with is_child_of.
+        """
+        return []
+
+    def child_keys(self):
+        """Return the index keys under which children of this object are filed."""
+        return []
+
+class SysObjectIndex(object):
+    """Index of objects by their parent keys. Finding the children of an object
+    is then a matter of a few dict lookups, rather than testing every object in
+    the pool with is_child_of. Children are returned in pool order, just like a
+    scan of the pool would return them.
+    """
+    def __init__(self, objects):
+        self._objects = objects
+        self._filed = self._file(lambda o: o.parent_keys())
+        self._offered = None
+
+    def _file(self, keys_of):
+        table = {}
+        for pos, obj in enumerate(self._objects):
+            for key in keys_of(obj):
+                table.setdefault(key, []).append((pos, obj))
+        return table
+
+    def _lookup(self, table, keys):
+        found = {}
+        for key in keys:
+            for pos, obj in table.get(key, ()):
+                found[pos] = obj
+        return [found[pos] for pos in sorted(found)]
+
+    def children_of(self, tail):
+        return self._lookup(self._filed, tail.child_keys())
+
+    def parents_of(self, obj):
+        """Return the objects in the pool that the given object is a child of."""
+        if self._offered is None:
+            # only needed for incremental updates, so built on demand
+            self._offered = self._file(lambda o: o.child_keys())
+        return self._lookup(self._offered, obj.parent_keys())
+
 class Root(SysObject):
+    __slots__ = ()
     name = "root"
 
-    def __str__(self):
+    def label(self):
         return "Root"
 
+    def child_keys(self):
+        return [("root",)]
+
 class FreeSpace(SysObject):
+    __slots__ = ("byte_size", "owner")
     name = "free"
-    def __init__(self, size):
+    fields = ("byte_size",)
+
+    def __init__(self, size, owner=None):
         self.byte_size = size
+        self.owner = owner
+
+    def key(self):
+        return self.owner.identity if self.owner else None
 
     @staticmethod
     def is_relevant(size):
         return size >= FREE_SPACE_LIMIT
 
-    def __str__(self):
+    def label(self):
         return "Free space\n%s" % tosize(self.byte_size)
 
 class Partition(SysObject):
-    def __init__(self, line_parts):
+    __slots__ = fields = ("kernel_major_minor", "byte_size", "name", "whole_disk", "disk_name")
+
+    def __init__(self, line_parts, whole_disk=None, disk_name=None):
+        """whole_disk and disk_name classify the partition when that is known
+        (e.g. from sysfs); otherwise the classification is derived from the name.
+        """
         self.kernel_major_minor = (int(line_parts[0]), int(line_parts[1]))
         self.byte_size = int(line_parts[2]) * BLOCK_SIZE
-        self.name = line_parts[3]
+        self.name = intern_name(line_parts[3])
+        if whole_disk is None:
+            whole_disk = is_disk_name(self.name)
+        if disk_name is None and not whole_disk:
+            disk_name = partition_disk_name(self.name)
+        self.whole_disk = whole_disk
+        self.disk_name = intern_name(disk_name) if disk_name is not None else None
 
     def gettypename(self):
         return "Disk" if self.is_disk() else "Partition"
 
     def is_disk(self):
-        return re.match("^[hs]d[a-z]$", self.name)
+        return self.whole_disk
 
     def is_partition_for(self, disk):
-        return isinstance(disk, Partition) and disk.is_disk() and re.match("^%s\\d+$" % re.escape(disk.name), self.name)
+        return (self.disk_name is not None and isinstance(disk, Partition) and disk.whole_disk
+                and disk.name == self.disk_name)
 
     def is_child_of(self, tail):
         return (isinstance(tail, Root) and self.is_disk()) or self.is_partition_for(tail)
 
+    def parent_keys(self):
+        if self.is_disk():
+            return [("root",)]
+        if self.disk_name is not None:
+            return [("disk", self.disk_name)]
+        return []
+
+    def child_keys(self):
+        keys = [("member", self.name), ("device", self.name), ("path", "/dev/%s" % self.name),
+                ("swap", self.name), ("slave", self.name)]
+        if self.is_disk():
+            keys.append(("disk", self.name))
+        return keys + devno_keys(self.kernel_major_minor)
+
     @classmethod
     def generate(cls):
-        return [Partition(p) for p in list(open_file("/proc/partitions"))[2:]]
+        return cls.parse(read_file("/proc/partitions"))
+
+    @classmethod
+    def parse(cls, text):
+        """Parse the contents of /proc/partitions."""
+        return [Partition(p) for p in split_lines(text)[2:] if p]
 
     def expand(self, candidates):
         result = super(Partition, self).expand(candidates)
@@ -114,127 +389,521 @@ class Partition(SysObject):
             tot_child_size = sum([c.byte_size for c in result])
             free = self.byte_size - tot_child_size
             if FreeSpace.is_relevant(free):
-                result.append(FreeSpace(free))
+                result.append(FreeSpace(free, self))
         return result
 
 class LvmPhysicalVolume(SysObject):
+    __slots__ = fields = ("name", "byte_size")
+
     def __init__(self, parts):
-        self.name = parts[0].replace("/dev/", "")
+        self.name = intern_name(parts[0].replace("/dev/", ""))
         self.byte_size = int(parts[1])
 
     def is_child_of(self, tail):
+        if isinstance(tail, DeviceMapper):
+            return self.name in (tail.kernel_name, "mapper/%s" % tail.name)
         return isinstance(tail, (Partition, RaidArray)) and tail.name == self.name
 
+    def parent_keys(self):
+        return [("device", self.name)]
+
+    def child_keys(self):
+        return [("pv", self.name)]
+
     @classmethod
     def generate(cls):
-        lines = []
         if checker.has_lvm_commands():
-            lines = list(exec_cmd("pvs --noheadings -o pv_name,pv_size --units b --nosuffix".split(" ")))
-        return [LvmPhysicalVolume(parts) for parts in lines]
+            return cls.parse(exec_cmd("pvs --noheadings -o pv_name,pv_size --units b --nosuffix".split(" ")))
+        return []
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of pvs -o pv_name,pv_size."""
+        return [LvmPhysicalVolume(parts) for parts in split_output(output)]
 
 class LvmVolumeGroup(SysObject):
+    __slots__ = fields = ("name", "byte_size", "pv_names", "free_space")
+
     def __init__(self, parts):
-        self.name = parts[0]
+        self.name = intern_name(parts[0])
         self.byte_size = int(parts[1])
-        self.pv_names = [name.replace("/dev/", "") for name in parts[2]]
+        self.pv_names = tuple(intern_name(name.replace("/dev/", "")) for name in parts[2])
         self.free_space = int(parts[3])
 
     def is_child_of(self, tail):
         return isinstance(tail, LvmPhysicalVolume) and tail.name in self.pv_names
 
+    def parent_keys(self):
+        return [("pv", name) for name in self.pv_names]
+
+    def child_keys(self):
+        return [("vg", self.name)]
+
     def expand(self, candidates):
         result = super(LvmVolumeGroup, self).expand(candidates)
         if FreeSpace.is_relevant(self.free_space):
-            result.append(FreeSpace(self.free_space))
+            result.append(FreeSpace(self.free_space, self))
         return result
 
     @classmethod
     def generate(cls):
-        vgs = []
         if checker.has_lvm_commands():
-            lines = list(exec_cmd("vgs --noheadings -o vg_name,vg_size,pv_name,vg_free --units b --nosuffix".split(" ")))
-            for vg in lines:
-                if vgs and vgs[-1][0] == vg[0]:
-                    vgs[-1][2].append(vg[2])
-                    continue
-                vgs.append([vg[0], vg[1], [vg[2]], vg[3]])
+            return cls.parse(exec_cmd("vgs --noheadings -o vg_name,vg_size,pv_name,vg_free --units b --nosuffix".split(" ")))
+        return []
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of vgs -o vg_name,vg_size,pv_name,vg_free, which has
+        one line per PV of each VG.
+        """
+        vgs = []
+        for vg in split_output(output):
+            if vgs and vgs[-1][0] == vg[0]:
+                vgs[-1][2].append(vg[2])
+                continue
+            vgs.append([vg[0], vg[1], [vg[2]], vg[3]])
         return [LvmVolumeGroup(vg) for vg in vgs]
 
 class LvmLogicalVolume(SysObject):
+    __slots__ = fields = ("name", "vg_name", "byte_size", "kernel_major_minor")
+
     def __init__(self, parts):
-        self.name = parts[0]
-        self.vg_name = parts[1]
+        """[name, vg_name, size] or [name, vg_name, size, major, minor], where the
+        device number is -1:-1 if the LV isn't active."""
+        self.name = intern_name(parts[0])
+        self.vg_name = intern_name(parts[1])
         self.byte_size = int(parts[2])
+        self.kernel_major_minor = None
+        if len(parts) >= 5 and int(parts[3]) >= 0:
+            self.kernel_major_minor = (int(parts[3]), int(parts[4]))
+
+    def key(self):
+        return (self.vg_name, self.name)
 
     def is_child_of(self, tail):
         return isinstance(tail, LvmVolumeGroup) and self.vg_name == tail.name
 
+    def mapper_name(self):
+        """Return the device-mapper name of the LV, in which hyphens in the VG
+        and LV names are doubled."""
+        return "%s-%s" % (self.vg_name.replace("-", "--"), self.name.replace("-", "--"))
+
+    def parent_keys(self):
+        return [("vg", self.vg_name)]
+
+    def child_keys(self):
+        # devices stacked on the LV (e.g. dm-crypt) list it as a mapper slave
+        return ([("path", "/dev/mapper/%s" % self.mapper_name()), ("slave", "mapper/%s" % self.mapper_name())]
+                + devno_keys(self.kernel_major_minor))
+
     @classmethod
     def generate(cls):
-        lines = []
         if checker.has_lvm_commands():
-            lines = list(exec_cmd("lvs --noheadings -o lv_name,vg_name,lv_size --units b --nosuffix".split(" ")))
-        return [LvmLogicalVolume(parts) for parts in lines]
+            return cls.parse(exec_cmd("lvs --noheadings -o lv_name,vg_name,lv_size,lv_kernel_major,lv_kernel_minor "
+                                      "--units b --nosuffix".split(" ")))
+        return []
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of lvs -o lv_name,vg_name,lv_size[,lv_kernel_major,lv_kernel_minor]."""
+        return [LvmLogicalVolume(parts) for parts in split_output(output)]
+
+class LvmReport(object):
+    """Collects LVM physical volumes, volume groups and logical volumes from a
+    single scan, using the JSON output of lvm fullreport. Falls back to running
+    pvs, vgs and lvs if the LVM version is too old for that.
+    """
+    @classmethod
+    def generate(cls):
+        if not checker.has_lvm_commands():
+            return []
+        try:
+            with open(os.devnull, "w") as devnull:
+                output = exec_cmd("lvm fullreport --reportformat json --units b --nosuffix".split(" "),
+                                  stderr=devnull)
+            return cls.parse(output)
+        except (OSError, subprocess.CalledProcessError, ValueError, KeyError):
+            return LvmPhysicalVolume.generate() + LvmVolumeGroup.generate() + LvmLogicalVolume.generate()
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the JSON output of lvm fullreport. The report contains one entry
+        per volume group, with the PVs and LVs of that group; PVs that don't
+        belong to any group come in an entry without a group.
+        """
+        pvs, vgs, lvs = [], [], []
+        for report in json.loads(output)["report"]:
+            pv_names = [pv["pv_name"] for pv in report.get("pv", [])]
+            pvs += [LvmPhysicalVolume([pv["pv_name"], pv["pv_size"]]) for pv in report.get("pv", [])]
+            for vg in report.get("vg", []):
+                vgs.append(LvmVolumeGroup([vg["vg_name"], vg["vg_size"], pv_names, vg["vg_free"]]))
+                # hidden LVs (e.g. [lvol0_pmspare]) aren't listed by lvs either
+                lvs += [LvmLogicalVolume([lv["lv_name"], vg["vg_name"], lv["lv_size"],
+                                          lv.get("lv_kernel_major", -1), lv.get("lv_kernel_minor", -1)])
+                        for lv in report.get("lv", []) if not lv["lv_name"].startswith("[")]
+        return pvs + vgs + lvs
 
 class RaidArray(SysObject):
-    def __init__(self, data):
+    """A software RAID array. device_count is the number of devices the array
+    should have and active_count the number it has, when known; an array with
+    fewer active devices is degraded.
+    """
+    __slots__ = fields = ("name", "partition_names", "byte_size", "kernel_major_minor", "device_count",
+                          "active_count")
+
+    def __init__(self, data, kernel_major_minor=None, device_count=None, active_count=None):
         """([name, partition_names...], #blocks)"""
         arr, blocks = data
-        self.name = arr[0]
-        self.partition_names = arr[1:]
+        self.name = intern_name(arr[0])
+        self.partition_names = tuple(intern_name(name) for name in arr[1:])
         self.byte_size = blocks * BLOCK_SIZE
+        self.kernel_major_minor = kernel_major_minor
+        self.device_count = device_count
+        self.active_count = active_count
+
+    def degradation(self):
+        """Return the share of the devices of the array that are missing, or
+        None if that isn't known (e.g. for RAID 0)."""
+        if not self.device_count or self.active_count is None:
+            return None
+        return float(self.device_count - self.active_count) / self.device_count
 
     def is_child_of(self, tail):
         return isinstance(tail, Partition) and tail.name in self.partition_names
 
+    def parent_keys(self):
+        return [("member", name) for name in self.partition_names]
+
+    def child_keys(self):
+        return ([("device", self.name), ("path", "/dev/%s" % self.name), ("slave", self.name)]
+                + devno_keys(self.kernel_major_minor))
+
     @classmethod
     def generate(cls):
         if checker.has_mdstat():
-            lines = [line for line in open_file("/proc/mdstat")]
-            info = [[i[0]] + [j[:j.find("[")] for j in i[4:] if re.match(".+\\[\\d+\\](\\([A-Z]\\))*", j)] for i in lines if i[0].startswith("md")]
-            sizes = [int(line[0]) for line in lines if "blocks" in line]
-            return [RaidArray(arr) for arr in zip(info, sizes)]
+            arrays = cls.parse(read_file("/proc/mdstat"))
+            if checker.has_sys_block():
+                # mdstat doesn't have device numbers, which file systems are matched by
+                for a in arrays:
+                    devno = read_devno(os.path.join(SYS_BLOCK, a.name))
+                    a.kernel_major_minor = devno if devno != (0, 0) else None
+            return arrays
         return []
 
+    @classmethod
+    def parse(cls, text):
+        """Parse the contents of /proc/mdstat."""
+        info = []
+        sizes = []
+        counts = []
+        for line in split_lines(text):
+            if line and line[0].startswith("md"):
+                members = [raid_member_name(token) for token in line[4:]]
+                info.append([line[0]] + [name for name in members if name is not None])
+            elif "blocks" in line:
+                sizes.append(int(line[0]))
+                counts.append(raid_device_counts(line))
+        return [RaidArray(arr, None, *count) for arr, count in zip(zip(info, sizes), counts)]
+
+class DeviceMapper(SysObject):
+    """A device-mapper device (e.g. an LVM logical volume, a dm-crypt mapping or
+    a multipath device), sitting on the devices listed as its slaves.
+
+    The paths of a multipath device are collapsed into it (see
+    collapse_multipath), after which path_count is the number of paths and the
+    device is placed directly below the root, like a disk.
+    """
+    __slots__ = fields = ("kernel_name", "name", "slave_names", "byte_size", "kernel_major_minor", "uuid",
+                          "path_count")
+
+    # uuid prefixes of the device-mapper targets set up by different tools
+    TARGETS = [("mpath-", "multipath"), ("CRYPT-", "crypt"), ("LVM-", "lvm"), ("part", "partition")]
+    TYPENAMES = {"multipath": "Multipath device", "crypt": "Encrypted device", "partition": "Partition"}
+
+    def __init__(self, kernel_name, name, slave_names, byte_size, kernel_major_minor=None, uuid="",
+                 path_count=0):
+        self.kernel_name = intern_name(kernel_name)
+        self.name = intern_name(name)
+        self.slave_names = tuple(intern_name(slave) for slave in slave_names)
+        self.byte_size = byte_size
+        self.kernel_major_minor = kernel_major_minor
+        self.uuid = uuid
+        self.path_count = path_count
+
+    def target(self):
+        """Return the kind of device: multipath, crypt, lvm, partition (of a
+        multipath device, by kpartx) or linear for anything else."""
+        for prefix, target in self.TARGETS:
+            if (self.uuid or "").startswith(prefix):
+                return target
+        return "linear"
+
+    def gettypename(self):
+        return self.TYPENAMES.get(self.target(), "Device mapper")
+
+    def label(self):
+        s = "%s\n%s" % (self.gettypename(), self.name)
+        if self.path_count:
+            s += "\n%d paths" % self.path_count
+        return s + "\n%s" % tosize(self.byte_size)
+
+    def key(self):
+        return self.kernel_name
+
+    def is_child_of(self, tail):
+        if self.path_count:
+            return isinstance(tail, Root)
+        if isinstance(tail, (Partition, RaidArray)):
+            return tail.name in self.slave_names
+        if isinstance(tail, DeviceMapper):
+            return tail.kernel_name in self.slave_names
+        if isinstance(tail, LvmLogicalVolume):
+            return "mapper/%s" % tail.mapper_name() in self.slave_names
+        return False
+
+    def parent_keys(self):
+        if self.path_count:
+            return [("root",)]
+        return [("slave", name) for name in self.slave_names]
+
+    def child_keys(self):
+        return [("slave", self.kernel_name),
+                ("device", self.kernel_name), ("device", "mapper/%s" % self.name),
+                ("path", "/dev/%s" % self.kernel_name), ("path", "/dev/mapper/%s" % self.name),
+                ("swap", self.kernel_name), ("swap", "mapper/%s" % self.name)] + devno_keys(self.kernel_major_minor)
+
+    @classmethod
+    def from_sysfs(cls, path, kernel_name):
+        """Create a device-mapper device from its sysfs directory."""
+        return DeviceMapper(kernel_name, read_attr(os.path.join(path, "dm", "name"), kernel_name),
+                            sorted(list_dir(os.path.join(path, "slaves"))),
+                            read_sectors(path) * SECTOR_SIZE, read_devno(path),
+                            read_attr(os.path.join(path, "dm", "uuid"), ""))
+
+    @classmethod
+    def generate(cls):
+        if checker.has_sys_block():
+            return cls.scan(SYS_BLOCK, skip_lvm=True)
+        return []
+
+    @classmethod
+    def scan(cls, block, skip_lvm=False):
+        """Return the device-mapper devices among the block devices in the sysfs
+        directory block, in device number order. With skip_lvm, LVM logical
+        volumes are left out, since the LVM collectors cover them, and devices
+        stacked on them list them by their /dev/mapper name.
+        """
+        devices = sorted((cls.from_sysfs(os.path.join(block, name), name) for name in list_dir(block)
+                          if os.path.isdir(os.path.join(block, name, "dm"))),
+                         key=lambda d: d.kernel_major_minor)
+        if skip_lvm:
+            lvs = dict((d.kernel_name, intern_name("mapper/%s" % d.name)) for d in devices if d.target() == "lvm")
+            devices = [d for d in devices if d.kernel_name not in lvs]
+            for d in devices:
+                d.slave_names = tuple(lvs.get(name, name) for name in d.slave_names)
+        return devices
+
 class MountedFileSystem(SysObject):
-    def __init__(self, parts):
-        self.name = parts[5]
-        self.path = parts[0]
+    """A mounted file system. It sits on the device with its device number, when
+    that is known (from mountinfo), and otherwise on the device with its path.
+    """
+    __slots__ = fields = ("name", "path", "byte_size", "used_size", "kernel_major_minor")
+
+    def __init__(self, parts, kernel_major_minor=None):
+        """parts is a line of df output: device, size, used, available, use% and
+        mount point."""
+        self.name = intern_name(parts[5])
+        self.path = intern_name(parts[0])
         self.byte_size = int(parts[1])
+        self.used_size = int(parts[2])
+        self.kernel_major_minor = kernel_major_minor
+
+    def key(self):
+        return (self.path, self.name)
 
     def is_child_of(self, tail):
+        if not isinstance(tail, (Partition, RaidArray, LvmLogicalVolume, DeviceMapper)):
+            # e.g. a bind mount of the same file system, which has the same device number
+            return False
+        devno = tail.kernel_major_minor
+        if self.kernel_major_minor and devno and tuple(devno) == tuple(self.kernel_major_minor):
+            return True
         if isinstance(tail, (Partition, RaidArray)):
             return "/dev/%s" % tail.name == self.path
         if isinstance(tail, LvmLogicalVolume):
-            return "/dev/mapper/%s-%s" % (tail.vg_name, tail.name) == self.path
+            return "/dev/mapper/%s" % tail.mapper_name() == self.path
+        if isinstance(tail, DeviceMapper):
+            return self.path in ("/dev/%s" % tail.kernel_name, "/dev/mapper/%s" % tail.name)
         return False
 
+    def parent_keys(self):
+        return devno_keys(self.kernel_major_minor) + [("path", self.path)]
+
     @classmethod
     def generate(cls):
-        lines = []
+        if checker.has_mountinfo():
+            return cls.from_mountinfo(read_file(MOUNTINFO))
         if checker.has_df_command():
-            lines = list(exec_cmd("df -P -B 1".split(" ")))[1:]
-        return [MountedFileSystem(parts) for parts in lines]
+            return cls.parse(exec_cmd("df -P -B 1".split(" ")))
+        return []
+
+    @classmethod
+    def from_mountinfo(cls, text, statvfs=os.statvfs):
+        """Create the file systems mounted from block devices, as listed in the
+        contents of /proc/self/mountinfo, with sizes from statvfs. Mounts whose
+        statvfs call fails or times out are left out, as are mounts hidden by
+        a later mount on the same mount point.
+        """
+        mounts = [m for m in parse_mountinfo(text) if is_block_mount(m)]
+        visible = dict((m.mount_point, m) for m in mounts)
+        stats = statvfs_all(sorted(visible), statvfs=statvfs)
+        file_systems = []
+        for m in mounts:
+            st = stats.get(m.mount_point)
+            if visible[m.mount_point] is m and st is not None:
+                size = st.f_blocks * st.f_frsize
+                used = (st.f_blocks - st.f_bfree) * st.f_frsize
+                # e.g. btrfs has an anonymous device number (major 0)
+                devno = m.devno if m.devno[0] != 0 else None
+                file_systems.append(MountedFileSystem([m.source, size, used, st.f_bavail * st.f_frsize, None,
+                                                       m.mount_point], devno))
+        return file_systems
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of df -P -B 1."""
+        return [MountedFileSystem(parts) for parts in split_output(output)[1:]]
 
 class SwapArea(SysObject):
+    __slots__ = fields = ("name", "byte_size")
+
     def __init__(self, parts):
-        self.name = parts[0].replace("/dev/", "")
+        self.name = intern_name(parts[0].replace("/dev/", ""))
         self.byte_size = int(parts[2]) * BLOCK_SIZE
 
     def is_child_of(self, tail):
         if isinstance(tail, Partition):
             return tail.name == self.name
+        if isinstance(tail, DeviceMapper):
+            return self.name in (tail.kernel_name, "mapper/%s" % tail.name)
         return False
 
+    def parent_keys(self):
+        return [("swap", self.name)]
+
     @classmethod
     def generate(cls):
-        lines = []
         if checker.has_swaps():
-            lines = [line for line in open_file("/proc/swaps")][1:]
-        return [SwapArea(parts) for parts in lines]
+            return cls.parse(read_file("/proc/swaps"))
+        return []
+
+    @classmethod
+    def parse(cls, text):
+        """Parse the contents of /proc/swaps."""
+        return [SwapArea(parts) for parts in split_lines(text)[1:] if parts]
+
+def collapse_multipath(objects):
+    """Collapse the paths to each multipath device into the device: the disks
+    that are its slaves (and their partitions, which the kernel finds on every
+    path) are left out, and the device gets the number of paths. With hundreds of
+    paths to each LUN, that keeps the graph small and readable. Returns the
+    objects to keep.
+    """
+    paths = set()
+    for o in objects:
+        if isinstance(o, DeviceMapper) and o.target() == "multipath" and o.slave_names:
+            o.path_count = len(o.slave_names)
+            paths.update(o.slave_names)
+    if not paths:
+        return objects
+    return [o for o in objects if not (isinstance(o, Partition) and (o.name in paths or o.disk_name in paths))]
+
+def diff_objects(old_objects, new_objects):
+    """Compare two snapshots of objects by identity. Return a tuple of the added
+    objects, the removed objects and a list of (old, new) tuples for objects
+    whose state has changed.
+    """
+    old_by_id = dict((o.identity, o) for o in old_objects)
+    new_ids = set(o.identity for o in new_objects)
+    added = [o for o in new_objects if not o.identity in old_by_id]
+    removed = [o for o in old_objects if not o.identity in new_ids]
+    changed = [(old_by_id[o.identity], o) for o in new_objects
+               if o.identity in old_by_id and old_by_id[o.identity].state() != o.state()]
+    return added, removed, changed
+
+def default_collectors():
+    return [Partition, RaidArray, LvmReport, DeviceMapper, MountedFileSystem, SwapArea]
+
+def collector_name(collector):
+    return getattr(collector, "__name__", collector.__class__.__name__)
+
+class CollectorThread(threading.Thread):
+    """Runs the generate method of a collector. The thread is a daemon thread, so
+    that a collector that hangs (e.g. df on a stale NFS mount) doesn't keep the
+    process alive once the rest of the work is done.
+    """
+    def __init__(self, collector, deadline=None):
+        threading.Thread.__init__(self, name=collector_name(collector))
+        self.daemon = True
+        self.collector = collector
+        # commands that the collector runs are killed at the deadline (see exec_cmd)
+        self.deadline = deadline
+        self.objects = None
+        self.exc_info = None
+
+    def run(self):
+        try:
+            with profiler.timer("collect.%s" % self.name):
+                self.objects = self.collector.generate()
+        except Exception:
+            self.exc_info = sys.exc_info()
+
+def run_collectors(collectors, timeout=COLLECTOR_TIMEOUT):
+    """Run the collectors concurrently and wait at most timeout seconds (None
+    means no limit) for them to finish. Return a tuple of the list of objects
+    from all collectors that finished, in collector order, the names of the
+    collectors that didn't (those that failed or didn't finish in time), and a
+    dict from the name of each collector that failed to its error.
+    """
+    deadline = time.time() + timeout if timeout is not None else None
+    threads = [CollectorThread(c, deadline) for c in collectors]
+    for t in threads:
+        t.start()
+    objects = []
+    missing = []
+    errors = {}
+    for t in threads:
+        t.join(max(0, deadline - time.time()) if deadline is not None else None)
+        if t.is_alive():
+            missing.append(t.name)
+        elif t.exc_info:
+            missing.append(t.name)
+            errors[t.name] = t.exc_info[1]
+        else:
+            objects += t.objects
+    return objects, missing, errors
 
 class SysInfo(object):
-    def __init__(self):
-        sos = [v for v in globals().values() if isinstance(v, type) and SysObject in v.__bases__]
-        self.objects = reduce(lambda x, y: x + y, [so.generate() for so in sos], [])
+    def __init__(self, collectors=None, timeout=COLLECTOR_TIMEOUT):
+        if collectors is None:
+            collectors = default_collectors()
+        with profiler.timer("collect"):
+            objects, missing, errors = run_collectors(collectors, timeout)
+        self._set_objects(collapse_multipath(objects), missing, errors)
+
+    def _set_objects(self, objects, missing, errors=None):
+        self.objects = objects
+        self.missing = missing
+        self.errors = errors or {}
+        self.index = SysObjectIndex(self.objects)
+        profiler.count("objects", len(self.objects))
+        profiler.count("missing_collectors", len(self.missing))
 
+    @classmethod
+    def from_objects(cls, objects, missing=()):
+        """Create a SysInfo from already collected objects (e.g. from a snapshot)
+        rather than by running the collectors.
+        """
+        sysinfo = cls.__new__(cls)
+        sysinfo._set_objects(list(objects), list(missing))
+        return sysinfo
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Module for timing the stages of creating a graph (each collector, building
+the graph, generating DOT, rendering) and recording object and edge counts.
+Part of the diskgraph utility.
+
+Instrumented code uses the module-level profiler:
+
+    with profiler.timer("build"):
+        ...
+    if profiler.enabled:
+        profiler.count("edges", ...)
+
+Until the profiler is enabled, timer returns a shared no-op context manager
+and nothing is recorded.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import json
+import threading
+import time
+
+__all__ = ["Profiler", "profiler"]
+
+class NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Timer(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.time() - self.start)
+        return False
+
+class Stats(object):
+    """Running figures of the times recorded under one name, so that memory
+    doesn't grow with the number of calls (e.g. in watch and serve mode)."""
+    __slots__ = ("calls", "total", "min", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def asdict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}
+        self.counts = {}
+        # collectors are timed from their own threads
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.enabled = False
+        self.timings = {}
+        self.counts = {}
+
+    def timer(self, name):
+        """Return a context manager that records the time spent in it under the
+        given name."""
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self.timings.get(name)
+            if stats is None:
+                stats = self.timings[name] = Stats()
+            stats.add(seconds)
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = value
+
+    def report(self):
+        """Return the timings (number of calls and total, min and max seconds per
+        name) and the counts, as a dict."""
+        with self._lock:
+            timings = dict((name, stats.asdict()) for name, stats in self.timings.items())
+        return {"created": time.time(), "timings": timings, "counts": dict(self.counts)}
+
+    def save(self, fn):
+        with open(fn, "w") as fd:
+            json.dump(self.report(), fd, indent=2, sort_keys=True)
+
+profiler = Profiler()
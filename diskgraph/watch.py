@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Module for watching cheap signals of storage topology changes, so that the graph
+only needs to be recreated when something has actually changed. Part of the
+diskgraph utility.
+
+Distributed under the 3-Clause BSD license (http://opensource.org/licenses/BSD-3-Clause,
+and LICENSE file).
+"""
+
+__author__ = "Per Rovegård"
+__version__ = "1.2"
+__license__ = "BSD-3-Clause"
+
+import os
+import time
+import subprocess
+from check import checker
+from sysinfo import exec_cmd
+
+__all__ = [
+    "Watcher",
+    "SIGNALS",
+    "signals_for",
+]
+
+DEFAULT_INTERVAL = 10
+DEFAULT_DEBOUNCE = 2
+LVM_SIGNAL_TIMEOUT = 5
+
+def file_signal(path, ignore=None):
+    """Return a signal that reads the contents of the given file. Lines that
+    contain the ignore string (if any) are left out.
+    """
+    def read():
+        try:
+            with open(path) as fd:
+                text = fd.read()
+        except IOError:
+            return None
+        if ignore:
+            text = "\n".join(line for line in text.split("\n") if not ignore in line)
+        return text
+    return read
+
+def lvm_signal():
+    """Signal that reads the metadata sequence numbers of all volume groups. The
+    sequence number of a group is bumped by every change to its metadata. A vgs
+    that hangs (e.g. on a lock) is killed, so that it doesn't hang the watcher.
+    """
+    if not checker.has_lvm_commands():
+        return None
+    try:
+        with open(os.devnull, "w") as devnull:
+            return exec_cmd("vgs --noheadings -o vg_name,vg_seqno".split(" "), stderr=devnull,
+                            timeout=LVM_SIGNAL_TIMEOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+SIGNALS = {
+    "partitions": file_signal("/proc/partitions"),
+    # resync/recovery progress lines change all the time, but not the topology
+    "mdstat": file_signal("/proc/mdstat", ignore="finish="),
+    "swaps": file_signal("/proc/swaps"),
+    "mountinfo": file_signal("/proc/self/mountinfo"),
+    "lvm": lvm_signal,
+}
+
+def signals_for(names):
+    """Return the signals with the given names (see SIGNALS)."""
+    try:
+        return [SIGNALS[name] for name in names]
+    except KeyError, e:
+        raise ValueError("Unknown signal: %s" % e.args[0])
+
+class Watcher(object):
+    """Polls a number of signals, each a function that returns some value that
+    changes when the storage topology changes.
+    """
+    def __init__(self, signals, interval=DEFAULT_INTERVAL, debounce=DEFAULT_DEBOUNCE, sleep=time.sleep):
+        self.signals = signals
+        self.interval = interval
+        self.debounce = debounce
+        self.sleep = sleep
+
+    def fingerprint(self):
+        return [signal() for signal in self.signals]
+
+    def changes(self):
+        """Generator that yields once at start, and then every time the signals
+        have changed. A change is only reported once the signals have been
+        stable for the debounce period, so that a burst of changes (e.g. while
+        creating a volume group with a number of logical volumes) results in a
+        single yield.
+        """
+        for changed in self.ticks():
+            if changed:
+                yield
+
+    def ticks(self):
+        """Generator that yields True at start, and then every interval whether
+        the signals have changed (after settling, as for changes).
+        """
+        last = self.fingerprint()
+        yield True
+        while True:
+            self.sleep(self.interval)
+            current = self.fingerprint()
+            if current == last:
+                yield False
+                continue
+            while True:
+                self.sleep(self.debounce)
+                settled = self.fingerprint()
+                if settled == current:
+                    break
+                current = settled
+            last = current
+            yield True
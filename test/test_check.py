@@ -0,0 +1,54 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from mock import patch
+from diskgraph.check import Checker, cmd_exists
+
+class TestCmdExists(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.make("pvs", stat.S_IRWXU)
+        self.make("notes", stat.S_IRUSR)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make(self, name, mode):
+        path = os.path.join(self.dir, name)
+        open(path, "w").close()
+        os.chmod(path, mode)
+
+    def test_that_executable_in_path_exists(self):
+        with patch.dict(os.environ, {"PATH": os.pathsep.join(["/nonexistent", self.dir])}):
+            self.assertTrue(cmd_exists("pvs"))
+
+    def test_that_missing_command_doesnt_exist(self):
+        with patch.dict(os.environ, {"PATH": self.dir}):
+            self.assertFalse(cmd_exists("lvs"))
+
+    def test_that_non_executable_file_isnt_a_command(self):
+        with patch.dict(os.environ, {"PATH": self.dir}):
+            self.assertFalse(cmd_exists("notes"))
+
+class TestChecker(unittest.TestCase):
+    @patch("diskgraph.check.cmd_exists")
+    @patch("diskgraph.check.file_exists")
+    def test_that_nothing_is_checked_on_creation(self, fe_mock, ce_mock):
+        Checker()
+        self.assertFalse(fe_mock.called or ce_mock.called)
+
+    @patch("diskgraph.check.file_exists")
+    def test_that_check_result_is_cached(self, fe_mock):
+        fe_mock.return_value = True
+        c = Checker()
+        c.has_mdstat()
+        self.assertTrue(c.has_mdstat())
+        self.assertEqual(1, fe_mock.call_count)
+
+    @patch("diskgraph.check.cmd_exists")
+    def test_that_checks_are_cached_separately(self, ce_mock):
+        ce_mock.side_effect = lambda cmd: cmd == "df"
+        c = Checker()
+        self.assertEqual((True, False), (c.has_df_command(), c.has_lvm_commands()))
@@ -139,3 +139,92 @@ class TestDiskGraphLvmLogicalVolume(Setup, unittest.TestCase):
         tails = dg.tailsFor(self.sysinfo.objects[3])
         self.assertListEquivalent(self.are(LvmVolumeGroup), tails)
 
+
+class TestDiskGraphIndex(Setup, unittest.TestCase):
+    def setUp(self):
+        Setup.setUp(self)
+        self.sysinfo.objects += [Partition("8 0 204800 sda".split(" ")),
+                                 Partition("8 1 1000 sda1".split(" ")),
+                                 Partition("8 2 1000 sda2".split(" ")),
+                                 Partition("8 16 204800 sdb".split(" ")),
+                                 Partition("8 17 1000 sdb1".split(" ")),
+                                 Partition("9 0 1000 md0".split(" "))]
+        self.sysinfo.objects += [RaidArray(("md0 sda1 sdb1".split(" "), 1000))]
+        self.sysinfo.objects += [LvmPhysicalVolume("/dev/md0 1000".split(" "))]
+        self.sysinfo.objects += [LvmVolumeGroup(["group", "1000", ["/dev/md0"], "0"])]
+        self.sysinfo.objects += [LvmLogicalVolume(["test", "group", "1000"])]
+        self.sysinfo.objects += [MountedFileSystem("/dev/mapper/group-test 1000 0 1000 0% /srv".split(" ")),
+                                 MountedFileSystem("/dev/md0 1000 0 1000 0% /mnt".split(" "))]
+        self.sysinfo.objects += [SwapArea("/dev/sda2 partition 1000 0 -1".split(" "))]
+
+    def test_that_indexed_graph_matches_scanned_graph(self):
+        dg = DiskGraph(self.sysinfo)
+        for v in dg.visit(dg.root):
+            scanned = [c for c in self.sysinfo.objects if c.is_child_of(v)]
+            indexed = [h for h in dg.headsFor(v) if not isinstance(h, FreeSpace)]
+            self.assertEqual(scanned, indexed)
+
+    def test_that_index_from_sysinfo_is_used(self):
+        self.sysinfo.index = SysObjectIndex(self.sysinfo.objects)
+        dg = DiskGraph(self.sysinfo)
+        self.assertTrue(dg.index is self.sysinfo.index)
+
+def snapshot(*objects):
+    sysinfo = dummy()
+    sysinfo.objects = list(objects)
+    return sysinfo
+
+def edges(dg):
+    return [(t.identity, h.identity, str(h)) for t, h in dg.visitEdges(dg.root)]
+
+class TestDiskGraphUpdate(unittest.TestCase):
+    def objects(self, lv_size="104857600", vg_free="0", extra=()):
+        return [Partition("8 0 1048576 sda".split(" ")),
+                Partition("8 1 512000 sda1".split(" ")),
+                Partition("8 2 512000 sda2".split(" "))] + list(extra) + [
+                LvmPhysicalVolume("/dev/sda2 524288000".split(" ")),
+                LvmVolumeGroup(["vg", "524288000", ["/dev/sda2"], vg_free]),
+                LvmLogicalVolume(["lv", "vg", lv_size]),
+                MountedFileSystem("/dev/mapper/vg-lv 104857600 0 104857600 0% /srv".split(" ")),
+                MountedFileSystem("/dev/sda1 524288000 0 524288000 0% /".split(" "))]
+
+    def assertUpdateMatchesFreshBuild(self, old, new):
+        dg = DiskGraph(snapshot(*old))
+        dg.update(snapshot(*new))
+        fresh = DiskGraph(snapshot(*new))
+        self.assertEqual(edges(fresh), edges(dg))
+        self.assertEqual(fresh.order, dg.order)
+
+    def test_that_update_reports_changes(self):
+        old, new = self.objects(), self.objects(lv_size="209715200")
+        dg = DiskGraph(snapshot(*old))
+        added, removed, changed = dg.update(snapshot(*new))
+        self.assertEqual(([], [], [(old[5], new[5])]), (added, removed, changed))
+
+    def test_that_unchanged_objects_keep_their_vertices(self):
+        old = self.objects()
+        dg = DiskGraph(snapshot(*old))
+        dg.update(snapshot(*self.objects(lv_size="209715200")))
+        self.assertTrue(old[6] in dg.headsFor(dg.tailsFor(old[6])[0]))
+
+    def test_that_resized_logical_volume_matches_fresh_build(self):
+        self.assertUpdateMatchesFreshBuild(self.objects(), self.objects(lv_size="209715200"))
+
+    def test_that_changed_free_space_matches_fresh_build(self):
+        self.assertUpdateMatchesFreshBuild(self.objects(), self.objects(vg_free="419430400"))
+
+    def test_that_added_disk_matches_fresh_build(self):
+        self.assertUpdateMatchesFreshBuild(self.objects(), self.objects(extra=[
+            Partition("8 16 1048576 sdb".split(" ")), Partition("8 17 1000 sdb1".split(" "))]))
+
+    def test_that_removed_disk_matches_fresh_build(self):
+        self.assertUpdateMatchesFreshBuild(self.objects(extra=[
+            Partition("8 16 1048576 sdb".split(" ")), Partition("8 17 1000 sdb1".split(" "))]), self.objects())
+
+    def test_that_removed_physical_volume_matches_fresh_build(self):
+        old = self.objects()
+        self.assertUpdateMatchesFreshBuild(old, old[:3] + old[7:])
+
+    def test_that_added_volume_group_matches_fresh_build(self):
+        new = self.objects()
+        self.assertUpdateMatchesFreshBuild(new[:3] + new[7:], new)
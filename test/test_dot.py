@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+from subprocess import CalledProcessError
+from diskgraph.diskgraph import DiskGraph, pydot
+from diskgraph.dot import write_dot, render_laid_out
+from diskgraph.sysinfo import *
+
+class dummy(object):
+    pass
+
+def sample_graph():
+    sysinfo = dummy()
+    sysinfo.objects = [Partition("8 0 204800 sda".split(" ")),
+                       Partition("8 1 1000 sda1".split(" ")),
+                       Partition("8 2 1000 sda2".split(" ")),
+                       RaidArray(("md0 sda1 sda2".split(" "), 1000)),
+                       MountedFileSystem("/dev/md0 1000 0 1000 0% /srv".split(" "))]
+    return DiskGraph(sysinfo)
+
+class TestWriteDot(unittest.TestCase):
+    def write(self, edges, style=lambda v: {"label": v}, node_id=None):
+        out = StringIO()
+        write_dot(edges, out, style, node_id=node_id)
+        return out.getvalue()
+
+    def test_that_empty_graph_is_written(self):
+        self.assertEqual("digraph diskgraph {\n}\n", self.write([]))
+
+    def test_that_nodes_are_declared_before_edge(self):
+        self.assertEqual('digraph diskgraph {\n"0" [label="b"];\n"1" [label="a"];\n"1" -> "0";\n}\n',
+                         self.write([("a", "b")]))
+
+    def test_that_nodes_are_declared_once(self):
+        text = self.write([("a", "b"), ("a", "c"), ("b", "c")])
+        self.assertEqual(3, text.count("[label="))
+
+    def test_that_quotes_are_escaped(self):
+        self.assertTrue('[label="say \\"hi\\""]' in self.write([("a", 'say "hi"')]))
+
+    def test_that_backslashes_are_escaped(self):
+        self.assertTrue('[label="C:\\\\"]' in self.write([("a", "C:\\")]))
+
+    def test_that_newlines_become_line_breaks(self):
+        self.assertTrue('[label="Disk\\nsda"]' in self.write([("a", "Disk\nsda")]))
+
+    def test_that_attributes_are_written(self):
+        text = self.write([("a", "b")], lambda v: {"label": v, "fillcolor": "gold"})
+        self.assertTrue('"0" [fillcolor="gold", label="b"];' in text)
+
+    def test_that_node_id_function_is_used(self):
+        self.assertTrue('"id-a" -> "id-b";' in self.write([("a", "b")], node_id=lambda v: "id-" + v))
+
+    def test_that_duplicate_node_ids_are_made_unique(self):
+        text = self.write([("a", "b"), ("a", "c")], node_id=lambda v: "same")
+        self.assertEqual(3, len(set(line.split(" ")[0] for line in text.split("\n") if "[" in line)))
+
+class TestDiskGraphWriteDot(unittest.TestCase):
+    def test_that_labels_keep_newline_escapes(self):
+        out = StringIO()
+        sample_graph().writedot(out)
+        self.assertTrue('label="Disk\\nsda\\n200.00MB"' in out.getvalue())
+
+    def test_that_nodes_are_identified_by_identity(self):
+        self.assertTrue('"Root/root" -> "Partition/sda";' in sample_graph().dottext())
+
+    def test_that_free_space_is_identified_by_owner(self):
+        self.assertTrue('"Partition/sda" -> "FreeSpace/Partition/sda";' in sample_graph().dottext())
+
+    def test_that_dot_text_is_the_same_for_the_same_topology(self):
+        self.assertEqual(sample_graph().dottext(), sample_graph().dottext())
+
+    @unittest.skipIf(pydot is None, "pydot not installed")
+    def test_that_output_matches_pydot_graph(self):
+        dg = sample_graph()
+        out = StringIO()
+        dg.writedot(out)
+        ours = pydot.graph_from_dot_data(out.getvalue())
+        if isinstance(ours, list):
+            ours = ours[0]
+        theirs = dg.todot()
+        nodes = lambda g: sorted((n.get_name(), sorted((k, str(v).strip('"')) for k, v in n.get_attributes().items()))
+                                 for n in g.get_nodes())
+        edges = lambda g: sorted((e.get_source(), e.get_destination()) for e in g.get_edges())
+        self.assertEqual(nodes(theirs), nodes(ours))
+        self.assertEqual(edges(theirs), edges(ours))
+
+# stands in for neato: fails at once for SVG, copies its input otherwise
+FAKE_NEATO = """#!/bin/sh
+if [ "$2" = "-Tsvg" ]; then
+    exit 3
+fi
+cat > "$4"
+"""
+
+class TestRenderLaidOut(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.command = os.path.join(self.dir, "neato")
+        with open(self.command, "w") as fd:
+            fd.write(FAKE_NEATO)
+        os.chmod(self.command, 0755)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_that_early_failure_is_reported_with_its_command(self):
+        # more than fits in a pipe, so that writing to the failed process breaks the pipe
+        text = "x" * (1024 * 1024)
+        png = os.path.join(self.dir, "out.png")
+        try:
+            render_laid_out(text, [(os.path.join(self.dir, "out.svg"), "svg"), (png, "png")], self.command)
+            self.fail("no error")
+        except CalledProcessError, e:
+            self.assertEqual(3, e.returncode)
+            self.assertIn("-Tsvg", e.cmd)
+        # the other process got all of the graph
+        self.assertEqual(len(text), os.path.getsize(png))
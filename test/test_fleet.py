@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from diskgraph.sysinfo import *
+from diskgraph import snapshot
+from diskgraph.style import Styler, METRICS, GREEN
+from diskgraph.fleet import Host, load_host, load_fleet, snapshot_files
+
+def objects():
+    return [Partition("8 0 204800 sda".split(" ")),
+            Partition("8 1 1000 sda1".split(" ")),
+            LvmPhysicalVolume("/dev/sda1 1000".split(" ")),
+            LvmVolumeGroup(["group", "1000", ["/dev/sda1"], "0"]),
+            LvmLogicalVolume(["test", "group", "1000"]),
+            MountedFileSystem("/dev/mapper/group-test 1000 0 1000 0% /srv".split(" "))]
+
+class FleetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name in ("web01.json", "web02.json.gz"):
+            snapshot.save(SysInfo.from_objects(objects()), os.path.join(self.dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+class TestLoadHost(FleetTestCase):
+    def setUp(self):
+        FleetTestCase.setUp(self)
+        self.host, self.vertices, self.edges = load_host(os.path.join(self.dir, "web02.json.gz"))
+
+    def test_that_host_name_is_file_name_without_extension(self):
+        self.assertEqual("web02", self.host)
+
+    def test_that_root_edges_have_negative_tail(self):
+        self.assertEqual([(-1, 0)], [e for e in self.edges if e[0] < 0])
+
+    def test_that_edges_refer_to_vertices(self):
+        self.assertEqual(["sda", "sda1"], [self.vertices[head].name for tail, head in self.edges[:2]])
+
+class TestFleetGraph(FleetTestCase):
+    def setUp(self):
+        FleetTestCase.setUp(self)
+        self.fg = load_fleet(self.dir, processes=1)
+
+    def test_that_snapshot_files_are_found_in_name_order(self):
+        self.assertEqual(["web01.json", "web02.json.gz"], [os.path.basename(fn) for fn in snapshot_files(self.dir)])
+
+    def test_that_hosts_are_below_root(self):
+        heads = self.fg.headsFor(self.fg.root)
+        self.assertEqual([(Host, "web01"), (Host, "web02")], [(h.__class__, h.name) for h in heads])
+
+    def test_that_host_graph_is_below_host(self):
+        host = self.fg.headsFor(self.fg.root)[0]
+        self.assertEqual(["sda"], [h.name for h in self.fg.headsFor(host)])
+
+    def test_that_hosts_have_separate_vertices(self):
+        # root, two hosts and for each host six objects and the free space on the disk
+        self.assertEqual(1 + 2 + 2 * 7, self.fg.order)
+
+    def test_that_node_ids_are_prefixed_with_host(self):
+        self.assertIn('"web02:LvmLogicalVolume/group/test"', self.fg.dottext())
+
+    def test_that_each_host_gets_a_cluster(self):
+        text = self.fg.dottext()
+        self.assertEqual(2, text.count("subgraph "))
+        self.assertIn('subgraph "cluster_web01" {', text)
+
+    def test_that_clusters_can_be_turned_off(self):
+        self.fg.clusters = False
+        self.assertNotIn("subgraph", self.fg.dottext())
+
+    def test_that_process_pool_gives_same_graph(self):
+        self.assertEqual(self.fg.dottext(), load_fleet(self.dir, processes=2).dottext())
+
+    def test_that_nodes_can_be_colored_by_metric(self):
+        # the file systems are empty, so they and the PV, VG and LV they sit on
+        # are all free
+        fg = load_fleet(self.dir, processes=1, styler=Styler("free", METRICS["free"].gradient()))
+        self.assertEqual(2 * 4, fg.dottext().count(GREEN))
+
+    def test_that_empty_directory_is_rejected(self):
+        empty = os.path.join(self.dir, "empty")
+        os.mkdir(empty)
+        self.assertRaises(ValueError, load_fleet, empty)
@@ -0,0 +1,139 @@
+import unittest
+from diskgraph.diskgraph import DiskGraph, node_dict
+from diskgraph.sysinfo import *
+from diskgraph.iostats import *
+from diskgraph.iostats import counters
+
+def diskstats_line(major, minor, name, reads=0, sectors_read=0, writes=0, sectors_written=0, io_ms=0,
+                   weighted_ms=0):
+    return "%4d %7d %s %d 0 %d 0 %d 0 %d 0 0 %d %d 0 0 0 0\n" % (
+        major, minor, name, reads, sectors_read, writes, sectors_written, io_ms, weighted_ms)
+
+class TestParseDiskstats(unittest.TestCase):
+    def test_that_lines_are_parsed_by_device_number(self):
+        readings = parse_diskstats(diskstats_line(8, 16, "sdb", 1, 2, 3, 4, 5, 6))
+        self.assertEqual([(8, 16)], readings.keys())
+        self.assertEqual("sdb", readings[(8, 16)][0])
+
+    def test_that_counters_are_parsed_from_rest_of_line(self):
+        rest = parse_diskstats(diskstats_line(8, 16, "sdb", 1, 2, 3, 4, 5, 6))[(8, 16)][1]
+        self.assertEqual((1, 2, 3, 4, 5, 6), counters(rest))
+
+    def test_that_short_line_has_no_counters(self):
+        self.assertIsNone(counters("1 2 3"))
+
+class TestIoRates(unittest.TestCase):
+    def setUp(self):
+        before = parse_diskstats(diskstats_line(8, 16, "sdb"))
+        after = parse_diskstats(diskstats_line(8, 16, "sdb", 100, 2048, 300, 4096, 1000, 4000))
+        self.stats = io_rates(before, after, 2)[(8, 16)]
+
+    def test_that_iops_are_reads_and_writes_per_second(self):
+        self.assertEqual(200, self.stats.iops)
+
+    def test_that_throughput_is_bytes_per_second(self):
+        self.assertEqual((512 * 1024, 1024 * 1024), (self.stats.read_bytes, self.stats.write_bytes))
+
+    def test_that_queue_depth_is_weighted_time_per_time(self):
+        self.assertEqual(2.0, self.stats.queue_depth)
+
+    def test_that_utilisation_is_busy_percentage(self):
+        self.assertEqual(50.0, self.stats.utilisation)
+
+    def test_that_unchanged_device_is_idle(self):
+        reading = parse_diskstats(diskstats_line(8, 16, "sdb", 100, 2048))
+        self.assertEqual(0, io_rates(reading, reading, 1)[(8, 16)].iops)
+
+    def test_that_new_device_is_left_out(self):
+        self.assertEqual({}, io_rates({}, parse_diskstats(diskstats_line(8, 16, "sdb", 1)), 1))
+
+class TestSampler(unittest.TestCase):
+    def setUp(self):
+        self.readings = [diskstats_line(8, 16, "sdb", reads) for reads in (0, 10, 40)]
+        self.times = [0, 1, 3]
+        self.sleeps = []
+        self.sampler = Sampler(1, read=lambda: parse_diskstats(self.readings.pop(0)),
+                               clock=lambda: self.times.pop(0), sleep=self.sleeps.append)
+
+    def test_that_first_sample_takes_two_readings_interval_apart(self):
+        self.assertEqual(10, self.sampler.sample()[(8, 16)].iops)
+        self.assertEqual([1], self.sleeps)
+
+    def test_that_next_sample_is_since_previous_one(self):
+        self.sampler.sample()
+        self.assertEqual(15, self.sampler.sample()[(8, 16)].iops)
+        self.assertEqual([1], self.sleeps)
+
+    def test_that_device_names_are_mapped_to_numbers(self):
+        self.sampler.sample()
+        self.assertEqual({"sdb": (8, 16)}, self.sampler.names)
+
+def objects():
+    return [Partition("8 16 2000 sdb".split(" ")),
+            Partition("8 17 1000 sdb1".split(" ")),
+            Partition("8 32 2000 sdc".split(" ")),
+            Partition("8 33 1000 sdc1".split(" ")),
+            RaidArray(("md0 sdb1 sdc1".split(" "), 1000)),
+            LvmPhysicalVolume("/dev/md0 1000".split(" ")),
+            LvmPhysicalVolume("/dev/sdc1 1000".split(" ")),
+            LvmVolumeGroup(["data", "2000", ["/dev/md0", "/dev/sdc1"], "0"]),
+            LvmLogicalVolume("srv data 1000 253 0".split(" ")),
+            MountedFileSystem("/dev/mapper/data-srv 1000 0 1000 0% /srv".split(" "), (253, 0))]
+
+def stats(iops, utilisation):
+    return IoStats(iops, iops * 4096, 0, iops / 100.0, utilisation)
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        self.dg = DiskGraph(SysInfo.from_objects(objects()))
+        device_stats = {(8, 16): stats(100, 50), (8, 17): stats(80, 40), (8, 32): stats(30, 90),
+                        (8, 33): stats(20, 10), (9, 0): stats(70, 30), (253, 0): stats(60, 20)}
+        self.io = aggregate(self.dg, device_stats, {"md0": (9, 0)})
+
+    def find(self, cls, name):
+        return [v for v in self.io if isinstance(v, cls) and v.name == name][0]
+
+    def test_that_device_has_own_figures(self):
+        self.assertEqual(80, self.io[self.find(Partition, "sdb1")].iops)
+
+    def test_that_device_without_number_is_found_by_name(self):
+        self.assertEqual(70, self.io[self.find(RaidArray, "md0")].iops)
+
+    def test_that_pv_has_figures_of_its_device(self):
+        self.assertEqual(70, self.io[self.find(LvmPhysicalVolume, "md0")].iops)
+
+    def test_that_vg_combines_its_pvs(self):
+        vg = self.io[self.find(LvmVolumeGroup, "data")]
+        self.assertEqual((70 + 20, 30), (vg.iops, vg.utilisation))
+
+    def test_that_file_system_has_figures_of_its_device(self):
+        self.assertEqual(60, self.io[self.find(MountedFileSystem, "/srv")].iops)
+
+    def test_that_root_combines_disks(self):
+        root = self.io[self.dg.root]
+        self.assertEqual((130, 90), (root.iops, root.utilisation))
+
+    def test_that_device_missing_from_diskstats_has_no_figures(self):
+        io = aggregate(self.dg, {(8, 16): stats(100, 50)})
+        self.assertFalse(any(isinstance(v, Partition) and v.name == "sdb1" for v in io))
+
+class TestIoOutput(unittest.TestCase):
+    def setUp(self):
+        self.dg = DiskGraph(SysInfo.from_objects(objects()))
+
+    def test_that_text_has_all_figures(self):
+        self.assertEqual("100 IOPS, r 400.00kB/s, w 0.00B/s, q 1.0, 50% busy", io_text(stats(100, 50)))
+
+    def test_that_labels_include_figures_once_set(self):
+        self.assertNotIn("IOPS", self.dg.dottext())
+        self.dg.set_iostats({(8, 16): stats(100, 50)})
+        self.assertIn("100 IOPS", self.dg.dottext())
+
+    def test_that_node_dict_includes_figures(self):
+        self.assertEqual(100, node_dict(Root(), io=stats(100, 50))["io"]["iops"])
+
+    def test_that_update_aggregates_again(self):
+        self.dg.set_iostats({(8, 16): stats(100, 50)})
+        before = self.dg.io()
+        self.dg.update(SysInfo.from_objects(objects()[:4]))
+        self.assertIsNot(before, self.dg.io())
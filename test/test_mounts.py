@@ -0,0 +1,70 @@
+import threading
+import unittest
+from diskgraph.mounts import *
+
+MOUNTINFO = """\
+22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/root rw,errors=remount-ro
+23 22 0:22 / /proc rw,relatime shared:12 - proc proc rw
+24 22 0:24 / /dev/shm rw,relatime - tmpfs tmpfs rw
+25 22 0:40 / /mnt/nfs rw,relatime - nfs4 /dev/fake:/export rw
+26 22 0:41 / /mnt/ssh rw,relatime - fuse.sshfs /dev/sshfs rw
+27 22 253:2 / /srv/my\\040data rw,relatime master:3 - xfs /dev/mapper/vg-data rw
+"""
+
+class TestParseMountinfo(unittest.TestCase):
+    def setUp(self):
+        self.mounts = parse_mountinfo(MOUNTINFO)
+
+    def test_that_all_mounts_are_parsed(self):
+        self.assertEqual(6, len(self.mounts))
+
+    def test_that_device_number_is_parsed(self):
+        self.assertEqual((8, 1), self.mounts[0].devno)
+
+    def test_that_source_and_type_follow_separator(self):
+        m = self.mounts[5]
+        self.assertEqual(("/dev/mapper/vg-data", "xfs"), (m.source, m.fs_type))
+
+    def test_that_mount_point_is_unescaped(self):
+        self.assertEqual("/srv/my data", self.mounts[5].mount_point)
+
+class TestIsBlockMount(unittest.TestCase):
+    def block_mount_points(self):
+        return [m.mount_point for m in parse_mountinfo(MOUNTINFO) if is_block_mount(m)]
+
+    def test_that_pseudo_network_and_fuse_file_systems_are_skipped(self):
+        self.assertEqual(["/", "/srv/my data"], self.block_mount_points())
+
+    def test_that_fuse_block_device_file_system_is_skipped(self):
+        # e.g. ntfs-3g, whose statvfs goes through its daemon
+        m = parse_mountinfo("28 22 8:33 / /mnt/win rw,relatime - fuseblk /dev/sdc1 rw\n")[0]
+        self.assertFalse(is_block_mount(m))
+
+class TestStatvfsAll(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def statvfs(self, path):
+        if path.startswith("/stale"):
+            self.release.wait()
+        if path == "/gone":
+            raise OSError(2, "No such file or directory")
+        return "stat of %s" % path
+
+    def test_that_results_are_returned_by_path(self):
+        self.assertEqual({"/a": "stat of /a", "/b": "stat of /b"},
+                         statvfs_all(["/a", "/b"], statvfs=self.statvfs))
+
+    def test_that_failing_call_is_left_out(self):
+        self.assertEqual(["/a"], statvfs_all(["/a", "/gone"], statvfs=self.statvfs).keys())
+
+    def test_that_hanging_call_is_given_up_on(self):
+        results = statvfs_all(["/stale", "/a", "/b"], workers=2, timeout=0.05, statvfs=self.statvfs)
+        self.assertEqual(["/a", "/b"], sorted(results))
+
+    def test_that_rest_is_given_up_on_when_all_workers_hang(self):
+        results = statvfs_all(["/stale1", "/stale2", "/a"], workers=2, timeout=0.05, statvfs=self.statvfs)
+        self.assertEqual({}, results)
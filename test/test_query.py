@@ -0,0 +1,80 @@
+import unittest
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import *
+from diskgraph.query import DeviceIndex, format_text, ABOVE, BELOW
+
+def objects():
+    return [Partition("8 16 204800 sdb".split(" ")),
+            Partition("8 17 1000 sdb1".split(" ")),
+            Partition("8 32 204800 sdc".split(" ")),
+            Partition("8 33 1000 sdc1".split(" ")),
+            RaidArray(("md0 sdb1 sdc1".split(" "), 1000)),
+            LvmPhysicalVolume("/dev/md0 1000".split(" ")),
+            LvmVolumeGroup(["data", "1000", ["/dev/md0"], "0"]),
+            LvmLogicalVolume(["srv", "data", "1000", "253", "0"]),
+            MountedFileSystem("/dev/mapper/data-srv 1000 0 1000 0% /srv".split(" "), (253, 0)),
+            DeviceMapper("dm-1", "secret", ["sdc"], 1000, (253, 1), "CRYPT-LUKS1-x-secret")]
+
+class TestDeviceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = DeviceIndex(DiskGraph(SysInfo.from_objects(objects())))
+
+    def name(self, spec):
+        return self.index.find(spec).name
+
+    def test_that_device_is_found_by_name(self):
+        self.assertEqual("sdb1", self.name("sdb1"))
+
+    def test_that_device_is_found_by_dev_path(self):
+        self.assertIsInstance(self.index.find("/dev/md0"), RaidArray)
+
+    def test_that_device_is_found_by_major_minor(self):
+        self.assertEqual("sdc1", self.name("8:33"))
+
+    def test_that_lv_is_found_by_major_minor(self):
+        # rather than the file system on it, which has the same device number
+        self.assertIsInstance(self.index.find("253:0"), LvmLogicalVolume)
+
+    def test_that_lv_is_found_by_mapper_path(self):
+        self.assertIsInstance(self.index.find("/dev/mapper/data-srv"), LvmLogicalVolume)
+
+    def test_that_lv_is_found_by_vg_path(self):
+        self.assertIsInstance(self.index.find("/dev/data/srv"), LvmLogicalVolume)
+
+    def test_that_device_mapper_is_found_by_mapper_path(self):
+        self.assertEqual("dm-1", self.index.find("/dev/mapper/secret").kernel_name)
+
+    def test_that_mount_point_is_found(self):
+        self.assertIsInstance(self.index.find("/srv/"), MountedFileSystem)
+
+    def test_that_block_device_wins_over_pv_of_same_name(self):
+        self.assertIsInstance(self.index.find("md0"), RaidArray)
+
+    def test_that_unknown_name_gives_none(self):
+        self.assertIsNone(self.index.find("sdz"))
+
+    def test_that_above_gives_what_is_stacked_on_device(self):
+        names = [v.name for v in self.index.above(self.index.find("sdb"))]
+        self.assertEqual(["sdb1", "md0", "md0", "data", "srv", "/srv"], names[:6])
+
+    def test_that_below_gives_what_mount_point_sits_on(self):
+        below = self.index.below(self.index.find("/srv"))
+        self.assertEqual(set(["sdb", "sdc"]), set(v.name for v in below if isinstance(v, Partition) and v.is_disk()))
+
+    def test_that_below_excludes_root(self):
+        self.assertEqual([], self.index.below(self.index.find("sdb")))
+
+    def test_that_query_gives_both_directions(self):
+        result = self.index.query("/dev/mapper/secret")
+        self.assertEqual((["sdc"], []), ([d["name"] for d in result[BELOW]], result[ABOVE]))
+
+    def test_that_query_can_be_limited_to_one_direction(self):
+        self.assertNotIn(BELOW, self.index.query("sdb", [ABOVE]))
+
+    def test_that_unknown_query_raises_key_error(self):
+        self.assertRaises(KeyError, self.index.query, "sdz")
+
+    def test_that_text_lists_nodes_per_direction(self):
+        text = format_text(self.index.query("/dev/mapper/secret"))
+        self.assertEqual("Encrypted device secret (1000.00B)\nStacked on it:\n  nothing\nSits on:\n"
+                         "  Disk sdc (200.00MB)", text)
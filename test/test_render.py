@@ -0,0 +1,132 @@
+import os
+import time
+import threading
+import shutil
+import tempfile
+import unittest
+from mock import patch
+from diskgraph.render import RenderCache, render_dot, render_targets, format_of
+
+def fake_render(write, fn, fmt="png", command="dot"):
+    with open(fn, "w") as fd:
+        write(fd)
+
+class TestRenderDot(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.dir, "cache"))
+        self.out = os.path.join(self.dir, "out.png")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    def test_that_graph_is_rendered_first_time(self, render_mock):
+        self.assertFalse(render_dot("digraph {}", self.out, cache=self.cache))
+        self.assertEqual(1, render_mock.call_count)
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    def test_that_unchanged_graph_is_fetched_from_cache(self, render_mock):
+        render_dot("digraph {}", self.out, cache=self.cache)
+        os.remove(self.out)
+        self.assertTrue(render_dot("digraph {}", self.out, cache=self.cache))
+        self.assertEqual(1, render_mock.call_count)
+        with open(self.out) as fd:
+            self.assertEqual("digraph {}", fd.read())
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    def test_that_changed_graph_is_rendered(self, render_mock):
+        render_dot("digraph {}", self.out, cache=self.cache)
+        render_dot("digraph { a }", self.out, cache=self.cache)
+        self.assertEqual(2, render_mock.call_count)
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    def test_that_formats_are_cached_separately(self, render_mock):
+        render_dot("digraph {}", self.out, cache=self.cache)
+        render_dot("digraph {}", os.path.join(self.dir, "out.svg"), "svg", cache=self.cache)
+        self.assertEqual(2, render_mock.call_count)
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    def test_that_graph_is_rendered_without_cache(self, render_mock):
+        render_dot("digraph {}", self.out)
+        render_dot("digraph {}", self.out)
+        self.assertEqual(2, render_mock.call_count)
+
+class TestRenderCacheEviction(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.dir, "cache"), max_bytes=25)
+        self.src = os.path.join(self.dir, "image")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def store(self, key, age):
+        with open(self.src, "w") as fd:
+            fd.write("x" * 10)
+        self.cache.store(key, "png", self.src)
+        t = time.time() - age
+        os.utime(self.cache.path(key, "png"), (t, t))
+
+    def test_that_least_recently_used_image_is_evicted(self):
+        self.store("a", 30)
+        self.store("b", 20)
+        self.cache.fetch("a", "png", self.src)
+        self.store("c", 0)
+        self.assertEqual(["a.png", "c.png"], sorted(os.listdir(self.cache.directory)))
+
+    def test_that_concurrent_stores_of_same_image_dont_collide(self):
+        with open(self.src, "w") as fd:
+            fd.write("x" * 10)
+        errors = []
+        def store():
+            try:
+                for _ in range(20):
+                    self.cache.store("a", "png", self.src)
+            except Exception, e:
+                errors.append(e)
+        threads = [threading.Thread(target=store) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(([], ["a.png"]), (errors, os.listdir(self.cache.directory)))
+
+class TestRenderTargets(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.dir, "cache"))
+        self.png = os.path.join(self.dir, "out.png")
+        self.svg = os.path.join(self.dir, "out.svg")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def fake_render_laid_out(self, text, targets):
+        for fn, fmt in targets:
+            fake_render(lambda out: out.write(text), fn, fmt)
+
+    @patch("diskgraph.dot.render_laid_out")
+    @patch("diskgraph.dot.layout", return_value="laid out")
+    def test_that_graph_is_laid_out_once_for_several_targets(self, layout_mock, rlo_mock):
+        rlo_mock.side_effect = self.fake_render_laid_out
+        render_targets("digraph {}", [(self.png, "png"), (self.svg, "svg")])
+        self.assertEqual(1, layout_mock.call_count)
+        rlo_mock.assert_called_once_with("laid out", [(self.png, "png"), (self.svg, "svg")])
+
+    @patch("diskgraph.dot.render", side_effect=fake_render)
+    @patch("diskgraph.dot.render_laid_out")
+    @patch("diskgraph.dot.layout", return_value="laid out")
+    def test_that_only_targets_missing_from_cache_are_rendered(self, layout_mock, rlo_mock, render_mock):
+        rlo_mock.side_effect = self.fake_render_laid_out
+        render_targets("digraph {}", [(self.png, "png")], self.cache)
+        cached = render_targets("digraph {}", [(self.png, "png"), (self.svg, "svg")], self.cache)
+        self.assertEqual([self.png], cached)
+        self.assertEqual((2, 0), (render_mock.call_count, layout_mock.call_count))
+
+class TestFormatOf(unittest.TestCase):
+    def test_that_format_is_given_by_extension(self):
+        self.assertEqual("svg", format_of("/var/www/diskgraph.SVG"))
+
+    def test_that_format_defaults_to_png(self):
+        self.assertEqual("png", format_of("diskgraph"))
@@ -0,0 +1,114 @@
+import unittest
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import *
+from diskgraph.rollup import rollup, rollup_text, Figures
+from diskgraph.query import DeviceIndex
+
+KB = 1024
+
+def objects():
+    # md0 is a RAID array on sdb1 and sdc1, with a PV and so a VG on it
+    return [Partition("8 16 2000 sdb".split(" ")),
+            Partition("8 17 1000 sdb1".split(" ")),
+            Partition("8 18 500 sdb2".split(" ")),
+            Partition("8 32 2000 sdc".split(" ")),
+            Partition("8 33 1000 sdc1".split(" ")),
+            RaidArray(("md0 sdb1 sdc1".split(" "), 1000)),
+            LvmPhysicalVolume(["/dev/md0", str(1000 * KB)]),
+            LvmVolumeGroup(["data", str(1000 * KB), ["/dev/md0"], str(400 * KB)]),
+            LvmLogicalVolume(["srv", "data", str(600 * KB)]),
+            MountedFileSystem(("/dev/mapper/data-srv %d %d 0 0%% /srv" % (600 * KB, 100 * KB)).split(" ")),
+            MountedFileSystem(("/dev/sdb2 %d %d 0 0%% /boot" % (500 * KB, 50 * KB)).split(" "))]
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        self.dg = DiskGraph(SysInfo.from_objects(objects()))
+        self.index = DeviceIndex(self.dg)
+
+    def figures(self, spec):
+        f = self.dg.rollup()[self.index.find(spec)]
+        return dict((name, value // KB) for name, value in f.asdict().items())
+
+    def test_that_disk_free_space_is_what_partitions_leave(self):
+        f = self.figures("sdb")
+        self.assertEqual((2000, 1500), (f["capacity"], f["allocated"]))
+
+    def test_that_disk_free_space_includes_free_space_above_it(self):
+        self.assertEqual(500 + 400, self.figures("sdb")["free"])
+
+    def test_that_vg_allocated_space_excludes_its_free_space(self):
+        f = self.figures("data")
+        self.assertEqual((1000, 600, 400), (f["capacity"], f["allocated"], f["free"]))
+
+    def test_that_file_systems_are_rolled_up(self):
+        f = self.figures("sdb")
+        self.assertEqual((1100, 150), (f["fs_size"], f["fs_used"]))
+
+    def test_that_vg_on_shared_raid_array_is_counted_once_at_root(self):
+        f = self.dg.rollup()[self.dg.root]
+        self.assertEqual((500 + 1000 + 400, 1100, 150), (f.free // KB, f.fs_size // KB, f.fs_used // KB))
+
+    def test_that_root_capacity_is_that_of_disks(self):
+        self.assertEqual(4000, self.dg.rollup()[self.dg.root].capacity // KB)
+
+    def test_that_free_space_nodes_have_no_figures(self):
+        self.assertFalse(any(isinstance(v, FreeSpace) for v in self.dg.rollup()))
+
+    def test_that_bind_mounted_file_system_is_counted_once(self):
+        objs = objects() + [MountedFileSystem(("/dev/sdb2 %d %d 0 0%% /mnt" % (500 * KB, 50 * KB)).split(" "))]
+        dg = DiskGraph(SysInfo.from_objects(objs))
+        self.assertEqual(500, dg.rollup()[DeviceIndex(dg).find("sdb2")].fs_size // KB)
+
+    def test_that_vg_on_arrays_on_the_same_disks_is_counted_once(self):
+        objs = [Partition("8 16 2000 sdb".split(" ")),
+                Partition("8 17 800 sdb1".split(" ")),
+                Partition("8 18 800 sdb2".split(" ")),
+                Partition("8 32 2000 sdc".split(" ")),
+                Partition("8 33 800 sdc1".split(" ")),
+                Partition("8 34 800 sdc2".split(" ")),
+                RaidArray(("md0 sdb1 sdc1".split(" "), 800)),
+                RaidArray(("md1 sdb2 sdc2".split(" "), 800)),
+                LvmPhysicalVolume(["/dev/md0", str(800 * KB)]),
+                LvmPhysicalVolume(["/dev/md1", str(800 * KB)]),
+                LvmVolumeGroup(["data", str(1600 * KB), ["/dev/md0", "/dev/md1"], str(200 * KB)]),
+                LvmLogicalVolume(["srv", "data", str(1400 * KB)]),
+                MountedFileSystem(("/dev/mapper/data-srv %d %d 0 0%% /srv" % (1400 * KB, 100 * KB)).split(" "))]
+        dg = DiskGraph(SysInfo.from_objects(objs))
+        figures = dg.rollup()
+        sums = lambda f: (f.free // KB, f.fs_size // KB, f.fs_used // KB)
+        self.assertEqual([(400 + 200, 1400, 100), (400 + 400 + 200, 1400, 100)],
+                         [sums(figures[DeviceIndex(dg).find("sdb")]), sums(figures[dg.root])])
+
+    def test_that_figures_are_computed_once(self):
+        self.assertIs(self.dg.rollup(), self.dg.rollup())
+
+    def test_that_update_recomputes_figures(self):
+        before = self.dg.rollup()
+        self.dg.update(SysInfo.from_objects(objects()[:5]))
+        after = self.dg.rollup()
+        self.assertIsNot(before, after)
+        self.assertEqual(500 + 1000, after[self.dg.root].free // KB)
+
+class TestRollupText(unittest.TestCase):
+    def test_that_text_has_usage_and_free_space(self):
+        self.assertEqual("used 2.00kB of 4.00kB, free 3.00kB", rollup_text(Figures(0, 0, 3 * KB, 4 * KB, 2 * KB)))
+
+    def test_that_nothing_to_tell_gives_none(self):
+        self.assertIsNone(rollup_text(Figures(KB, KB, 0, 0, 0)))
+
+class TestRollupOutput(unittest.TestCase):
+    def test_that_labels_include_figures_with_rollup_labels(self):
+        dg = DiskGraph(SysInfo.from_objects(objects()), rollup_labels=True)
+        self.assertIn("free 900.00kB", dg.dottext())
+
+    def test_that_labels_exclude_figures_by_default(self):
+        self.assertNotIn("free 900.00kB", DiskGraph(SysInfo.from_objects(objects())).dottext())
+
+    def test_that_query_includes_figures_with_rollup(self):
+        index = DeviceIndex(DiskGraph(SysInfo.from_objects(objects())))
+        result = index.query("sdc", rollup=True)
+        self.assertEqual(1400 * KB, result["node"]["rollup"]["free"])
+
+    def test_that_query_excludes_figures_by_default(self):
+        index = DeviceIndex(DiskGraph(SysInfo.from_objects(objects())))
+        self.assertNotIn("rollup", index.query("sdc")["node"])
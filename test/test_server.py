@@ -0,0 +1,163 @@
+import time
+import httplib
+import threading
+import unittest
+from email.utils import formatdate
+from diskgraph.sysinfo import *
+from diskgraph.server import GraphService, GraphServer, GraphRequestHandler
+
+def objects():
+    return [Partition("8 0 1000 sda".split(" ")), Partition("8 1 1000 sda1".split(" "))]
+
+class FakeCollect(object):
+    def __init__(self, objects=objects, event=None):
+        self.objects = objects
+        self.event = event
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.event:
+            self.event.wait()
+        return SysInfo.from_objects(self.objects())
+
+class FakeRender(object):
+    def __init__(self, event=None):
+        self.calls = 0
+        self.event = event
+
+    def __call__(self, text, fmt):
+        self.calls += 1
+        if self.event and fmt == "png":
+            self.event.wait()
+        return "%s image of %d bytes of DOT" % (fmt, len(text))
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000000000.0
+
+    def __call__(self):
+        return self.now
+
+class TestGraphService(unittest.TestCase):
+    def setUp(self):
+        self.collect = FakeCollect()
+        self.render = FakeRender()
+        self.clock = FakeClock()
+        self.service = GraphService(self.collect, self.render, ttl=60, clock=self.clock)
+
+    def test_that_graph_is_collected_within_ttl_only_once(self):
+        self.service.image("png")
+        self.clock.now += 59
+        self.service.image("png")
+        self.assertEqual(1, self.collect.calls)
+
+    def test_that_graph_is_collected_again_after_ttl(self):
+        self.service.image("png")
+        self.clock.now += 60
+        self.service.image("png")
+        self.assertEqual(2, self.collect.calls)
+
+    def test_that_unchanged_graph_isnt_rendered_again(self):
+        self.service.image("png")
+        self.clock.now += 60
+        self.service.image("png")
+        self.assertEqual(1, self.render.calls)
+
+    def test_that_unchanged_graph_keeps_modification_time(self):
+        _, _, modified = self.service.image("png")
+        self.clock.now += 60
+        self.assertEqual(modified, self.service.image("png")[2])
+
+    def test_that_changed_graph_gets_new_etag(self):
+        _, etag, _ = self.service.image("png")
+        self.collect.objects = lambda: objects()[:1]
+        self.clock.now += 60
+        self.assertNotEqual(etag, self.service.image("png")[1])
+
+    def test_that_concurrent_requests_share_one_collection(self):
+        self.collect.event = threading.Event()
+        threads = [threading.Thread(target=self.service.image, args=("svg",)) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        self.collect.event.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, self.collect.calls)
+
+    def test_that_slow_rendering_doesnt_hold_up_other_formats(self):
+        self.render.event = threading.Event()
+        t = threading.Thread(target=self.service.image, args=("png",))
+        t.start()
+        try:
+            time.sleep(0.1)
+            self.service.current()
+            self.assertEqual("svg image", self.service.image("svg")[0][:9])
+        finally:
+            self.render.event.set()
+            t.join()
+
+class QuietHandler(GraphRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class TestGraphServer(unittest.TestCase):
+    def setUp(self):
+        self.collect = FakeCollect()
+        self.render = FakeRender()
+        self.server = GraphServer(("127.0.0.1", 0), GraphService(self.collect, self.render), QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get(self, path, headers={}):
+        conn = httplib.HTTPConnection("127.0.0.1", self.server.server_port)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+    def test_that_png_is_served(self):
+        response, body = self.get("/graph.png")
+        self.assertEqual((200, "image/png"), (response.status, response.getheader("Content-Type")))
+        self.assertTrue(body.startswith("png image"))
+
+    def test_that_svg_and_json_are_served(self):
+        self.assertEqual([200, 200], [self.get(p)[0].status for p in ("/graph.svg", "/graph.json")])
+
+    def test_that_unknown_path_gives_404(self):
+        self.assertEqual(404, self.get("/graph.gif")[0].status)
+
+    def test_that_matching_etag_gives_304(self):
+        response, _ = self.get("/graph.png")
+        response, body = self.get("/graph.png", {"If-None-Match": response.getheader("ETag")})
+        self.assertEqual((304, ""), (response.status, body))
+
+    def test_that_other_etag_gives_image(self):
+        response, _ = self.get("/graph.png", {"If-None-Match": '"other"'})
+        self.assertEqual(200, response.status)
+
+    def test_that_not_modified_since_gives_304(self):
+        response, _ = self.get("/graph.png")
+        since = response.getheader("Last-Modified")
+        self.assertEqual(304, self.get("/graph.png", {"If-Modified-Since": since})[0].status)
+
+    def test_that_modified_since_gives_image(self):
+        since = formatdate(time.time() - 3600, usegmt=True)
+        self.assertEqual(200, self.get("/graph.png", {"If-Modified-Since": since})[0].status)
+
+    def test_that_304_doesnt_render(self):
+        response, _ = self.get("/graph.png")
+        self.get("/graph.svg", {"If-None-Match": response.getheader("ETag")})
+        self.assertEqual(1, self.render.calls)
+
+    def test_that_failing_collection_gives_500(self):
+        self.server.service.collect = lambda: 1 / 0
+        self.assertEqual(500, self.get("/graph.png")[0].status)
@@ -94,3 +94,87 @@ class TestSimpleGraph(unittest.TestCase):
         self.assertTrue(3 in graph.headsFor(root))
 
 
+    def test_that_vertex_reachable_twice_is_visited_once(self):
+        root = 1
+        headfinder = lambda x: {1: [2, 3], 2: [3]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        visited = list(graph.visit(root))
+        self.assertEqual([1, 2, 3], visited)
+
+    def test_that_vertex_reachable_twice_is_expanded_once(self):
+        root = 1
+        headfinder = lambda x: {1: [2, 3], 2: [3], 3: [4]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        visited = list(graph.visitEdges(root))
+        self.assertEqual([(1, 2), (2, 3), (3, 4), (1, 3)], visited)
+
+    def test_that_deep_graph_can_be_visited(self):
+        root = 0
+        headfinder = lambda x: [x + 1] if x < 5000 else []
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual(5001, len(list(graph.visit(root))))
+
+    def test_that_tails_are_updated_when_head_is_added(self):
+        root = 1
+        headfinder = lambda x: [2] if x == root else []
+        graph = SimpleGraph(headfinder, root)
+        graph.addHead(2, 3)
+        self.assertEqual([2], graph.tailsFor(3))
+
+    def test_that_tail_with_multiple_edges_to_vertex_is_listed_once(self):
+        root = 1
+        headfinder = lambda x: [2, 2] if x == root else []
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual([1], graph.tailsFor(2))
+
+    def test_that_descendants_exclude_the_vertex_itself(self):
+        root = 1
+        headfinder = lambda x: {1: [2, 3], 2: [4]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual([4], list(graph.descendants(2)))
+
+    def test_that_descendants_are_returned_in_dfs_order(self):
+        root = 1
+        headfinder = lambda x: {1: [2, 3], 2: [4]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual([2, 4, 3], list(graph.descendants(root)))
+
+    def test_that_ancestors_are_found_along_all_paths(self):
+        root = 1
+        headfinder = lambda x: {1: [2, 3], 2: [4], 3: [4]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual([2, 1, 3], list(graph.ancestors(4)))
+
+    def test_that_root_has_no_ancestors(self):
+        root = 1
+        headfinder = lambda x: [2] if x == root else []
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual([], list(graph.ancestors(root)))
+
+    def test_that_heads_can_be_replaced(self):
+        root = 1
+        headfinder = lambda x: [2] if x == root else []
+        graph = SimpleGraph(headfinder, root)
+        graph.setHeads(root, [3])
+        self.assertEqual(([3], [], [1]), (graph.headsFor(root), graph.tailsFor(2), graph.tailsFor(3)))
+
+    def test_that_vertex_can_be_removed(self):
+        root = 1
+        headfinder = lambda x: {1: [2], 2: [3]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        graph.removeVertex(2)
+        self.assertEqual(([], [], 2), (graph.headsFor(root), graph.tailsFor(3), graph.order))
+
+    def test_that_removed_tail_can_be_added_again(self):
+        root = 1
+        headfinder = lambda x: {1: [2], 2: [3]}.get(x, [])
+        graph = SimpleGraph(headfinder, root)
+        graph.setHeads(2, [])
+        graph.setHeads(2, [3])
+        self.assertEqual([2], graph.tailsFor(3))
+
+    def test_that_vertex_with_many_tails_keeps_their_order(self):
+        root = 0
+        headfinder = lambda x: range(1, 1001) if x == root else [-1] if x > 0 else []
+        graph = SimpleGraph(headfinder, root)
+        self.assertEqual(range(1, 1001), graph.tailsFor(-1))
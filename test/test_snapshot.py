@@ -0,0 +1,94 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import *
+from diskgraph import snapshot
+
+def objects():
+    return [Partition("8 0 204800 sda".split(" ")),
+            Partition("8 1 1000 sda1".split(" ")),
+            Partition(["8", "2", "1000", "sda2"], whole_disk=False, disk_name="sda"),
+            RaidArray(("md0 sda1".split(" "), 1000)),
+            LvmPhysicalVolume("/dev/md0 1000".split(" ")),
+            LvmVolumeGroup(["group", "1000", ["/dev/md0"], "0"]),
+            LvmLogicalVolume(["test", "group", "1000"]),
+            DeviceMapper("dm-0", "group-test", ["md0"], 1000, (253, 0), "LVM-abc"),
+            MountedFileSystem("/dev/mapper/group-test 1000 0 1000 0% /srv".split(" ")),
+            SwapArea("/dev/sda2 partition 1000 0 -1".split(" "))]
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.sysinfo = SysInfo.from_objects(objects(), ["SwapArea"])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def roundtrip(self, name):
+        fn = os.path.join(self.dir, name)
+        snapshot.save(self.sysinfo, fn)
+        return snapshot.load(fn)
+
+    def test_that_objects_survive_roundtrip(self):
+        loaded = self.roundtrip("snap.json")
+        self.assertEqual([(o.identity, o.state()) for o in self.sysinfo.objects],
+                         [(o.identity, o.state()) for o in loaded.objects])
+
+    def test_that_objects_survive_gzip_roundtrip(self):
+        loaded = self.roundtrip("snap.json.gz")
+        self.assertEqual([(o.identity, o.state()) for o in self.sysinfo.objects],
+                         [(o.identity, o.state()) for o in loaded.objects])
+
+    def test_that_snapshot_is_gzipd_if_name_ends_with_gz(self):
+        self.roundtrip("snap.json.gz")
+        with open(os.path.join(self.dir, "snap.json.gz"), "rb") as fd:
+            self.assertEqual("\x1f\x8b", fd.read(2))
+
+    def test_that_missing_collectors_survive_roundtrip(self):
+        self.assertEqual(["SwapArea"], self.roundtrip("snap.json").missing)
+
+    def test_that_strings_are_loaded_as_plain_strings(self):
+        self.assertEqual(str, type(self.roundtrip("snap.json").objects[0].name))
+
+    def test_that_graph_from_snapshot_matches_graph_from_objects(self):
+        loaded = self.roundtrip("snap.json")
+        edges = lambda dg: [(t.identity, h.identity, str(h)) for t, h in dg.visitEdges(dg.root)]
+        self.assertEqual(edges(DiskGraph(self.sysinfo)), edges(DiskGraph(loaded)))
+
+    def test_that_no_temporary_file_is_left(self):
+        self.roundtrip("snap.json")
+        self.assertEqual(["snap.json"], os.listdir(self.dir))
+
+    def test_that_other_version_is_rejected(self):
+        fn = os.path.join(self.dir, "snap.json")
+        with open(fn, "w") as fd:
+            fd.write('{"format": "diskgraph-snapshot", "version": 99, "objects": []}')
+        self.assertRaises(ValueError, snapshot.load, fn)
+
+    def test_that_other_format_is_rejected(self):
+        fn = os.path.join(self.dir, "snap.json")
+        with open(fn, "w") as fd:
+            fd.write('{"objects": []}')
+        self.assertRaises(ValueError, snapshot.load, fn)
+
+    def test_that_new_snapshot_is_fresh(self):
+        fn = os.path.join(self.dir, "snap.json")
+        snapshot.save(self.sysinfo, fn)
+        self.assertTrue(snapshot.is_fresh(fn, 60))
+
+    def test_that_old_snapshot_isnt_fresh(self):
+        fn = os.path.join(self.dir, "snap.json")
+        snapshot.save(self.sysinfo, fn)
+        os.utime(fn, (time.time() - 120, time.time() - 120))
+        self.assertFalse(snapshot.is_fresh(fn, 60))
+
+    def test_that_missing_snapshot_isnt_fresh(self):
+        self.assertFalse(snapshot.is_fresh(os.path.join(self.dir, "nope.json"), 60))
+
+class TestLoadObject(unittest.TestCase):
+    def test_that_fields_missing_from_record_are_none(self):
+        dm = snapshot.load_object(["DeviceMapper", "dm-0", "crypt", ["sda2"], 1000, [253, 0], "CRYPT-x"])
+        self.assertEqual((("sda2",), None), (dm.slave_names, dm.path_count))
@@ -0,0 +1,156 @@
+import unittest
+from diskgraph.diskgraph import DiskGraph, style_dict
+from diskgraph.sysinfo import *
+from diskgraph.iostats import IoStats
+from diskgraph.query import DeviceIndex
+from diskgraph.style import *
+
+KB = 1024
+
+def objects():
+    # md0 is a RAID 1 array on sdb1 and sdc1 that has lost one of them
+    return [Partition("8 16 2000 sdb".split(" ")),
+            Partition("8 17 1000 sdb1".split(" ")),
+            Partition("8 18 500 sdb2".split(" ")),
+            Partition("8 32 2000 sdc".split(" ")),
+            Partition("8 33 1000 sdc1".split(" ")),
+            RaidArray(("md0 sdb1 sdc1".split(" "), 1000), (9, 0), 2, 1),
+            MountedFileSystem(("/dev/md0 %d %d 0 0%% /srv" % (1000 * KB, 950 * KB)).split(" ")),
+            MountedFileSystem(("/dev/sdb2 %d %d 0 0%% /boot" % (500 * KB, 100 * KB)).split(" "))]
+
+class TestThreshold(unittest.TestCase):
+    def setUp(self):
+        self.scale = Threshold([(0.8, "orange"), (0.9, "red")])
+
+    def test_that_value_below_all_limits_has_no_color(self):
+        self.assertIsNone(self.scale.color(0.5))
+
+    def test_that_value_gets_color_of_last_limit_above(self):
+        self.assertEqual(["orange", "red"], [self.scale.color(0.85), self.scale.color(0.95)])
+
+    def test_that_limits_are_exclusive(self):
+        self.assertEqual("orange", self.scale.color(0.9))
+
+    def test_that_below_gives_color_of_last_limit_below(self):
+        scale = Threshold([(0.2, "orange"), (0.1, "red")], below=True)
+        self.assertEqual([None, "orange", "red"], [scale.color(0.5), scale.color(0.15), scale.color(0.05)])
+
+    def test_that_order_of_limits_doesnt_matter(self):
+        scale = Threshold([(0.9, "red"), (0.8, "orange")])
+        self.assertEqual(["orange", "red"], [scale.color(0.85), scale.color(0.95)])
+
+class TestGradient(unittest.TestCase):
+    def setUp(self):
+        self.scale = Gradient("#000000", "#ff8000")
+
+    def test_that_ends_are_given_colors(self):
+        self.assertEqual(["#000000", "#ff8000"], [self.scale.color(0), self.scale.color(1)])
+
+    def test_that_colors_are_blended(self):
+        self.assertEqual("#804000", self.scale.color(0.5))
+
+    def test_that_values_are_clamped(self):
+        self.assertEqual(["#000000", "#ff8000"], [self.scale.color(-1), self.scale.color(2)])
+
+    def test_that_non_hex_color_is_rejected(self):
+        self.assertRaises(ValueError, Gradient, "red", "#ff0000")
+
+class TestParse(unittest.TestCase):
+    def test_that_thresholds_are_percentages(self):
+        scale = parse_thresholds("80:orange,90:red")
+        self.assertEqual(([(0.8, "orange"), (0.9, "red")], False), (scale.steps, scale.below))
+
+    def test_that_thresholds_can_be_below(self):
+        self.assertTrue(parse_thresholds("<20:orange,<10:red").below)
+
+    def test_that_thresholds_out_of_order_are_sorted(self):
+        self.assertEqual(["orange", "red"], [parse_thresholds("90:red,80:orange").color(v) for v in (0.85, 0.95)])
+        self.assertEqual(["orange", "red"], [parse_thresholds("<10:red,<20:orange").color(v) for v in (0.15, 0.05)])
+
+    def test_that_mixed_thresholds_are_rejected(self):
+        self.assertRaises(ValueError, parse_thresholds, "80:orange,<10:red")
+
+    def test_that_threshold_without_color_is_rejected(self):
+        self.assertRaises(ValueError, parse_thresholds, "80")
+
+    def test_that_threshold_without_percentage_is_rejected(self):
+        self.assertRaises(ValueError, parse_thresholds, "high:red")
+
+    def test_that_gradient_is_two_colors(self):
+        self.assertEqual("#ff0000", parse_gradient("#00ff00:#ff0000").color(1))
+
+    def test_that_gradient_needs_two_colors(self):
+        self.assertRaises(ValueError, parse_gradient, "#00ff00")
+
+class TestStyler(unittest.TestCase):
+    def setUp(self):
+        self.sysinfo = SysInfo.from_objects(objects())
+
+    def fillcolor(self, metric, spec, scale=None, iostats=None):
+        dg = DiskGraph(self.sysinfo, styler=Styler(metric, scale))
+        if iostats is not None:
+            dg.set_iostats(iostats)
+        return dg.style(DeviceIndex(dg).find(spec)).get("fillcolor")
+
+    def test_that_default_colors_are_by_type(self):
+        dg = DiskGraph(self.sysinfo)
+        self.assertEqual([style_dict(v) for v in dg.visit(dg.root)], [dg.style(v) for v in dg.visit(dg.root)])
+
+    def test_that_full_file_system_is_red(self):
+        self.assertEqual("red", self.fillcolor("full", "/srv"))
+
+    def test_that_roomy_file_system_keeps_its_color(self):
+        self.assertEqual("navy", self.fillcolor("full", "/boot"))
+
+    def test_that_devices_are_colored_by_file_systems_above_them(self):
+        # 1050 of 1500 used on sdb
+        self.assertEqual(["red", "gold"], [self.fillcolor("full", "md0"),
+                                           self.fillcolor("full", "sdb", Threshold([(0.75, "red")]))])
+
+    def test_that_free_space_ratio_is_low_is_bad(self):
+        self.assertEqual(["red", "navy"], [self.fillcolor("free", "/srv"), self.fillcolor("free", "/boot")])
+
+    def test_that_free_space_of_file_systems_counts_as_free(self):
+        self.sysinfo = SysInfo.from_objects([
+            Partition("8 16 2000 sdb".split(" ")),
+            Partition("8 17 2000 sdb1".split(" ")),
+            LvmPhysicalVolume(["/dev/sdb1", str(2000 * KB)]),
+            LvmVolumeGroup(["data", str(2000 * KB), ["/dev/sdb1"], "0"]),
+            LvmLogicalVolume(["srv", "data", str(1000 * KB)]),
+            LvmLogicalVolume(["swap", "data", str(1000 * KB)]),
+            MountedFileSystem(("/dev/mapper/data-srv %d %d 0 0%% /srv" % (1000 * KB, 500 * KB)).split(" ")),
+            SwapArea("/dev/mapper/data-swap partition 1000 0 -1".split())])
+        # the LV is fully allocated, but its file system is half free
+        self.assertEqual("mediumorchid1", self.fillcolor("free", "data/srv"))
+        # a quarter of the disk is free
+        self.assertEqual("orange", self.fillcolor("free", "sdb", Threshold([(0.3, "orange")], below=True)))
+
+    def test_that_swap_area_has_no_free_space_value(self):
+        dg = DiskGraph(SysInfo.from_objects([Partition("8 16 2000 sdb".split(" ")),
+                                             SwapArea("/dev/sdb partition 2000 0 -1".split())]))
+        swap = dg.headsFor(DeviceIndex(dg).find("sdb"))[0]
+        self.assertEqual([None], METRICS["free"].values(SwapArea, [swap], dg))
+
+    def test_that_degraded_raid_array_is_red(self):
+        self.assertEqual("red", self.fillcolor("degraded", "md0"))
+
+    def test_that_intact_raid_array_keeps_its_color(self):
+        self.sysinfo = SysInfo.from_objects(objects()[:5] + [RaidArray(("md0 sdb1 sdc1".split(" "), 1000), (9, 0), 2, 2)])
+        self.assertEqual("cadetblue", self.fillcolor("degraded", "md0"))
+
+    def test_that_busy_device_is_red(self):
+        iostats = {(9, 0): IoStats(100, 0, 0, 1, 90), (8, 18): IoStats(1, 0, 0, 0, 10)}
+        self.assertEqual(["red", "chartreuse1"], [self.fillcolor("io", "md0", iostats=iostats),
+                                                  self.fillcolor("io", "sdb2", iostats=iostats)])
+
+    def test_that_gradient_colors_by_value(self):
+        # halfway from green to red
+        self.assertEqual("#99661a", self.fillcolor("degraded", "md0", METRICS["degraded"].gradient()))
+
+    def test_that_colors_are_reset_by_new_iostats(self):
+        dg = DiskGraph(self.sysinfo, styler=Styler("io"))
+        md0 = DeviceIndex(dg).find("md0")
+        dg.set_iostats({(9, 0): IoStats(100, 0, 0, 1, 90)})
+        dg.style(md0)
+        dg.set_iostats({(9, 0): IoStats(1, 0, 0, 0, 1)})
+        self.assertEqual("cadetblue", dg.style(md0)["fillcolor"])
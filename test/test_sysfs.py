@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import unittest
+from diskgraph.diskgraph import DiskGraph
+from diskgraph.sysinfo import *
+from diskgraph.sysfs import SysfsTopology
+
+class FakeSysfs(object):
+    def __init__(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, "block"))
+
+    def remove(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, value):
+        full = os.path.join(self.root, "block", path)
+        if not os.path.isdir(os.path.dirname(full)):
+            os.makedirs(os.path.dirname(full))
+        with open(full, "w") as fd:
+            fd.write("%s\n" % value)
+
+    def mkdir(self, path):
+        os.makedirs(os.path.join(self.root, "block", path))
+
+    def device(self, path, devno, sectors):
+        self.write(os.path.join(path, "dev"), devno)
+        self.write(os.path.join(path, "size"), sectors)
+        self.mkdir(os.path.join(path, "slaves"))
+
+    def disk(self, name, devno, sectors):
+        self.device(name, devno, sectors)
+        self.mkdir(os.path.join(name, "device"))
+
+    def partition(self, disk, name, number, devno, sectors):
+        self.device(os.path.join(disk, name), devno, sectors)
+        self.write(os.path.join(disk, name, "partition"), number)
+
+    def slaves(self, name, *slaves):
+        for slave in slaves:
+            self.mkdir(os.path.join(name, "slaves", slave))
+
+class TestSysfsTopology(unittest.TestCase):
+    def setUp(self):
+        fs = self.fs = FakeSysfs()
+        fs.disk("sda", "8:0", 2000)
+        fs.partition("sda", "sda1", 1, "8:1", 1000)
+        fs.partition("sda", "sda2", 2, "8:2", 500)
+        fs.disk("nvme0n1", "259:0", 4000)
+        fs.partition("nvme0n1", "nvme0n1p1", 1, "259:1", 1000)
+        fs.disk("vda", "252:0", 0)
+        fs.device("loop0", "7:0", 100)
+        fs.device("md0", "9:0", 1000)
+        fs.write("md0/md/raid_disks", 2)
+        fs.write("md0/md/degraded", 1)
+        fs.slaves("md0", "sda1", "nvme0n1p1")
+        fs.device("dm-0", "253:0", 800)
+        fs.write("dm-0/dm/name", "vg-root")
+        fs.write("dm-0/dm/uuid", "LVM-abc")
+        fs.slaves("dm-0", "md0")
+        self.objects = SysfsTopology(fs.root).generate()
+
+    def tearDown(self):
+        self.fs.remove()
+
+    def named(self, name):
+        return [o for o in self.objects if o.name == name][0]
+
+    def test_that_devices_are_found_in_device_number_order(self):
+        self.assertEqual(["sda", "sda1", "sda2", "md0", "vg-root", "nvme0n1", "nvme0n1p1"],
+                         [o.name for o in self.objects])
+
+    def test_that_devices_without_backing_device_or_size_are_skipped(self):
+        self.assertEqual([], [o for o in self.objects if o.name in ("loop0", "vda")])
+
+    def test_that_nvme_disk_is_disk(self):
+        self.assertTrue(self.named("nvme0n1").is_disk())
+
+    def test_that_nvme_partition_is_partition_for_its_disk(self):
+        self.assertTrue(self.named("nvme0n1p1").is_partition_for(self.named("nvme0n1")))
+
+    def test_that_partition_contains_kernel_major_minor(self):
+        self.assertEqual((8, 2), self.named("sda2").kernel_major_minor)
+
+    def test_that_partition_contains_size(self):
+        self.assertEqual(512000, self.named("sda1").byte_size)
+
+    def test_that_raid_array_contains_slaves(self):
+        self.assertEqual(("nvme0n1p1", "sda1"), self.named("md0").partition_names)
+
+    def test_that_raid_array_contains_size(self):
+        self.assertEqual(512000, self.named("md0").byte_size)
+
+    def test_that_raid_array_contains_device_counts(self):
+        md0 = self.named("md0")
+        self.assertEqual((2, 1), (md0.device_count, md0.active_count))
+
+    def test_that_device_mapper_contains_kernel_name_and_uuid(self):
+        dm = self.named("vg-root")
+        self.assertEqual(("dm-0", "LVM-abc"), (dm.kernel_name, dm.uuid))
+
+    def test_that_graph_stacks_devices(self):
+        sysinfo = SysInfo([SysfsTopology(self.fs.root)])
+        dg = DiskGraph(sysinfo)
+        self.assertEqual(["sda1", "nvme0n1p1"],
+                         [t.name for t in dg.tailsFor(sysinfo.objects[3])])
+        self.assertEqual(["md0"], [t.name for t in dg.tailsFor(sysinfo.objects[4])])
+
+    def test_that_missing_sysfs_gives_no_objects(self):
+        self.assertEqual([], SysfsTopology(os.path.join(self.fs.root, "nothing")).generate())
+
+class TestDeviceMapper(unittest.TestCase):
+    def setUp(self):
+        self.dm = DeviceMapper("dm-1", "crypt", ["sda2"], 1000)
+
+    def test_that_device_mapper_is_child_of_slave(self):
+        self.assertTrue(self.dm.is_child_of(Partition("8 2 1000 sda2".split(" "))))
+
+    def test_that_device_mapper_is_child_of_slave_device_mapper(self):
+        self.assertTrue(DeviceMapper("dm-2", "top", ["dm-1"], 1000).is_child_of(self.dm))
+
+    def test_that_mounted_fs_is_child_of_device_mapper(self):
+        mfs = MountedFileSystem("/dev/mapper/crypt 1000 0 1000 0% /srv".split(" "))
+        self.assertTrue(mfs.is_child_of(self.dm))
+
+    def test_that_pv_is_child_of_device_mapper(self):
+        self.assertTrue(LvmPhysicalVolume("/dev/mapper/crypt 1000".split(" ")).is_child_of(self.dm))
+
+    def test_that_swap_area_is_child_of_device_mapper(self):
+        self.assertTrue(SwapArea("/dev/dm-1 partition 1000 0 -1".split(" ")).is_child_of(self.dm))
+
+    def test_that_index_agrees_with_is_child_of(self):
+        pool = [Partition("8 2 1000 sda2".split(" ")), self.dm,
+                MountedFileSystem("/dev/mapper/crypt 1000 0 1000 0% /srv".split(" ")),
+                SwapArea("/dev/dm-1 partition 1000 0 -1".split(" "))]
+        index = SysObjectIndex(pool)
+        for tail in pool:
+            self.assertEqual(tail.expand(pool), tail.expand(index))
+
+class TestDeviceMapperScan(unittest.TestCase):
+    def setUp(self):
+        fs = self.fs = FakeSysfs()
+        fs.device("dm-0", "253:0", 800)
+        fs.write("dm-0/dm/name", "vg-home")
+        fs.write("dm-0/dm/uuid", "LVM-abc")
+        fs.device("dm-1", "253:1", 800)
+        fs.write("dm-1/dm/name", "home_crypt")
+        fs.write("dm-1/dm/uuid", "CRYPT-LUKS1-abc-home_crypt")
+        fs.slaves("dm-1", "dm-0")
+        fs.device("dm-2", "253:2", 4000)
+        fs.write("dm-2/dm/name", "mpatha")
+        fs.write("dm-2/dm/uuid", "mpath-3600a0b80001")
+        fs.slaves("dm-2", "sdb", "sdc")
+        fs.device("sdb", "8:16", 4000)
+        self.block = os.path.join(fs.root, "block")
+
+    def tearDown(self):
+        self.fs.remove()
+
+    def test_that_only_device_mapper_devices_are_found(self):
+        self.assertEqual(["dm-0", "dm-1", "dm-2"], [d.kernel_name for d in DeviceMapper.scan(self.block)])
+
+    def test_that_target_is_given_by_uuid(self):
+        self.assertEqual(["lvm", "crypt", "multipath"], [d.target() for d in DeviceMapper.scan(self.block)])
+
+    def test_that_lvm_devices_can_be_skipped(self):
+        self.assertEqual(["dm-1", "dm-2"],
+                         [d.kernel_name for d in DeviceMapper.scan(self.block, skip_lvm=True)])
+
+    def test_that_skipped_lvm_slave_is_listed_by_mapper_name(self):
+        crypt = DeviceMapper.scan(self.block, skip_lvm=True)[0]
+        self.assertEqual(("mapper/vg-home",), crypt.slave_names)
+
+    def test_that_crypt_device_is_child_of_lv(self):
+        crypt = DeviceMapper.scan(self.block, skip_lvm=True)[0]
+        lv = LvmLogicalVolume(["home", "vg", "800"])
+        self.assertEqual([crypt], SysObjectIndex([lv, crypt]).children_of(lv))
+
+class TestCollapseMultipath(unittest.TestCase):
+    def setUp(self):
+        self.mpath = DeviceMapper("dm-2", "mpatha", ["sdb", "sdc"], 4096, uuid="mpath-3600a0b80001")
+        self.objects = [Partition("8 0 1000 sda".split(" ")),
+                        Partition("8 16 4 sdb".split(" ")), Partition("8 17 4 sdb1".split(" ")),
+                        Partition("8 32 4 sdc".split(" ")), Partition("8 33 4 sdc1".split(" ")),
+                        self.mpath,
+                        DeviceMapper("dm-3", "mpatha1", ["dm-2"], 4096, uuid="part1-mpath-3600a0b80001")]
+
+    def test_that_paths_are_left_out(self):
+        self.assertEqual(["sda", "mpatha", "mpatha1"], [o.name for o in collapse_multipath(self.objects)])
+
+    def test_that_path_count_is_recorded(self):
+        collapse_multipath(self.objects)
+        self.assertEqual(2, self.mpath.path_count)
+
+    def test_that_multipath_device_is_below_root(self):
+        dg = DiskGraph(SysInfo.from_objects(collapse_multipath(self.objects)))
+        self.assertEqual(["sda", "mpatha"], [h.name for h in dg.headsFor(dg.root)])
+
+    def test_that_label_includes_path_count(self):
+        collapse_multipath(self.objects)
+        self.assertEqual("Multipath device\nmpatha\n2 paths\n4.00kB", str(self.mpath))
+
+    def test_that_objects_without_multipath_are_kept(self):
+        objects = self.objects[:1]
+        self.assertIs(objects, collapse_multipath(objects))
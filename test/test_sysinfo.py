@@ -1,6 +1,10 @@
+import os
 import re
+import time
+import threading
 import unittest
 from diskgraph.sysinfo import *
+from diskgraph.sysinfo import exec_cmd
 from mock import patch, MagicMock, Mock
 from cStringIO import StringIO
 from diskgraph.check import Checker
@@ -10,6 +14,9 @@ def checker_mock(b):
     c = Mock(spec=Checker)
     c.has_mdstat.return_value = b
     c.has_df_command.return_value = b
+    # the df tests cover the fallback; mountinfo is tested separately
+    c.has_mountinfo.return_value = False
+    c.has_sys_block.return_value = False
     c.has_partitions.return_value = b
     c.has_lvm_commands.return_value = b
     c.has_swaps.return_value = b
@@ -22,6 +29,7 @@ def confopenmock(mock, text):
     mock.return_value = MagicMock(spec=file)
     handle = mock.return_value.__enter__.return_value
     handle.__iter__.return_value = iter(splitkeepsep(text, "\n"))
+    handle.read.return_value = text
 
 class TestSysInfoPartitionGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
@@ -73,12 +81,44 @@ class TestSysInfoRaidArrayGeneration(unittest.TestCase):
 
     def test_that_array_contains_partition_names(self):
         arr = self.md[0]
-        self.assertListEqual(["sdf1", "sdi1"], arr.partition_names)
+        self.assertEqual(("sdf1", "sdi1"), arr.partition_names)
 
     def test_that_array_contains_size(self):
         arr = self.md[0]
         self.assertEqual(250056605696, arr.byte_size)
 
+class TestRaidArrayParse(unittest.TestCase):
+    def setUp(self):
+        text = ("Personalities : [raid1] [raid5]\n"
+                "md0 : active raid5 sdc1[2](F) sdb1[1] sda1[0]\n"
+                "      1953260544 blocks level 5, 512k chunk, algorithm 2 [3/2] [UU_]\n"
+                "\n"
+                "md1 : active raid1 sdd1[1] sde1[0]\n"
+                "      244195904 blocks [2/2] [UU]\n"
+                "\n"
+                "unused devices: <none>\n")
+        self.md = RaidArray.parse(text)
+
+    def test_that_all_arrays_are_found(self):
+        self.assertEqual(["md0", "md1"], [arr.name for arr in self.md])
+
+    def test_that_failed_member_is_included(self):
+        self.assertEqual(("sdc1", "sdb1", "sda1"), self.md[0].partition_names)
+
+    def test_that_sizes_are_paired_with_arrays(self):
+        self.assertEqual(244195904 * 1024, self.md[1].byte_size)
+
+    def test_that_device_counts_are_parsed(self):
+        self.assertEqual([(3, 2), (2, 2)], [(arr.device_count, arr.active_count) for arr in self.md])
+
+    def test_that_degradation_is_share_of_missing_devices(self):
+        self.assertEqual([1 / 3.0, 0], [arr.degradation() for arr in self.md])
+
+    def test_that_array_without_device_counts_has_no_degradation(self):
+        arr = RaidArray.parse("md2 : active raid0 sdf1[1] sdg1[0]\n"
+                              "      488391808 blocks 512k chunks\n")[0]
+        self.assertIsNone(arr.degradation())
+
 class TestSysInfoSwapAreaGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
     @patch("diskgraph.sysinfo.open", create=True)
@@ -105,7 +145,7 @@ class TestSysInfoSwapAreaGeneration(unittest.TestCase):
 
 class TestSysInfoMountedFileSystemGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def setUp(self, exec_mock):
         exec_mock.return_value = ("Filesystem           1B-blocks      Used Available Use% Mounted on\n"
                                   "/dev/sdk2            3897212928 2526269440 1212547072  68% /boot\n")
@@ -126,6 +166,57 @@ class TestSysInfoMountedFileSystemGeneration(unittest.TestCase):
         mfs = self.mounts[0]
         self.assertEqual(3897212928, mfs.byte_size)
 
+class FakeStatvfs(object):
+    def __init__(self, blocks, bfree, bavail, frsize=4096):
+        self.f_blocks = blocks
+        self.f_bfree = bfree
+        self.f_bavail = bavail
+        self.f_frsize = frsize
+
+class TestSysInfoMountedFileSystemFromMountinfo(unittest.TestCase):
+    def setUp(self):
+        text = ("22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/root rw\n"
+                "23 22 0:22 / /proc rw,relatime shared:12 - proc proc rw\n"
+                "24 22 0:30 / /mnt rw,relatime - nfs server:/export rw\n"
+                "25 22 0:31 / /data rw,relatime - btrfs /dev/sdb rw\n")
+        self.statvfs_calls = []
+        self.mounts = MountedFileSystem.from_mountinfo(text, statvfs=self.statvfs)
+
+    def statvfs(self, path):
+        self.statvfs_calls.append(path)
+        return FakeStatvfs(1000, 400, 300)
+
+    def test_that_only_block_device_mounts_are_statted(self):
+        self.assertEqual(["/", "/data"], sorted(self.statvfs_calls))
+
+    def test_that_mounted_fs_contains_size_and_used_size(self):
+        mfs = self.mounts[0]
+        self.assertEqual((4096000, 2457600), (mfs.byte_size, mfs.used_size))
+
+    def test_that_mounted_fs_contains_device_number(self):
+        self.assertEqual((8, 1), self.mounts[0].kernel_major_minor)
+
+    def test_that_anonymous_device_number_is_dropped(self):
+        self.assertIsNone(self.mounts[1].kernel_major_minor)
+
+    def test_that_mounted_fs_is_child_of_partition_by_device_number(self):
+        p = Partition("8 1 1000 sda1".split(" "))
+        self.assertEqual([self.mounts[0]], SysObjectIndex(self.mounts).children_of(p))
+
+    def test_that_mounted_fs_falls_back_to_path(self):
+        d = Partition("8 16 1000 sdb".split(" "))
+        self.assertEqual([self.mounts[1]], SysObjectIndex(self.mounts).children_of(d))
+
+class TestSysInfoMountedFileSystemGenerationFromMountinfo(unittest.TestCase):
+    @patch("diskgraph.sysinfo.checker")
+    @patch("diskgraph.sysinfo.read_file")
+    @patch("diskgraph.sysinfo.exec_cmd")
+    def test_that_df_isnt_run_if_mountinfo_exists(self, exec_mock, read_mock, checker_mock):
+        checker_mock.has_mountinfo.return_value = True
+        read_mock.return_value = ""
+        self.assertEqual([], MountedFileSystem.generate())
+        self.assertFalse(exec_mock.called)
+
 class TestSwapArea(unittest.TestCase):
     def test_that_swap_area_is_child_of_partition(self):
         p = Partition("8 2 497660 sda2".split(" "))
@@ -133,6 +224,22 @@ class TestSwapArea(unittest.TestCase):
         self.assertTrue(sa.is_child_of(p))
 
 class TestMountedFileSystem(unittest.TestCase):
+    def test_that_mounted_fs_is_child_of_device_with_same_device_number(self):
+        p = Partition("8 1 1000 sda1".split(" "))
+        mfs = MountedFileSystem("/dev/root 1000 0 1000 0% /".split(" "), (8, 1))
+        self.assertTrue(mfs.is_child_of(p))
+
+    def test_that_mounted_fs_is_child_of_lv_with_same_device_number(self):
+        lv = LvmLogicalVolume("small test 1000 253 2".split(" "))
+        mfs = MountedFileSystem("/dev/dm-2 1000 0 1000 0% /srv".split(" "), (253, 2))
+        self.assertEqual([mfs], SysObjectIndex([lv, mfs]).children_of(lv))
+
+    def test_that_mounted_fs_is_not_child_of_bind_mount_with_same_device_number(self):
+        mfs = MountedFileSystem("/dev/sda1 1000 0 1000 0% /srv".split(" "), (8, 1))
+        bind = MountedFileSystem("/dev/sda1 1000 0 1000 0% /mnt".split(" "), (8, 1))
+        self.assertFalse(bind.is_child_of(mfs))
+        self.assertEqual([], SysObjectIndex([mfs, bind]).children_of(mfs))
+
     def test_that_mounted_fs_is_not_child_of_wrong_partition(self):
         p = Partition("8 1 1000 sda1".split(" "))
         mfs = MountedFileSystem("/dev/sda2 3897212928 2526269440 1212547072 68% /boot".split(" "))
@@ -170,7 +277,7 @@ class TestMountedFileSystem(unittest.TestCase):
 
 class TestSysInfoLvmPhysicalVolumeGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def setUp(self, exec_mock):
         exec_mock.return_value = "  /dev/md0   1500310929408\n"
         self.pvs = LvmPhysicalVolume.generate()
@@ -192,7 +299,7 @@ class TestSysInfoLvmPhysicalVolumeGeneration(unittest.TestCase):
 
 class TestSysInfoLvmVolumeGroupGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def setUp(self, exec_mock):
         exec_mock.return_value = ("  backup  700146778112 /dev/md1 0\n"
                                   "  backup  700146778112 /dev/md2 0\n"
@@ -216,11 +323,76 @@ class TestSysInfoLvmVolumeGroupGeneration(unittest.TestCase):
 
     def test_that_lvm_volume_group_contains_physical_volume_names(self):
         vg = self.vgs[0]
-        self.assertListEqual(["md1", "md2"], vg.pv_names)
+        self.assertEqual(("md1", "md2"), vg.pv_names)
+
+def fixture(name):
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", name)) as f:
+        return f.read()
+
+class TestSysInfoLvmReportGeneration(unittest.TestCase):
+    @patch("diskgraph.sysinfo.checker", checker_mock(True))
+    @patch("diskgraph.sysinfo.exec_cmd")
+    def setUp(self, exec_mock):
+        exec_mock.return_value = fixture("lvm_fullreport.json")
+        self.objects = LvmReport.generate()
+        self.exec_mock = exec_mock
+
+    def of_type(self, klass):
+        return [o for o in self.objects if isinstance(o, klass)]
+
+    def test_that_lvm_is_run_once(self):
+        self.assertEqual(1, self.exec_mock.call_count)
+
+    def test_that_physical_volumes_are_found(self):
+        self.assertEqual(["md1", "md2", "sdd2"], [pv.name for pv in self.of_type(LvmPhysicalVolume)])
+
+    def test_that_physical_volume_contains_size(self):
+        self.assertEqual(350071291904, self.of_type(LvmPhysicalVolume)[0].byte_size)
+
+    def test_that_volume_group_is_found(self):
+        self.assertEqual(["backup"], [vg.name for vg in self.of_type(LvmVolumeGroup)])
+
+    def test_that_volume_group_contains_physical_volume_names(self):
+        self.assertEqual(("md1", "md2"), self.of_type(LvmVolumeGroup)[0].pv_names)
+
+    def test_that_volume_group_contains_size_and_free_space(self):
+        vg = self.of_type(LvmVolumeGroup)[0]
+        self.assertEqual((700146778112, 21474836480), (vg.byte_size, vg.free_space))
+
+    def test_that_hidden_logical_volumes_are_skipped(self):
+        self.assertEqual(["homes", "media"], [lv.name for lv in self.of_type(LvmLogicalVolume)])
+
+    def test_that_logical_volume_contains_volume_group_name_and_size(self):
+        lv = self.of_type(LvmLogicalVolume)[0]
+        self.assertEqual(("backup", 21474836480), (lv.vg_name, lv.byte_size))
+
+    def test_that_logical_volume_contains_device_number(self):
+        self.assertEqual((252, 0), self.of_type(LvmLogicalVolume)[0].kernel_major_minor)
+
+class TestSysInfoLvmReportFallback(unittest.TestCase):
+    @patch("diskgraph.sysinfo.checker", checker_mock(True))
+    @patch("diskgraph.sysinfo.exec_cmd")
+    def test_that_separate_commands_are_used_if_fullreport_fails(self, exec_mock):
+        outputs = {"pvs": "  /dev/md0   1500310929408\n",
+                   "vgs": "  backup  1500310929408 /dev/md0 0\n",
+                   "lvs": "  homes   backup   21474836480\n"}
+        def run(args, **kwargs):
+            if args[0] == "lvm":
+                raise CalledProcessError(3, "lvm")
+            return outputs[args[0]]
+        exec_mock.side_effect = run
+        objects = LvmReport.generate()
+        self.assertEqual([LvmPhysicalVolume, LvmVolumeGroup, LvmLogicalVolume], [o.__class__ for o in objects])
+
+    @patch("diskgraph.sysinfo.checker", checker_mock(False))
+    @patch("diskgraph.sysinfo.exec_cmd")
+    def test_that_nothing_is_run_without_lvm_commands(self, exec_mock):
+        self.assertEqual([], LvmReport.generate())
+        self.assertFalse(exec_mock.called)
 
 class TestSysInfoLvmLogicalVolumeGeneration(unittest.TestCase):
     @patch("diskgraph.sysinfo.checker", checker_mock(True))
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def setUp(self, exec_mock):
         exec_mock.return_value = "  homes   backup   21474836480\n"
         self.lvs = LvmLogicalVolume.generate()
@@ -253,6 +425,26 @@ class TestPartition(unittest.TestCase):
         p = Partition("8 0 1000 sda".split(" "))
         self.assertTrue(p.is_disk())
 
+    def test_that_sd_with_two_letters_is_disk(self):
+        p = Partition("65 160 1000 sdaa".split(" "))
+        self.assertTrue(p.is_disk())
+
+    def test_that_partition_of_sd_with_two_letters_has_disk_name(self):
+        p = Partition("65 161 1000 sdaa1".split(" "))
+        self.assertEqual("sdaa", p.disk_name)
+
+    def test_that_virtual_and_nvme_disks_are_disks(self):
+        names = ["vda", "xvdb", "nvme0n1", "nvme10n2", "mmcblk0"]
+        self.assertEqual(names, [n for n in names if Partition(["0", "0", "1", n]).is_disk()])
+
+    def test_that_nvme_partition_has_disk_name(self):
+        p = Partition("259 1 1000 nvme0n1p1".split(" "))
+        self.assertEqual("nvme0n1", p.disk_name)
+
+    def test_that_dm_device_is_not_disk(self):
+        p = Partition("253 0 1000 dm-0".split(" "))
+        self.assertEqual((False, None), (p.is_disk(), p.disk_name))
+
     def test_that_hd_with_number_is_not_disk(self):
         p = Partition("3 1 1000 hda1".split(" "))
         self.assertFalse(p.is_disk())
@@ -267,6 +459,18 @@ class TestPartition(unittest.TestCase):
         p = Partition("8 17 1000 sdb1".split(" "))
         self.assertFalse(p.is_partition_for(d))
 
+    def test_that_classification_is_computed_on_construction(self):
+        p = Partition("8 1 1000 sda1".split(" "))
+        self.assertEqual((False, "sda"), (p.whole_disk, p.disk_name))
+
+    def test_that_non_disk_device_has_no_disk_name(self):
+        p = Partition("9 0 1000 md0".split(" "))
+        self.assertEqual((False, None), (p.whole_disk, p.disk_name))
+
+    def test_that_partition_parse_skips_header_and_blank_lines(self):
+        text = "major minor  #blocks  name\n\n   8        0  1000 sda\n   8        1  999 sda1\n\n"
+        self.assertEqual(["sda", "sda1"], [p.name for p in Partition.parse(text)])
+
     def test_that_partition_is_child_of_root_if_disk(self):
         r = Root()
         d = Partition("8 0 1000 sda".split(" "))
@@ -340,6 +544,20 @@ class LvmLogicalVolumeTest(unittest.TestCase):
         lv = LvmLogicalVolume("small test 1000".split(" "))
         self.assertFalse(lv.is_child_of(r))
 
+    def test_that_inactive_lv_has_no_device_number(self):
+        lv = LvmLogicalVolume("small test 1000 -1 -1".split(" "))
+        self.assertIsNone(lv.kernel_major_minor)
+
+class LvmLogicalVolumeMapperNameTest(unittest.TestCase):
+    def test_that_hyphens_are_doubled(self):
+        lv = LvmLogicalVolume(["my-lv", "my-vg", "1000"])
+        self.assertEqual("my--vg-my--lv", lv.mapper_name())
+
+    def test_that_mounted_fs_on_hyphenated_lv_is_child(self):
+        lv = LvmLogicalVolume(["my-lv", "my-vg", "1000"])
+        mfs = MountedFileSystem("/dev/mapper/my--vg-my--lv 1000 0 1000 0% /srv".split(" "))
+        self.assertTrue(mfs.is_child_of(lv))
+
 class RaidArrayTest(unittest.TestCase):
     def test_that_array_is_child_of_disk_among_names(self):
         d = Partition("8 0 1000 /dev/sda".split(" "))
@@ -358,17 +576,17 @@ class RaidArrayTest(unittest.TestCase):
 
 @patch("diskgraph.sysinfo.checker", checker_mock(False))
 class MissingFileOrCommandTest(unittest.TestCase):
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def test_that_no_lvm_physical_volumes_are_found_if_lvm_commands_dont_exist(self, co_mock):
         co_mock.side_effect = CalledProcessError(1, "pvs")
         self.assertEqual(0, len(LvmPhysicalVolume.generate()))
 
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def test_that_no_lvm_logical_volums_are_found_if_lvm_commands_dont_exist(self, co_mock):
         co_mock.side_effect = CalledProcessError(1, "lvs")
         self.assertEqual(0, len(LvmLogicalVolume.generate()))
 
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def test_that_no_lvm_volume_groups_are_found_if_lvm_commands_dont_exist(self, co_mock):
         co_mock.side_effect = CalledProcessError(1, "vgs")
         self.assertEqual(0, len(LvmVolumeGroup.generate()))
@@ -378,7 +596,7 @@ class MissingFileOrCommandTest(unittest.TestCase):
         open_mock.side_effect = IOError
         self.assertEqual(0, len(RaidArray.generate()))
 
-    @patch("subprocess.check_output")
+    @patch("diskgraph.sysinfo.exec_cmd")
     def test_that_no_mounted_fs_are_found_if_df_command_doesnt_exist(self, co_mock):
         co_mock.side_effect = CalledProcessError(1, "df")
         self.assertEqual(0, len(MountedFileSystem.generate()))
@@ -445,3 +663,148 @@ class TestToString(unittest.TestCase):
     def test_that_root_has_custom_tostring(self):
         r = Root()
         self.assertEqual("Root", str(r))
+
+    def test_that_label_is_computed_once(self):
+        disk = Partition("8 0 204800 sda".split(" "))
+        with patch.object(Partition, "label", return_value="cached") as label:
+            str(disk)
+            str(disk)
+        self.assertEqual(1, label.call_count)
+
+class TestCompactObjects(unittest.TestCase):
+    def test_that_objects_have_no_dict(self):
+        objects = [Root(), FreeSpace(1), Partition("8 0 1000 sda".split(" ")),
+                   LvmPhysicalVolume(["/dev/sda1", "1000"]), LvmVolumeGroup(["vg", "1000", ["/dev/sda1"], "0"]),
+                   LvmLogicalVolume(["lv", "vg", "1000"]), RaidArray((["md0", "sda1"], 1)),
+                   DeviceMapper("dm-0", "crypt", ["sda1"], 1000), SwapArea(["/dev/sda2", "partition", "1"]),
+                   MountedFileSystem("/dev/sda1 1000 0 1000 0% /".split(" "))]
+        self.assertEqual([], [o for o in objects if hasattr(o, "__dict__")])
+
+    def test_that_names_are_interned(self):
+        lv1 = LvmLogicalVolume(["lv1", "".join(["v", "g"]), "1000"])
+        lv2 = LvmLogicalVolume(["lv2", "".join(["v", "g"]), "1000"])
+        self.assertIs(lv1.vg_name, lv2.vg_name)
+
+    def test_that_name_lists_are_tuples(self):
+        vg = LvmVolumeGroup(["vg", "1000", ["/dev/sda1", "/dev/sdb1"], "0"])
+        self.assertEqual(("sda1", "sdb1"), vg.pv_names)
+
+class TestSysObjectIndex(unittest.TestCase):
+    def test_that_children_are_found_in_pool_order(self):
+        pool = [Partition("8 2 1000 sda2".split(" ")),
+                SwapArea("/dev/sda1 partition 1000 0 -1".split(" ")),
+                Partition("8 0 1000 sda".split(" ")),
+                Partition("8 1 1000 sda1".split(" "))]
+        index = SysObjectIndex(pool)
+        self.assertEqual([pool[0], pool[3]], index.children_of(pool[2]))
+
+    def test_that_child_filed_under_several_keys_is_found_once(self):
+        disk = Partition("8 0 1000 sda".split(" "))
+        r = RaidArray(("md0 sda sda".split(" "), 1000))
+        index = SysObjectIndex([disk, r])
+        self.assertEqual([r], index.children_of(disk))
+
+    def test_that_expand_accepts_index(self):
+        pool = [Partition("8 0 1000 sda".split(" ")), Partition("8 1 1000 sda1".split(" "))]
+        self.assertEqual(pool[0].expand(pool), pool[0].expand(SysObjectIndex(pool)))
+
+class FakeCollector(object):
+    def __init__(self, name, objects, delay=0, event=None):
+        self.__name__ = name
+        self.objects = objects
+        self.delay = delay
+        self.event = event
+
+    def generate(self):
+        if self.event:
+            self.event.wait()
+        time.sleep(self.delay)
+        return self.objects
+
+class TestSysInfoCollection(unittest.TestCase):
+    def setUp(self):
+        self.hang = threading.Event()
+
+    def tearDown(self):
+        self.hang.set()
+
+    def test_that_objects_are_collected_in_collector_order(self):
+        a, b = Root(), Root()
+        si = SysInfo([FakeCollector("a", [a], 0.05), FakeCollector("b", [b])])
+        self.assertEqual([a, b], si.objects)
+
+    def test_that_collectors_run_concurrently(self):
+        start = time.time()
+        SysInfo([FakeCollector(str(i), [], 0.2) for i in range(4)])
+        self.assertTrue(time.time() - start < 0.6)
+
+    def test_that_hung_collector_is_reported_as_missing(self):
+        p = Partition("8 0 1000 sda".split(" "))
+        si = SysInfo([FakeCollector("hung", [], event=self.hang), FakeCollector("ok", [p])], timeout=0.1)
+        self.assertEqual(["hung"], si.missing)
+
+    def test_that_objects_from_other_collectors_survive_hung_collector(self):
+        p = Partition("8 0 1000 sda".split(" "))
+        si = SysInfo([FakeCollector("hung", [], event=self.hang), FakeCollector("ok", [p])], timeout=0.1)
+        self.assertEqual([p], si.objects)
+
+    def test_that_failed_collector_is_reported_as_missing(self):
+        p = Partition("8 0 1000 sda".split(" "))
+        c = FakeCollector("bad", [])
+        c.generate = Mock(side_effect=CalledProcessError(1, "lvs"))
+        si = SysInfo([c, FakeCollector("ok", [p])])
+        self.assertEqual((["bad"], [p]), (si.missing, si.objects))
+        self.assertIsInstance(si.errors["bad"], CalledProcessError)
+
+    def test_that_hung_command_is_killed_at_deadline(self):
+        c = FakeCollector("hung", [])
+        c.generate = lambda: exec_cmd(["sleep", "10"])
+        start = time.time()
+        si = SysInfo([c], timeout=0.2)
+        # the command is killed rather than left running, so the collector fails
+        self.assertEqual(["hung"], si.missing)
+        self.assertLess(time.time() - start, 5)
+
+class TestExecCmd(unittest.TestCase):
+    def test_that_output_is_returned(self):
+        self.assertEqual("hello\n", exec_cmd(["echo", "hello"]))
+
+    def test_that_failing_command_raises(self):
+        self.assertRaises(CalledProcessError, exec_cmd, ["false"])
+
+    def test_that_command_is_killed_after_timeout(self):
+        start = time.time()
+        self.assertRaises(CalledProcessError, exec_cmd, ["sleep", "10"], timeout=0.1)
+        self.assertLess(time.time() - start, 5)
+
+class TestIdentity(unittest.TestCase):
+    def test_that_identity_is_type_and_name(self):
+        self.assertEqual(("Partition", "sda"), Partition("8 0 1000 sda".split(" ")).identity)
+
+    def test_that_logical_volume_identity_includes_volume_group(self):
+        self.assertEqual(("LvmLogicalVolume", ("test", "small")), LvmLogicalVolume("small test 1000".split(" ")).identity)
+
+    def test_that_free_space_identity_includes_owner(self):
+        disk = Partition("8 0 1000 sda".split(" "))
+        self.assertEqual(("FreeSpace", ("Partition", "sda")), FreeSpace(1000, disk).identity)
+
+    def test_that_same_entity_has_same_identity_in_different_snapshots(self):
+        a = LvmVolumeGroup(["test", "1000", ["/dev/sda"], "0"])
+        b = LvmVolumeGroup(["test", "2000", ["/dev/sda"], "0"])
+        self.assertEqual(a.identity, b.identity)
+
+class TestDiffObjects(unittest.TestCase):
+    def setUp(self):
+        self.old = [Partition("8 0 1000 sda".split(" ")), Partition("8 1 1000 sda1".split(" ")),
+                    LvmLogicalVolume("small test 1000".split(" "))]
+        self.new = [Partition("8 0 1000 sda".split(" ")), Partition("8 2 1000 sda2".split(" ")),
+                    LvmLogicalVolume("small test 2000".split(" "))]
+
+    def test_that_added_objects_are_found(self):
+        self.assertEqual([self.new[1]], diff_objects(self.old, self.new)[0])
+
+    def test_that_removed_objects_are_found(self):
+        self.assertEqual([self.old[1]], diff_objects(self.old, self.new)[1])
+
+    def test_that_changed_objects_are_found(self):
+        self.assertEqual([(self.old[2], self.new[2])], diff_objects(self.old, self.new)[2])
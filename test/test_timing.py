@@ -0,0 +1,100 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from diskgraph.timing import Profiler, profiler, NULL_TIMER
+from diskgraph.sysinfo import SysInfo, Partition
+from diskgraph.diskgraph import DiskGraph
+
+class FakeCollector(object):
+    __name__ = "Fake"
+
+    def generate(self):
+        return [Partition("8 0 1000 sda".split(" ")), Partition("8 1 1000 sda1".split(" "))]
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def test_that_disabled_profiler_returns_null_timer(self):
+        self.assertIs(NULL_TIMER, self.profiler.timer("build"))
+
+    def test_that_disabled_profiler_records_nothing(self):
+        with self.profiler.timer("build"):
+            pass
+        self.profiler.count("edges", 1)
+        self.assertEqual(({}, {}), (self.profiler.timings, self.profiler.counts))
+
+    def test_that_enabled_profiler_records_each_call(self):
+        self.profiler.enable()
+        for _ in range(2):
+            with self.profiler.timer("build"):
+                pass
+        self.assertEqual(2, self.profiler.report()["timings"]["build"]["calls"])
+
+    def test_that_total_min_and_max_are_reported(self):
+        self.profiler.enable()
+        for seconds in (2, 1, 3):
+            self.profiler.record("build", seconds)
+        figures = self.profiler.report()["timings"]["build"]
+        self.assertEqual((3, 6, 1, 3), (figures["calls"], figures["total"], figures["min"], figures["max"]))
+
+    def test_that_time_is_recorded_when_block_raises(self):
+        self.profiler.enable()
+        try:
+            with self.profiler.timer("build"):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertIn("build", self.profiler.timings)
+
+    def test_that_counts_are_reported(self):
+        self.profiler.enable()
+        self.profiler.count("edges", 42)
+        self.assertEqual({"edges": 42}, self.profiler.report()["counts"])
+
+class TestProfilerSave(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_that_report_is_saved_as_json(self):
+        p = Profiler()
+        p.enable()
+        with p.timer("render"):
+            pass
+        fn = os.path.join(self.dir, "profile.json")
+        p.save(fn)
+        with open(fn) as fd:
+            self.assertIn("render", json.load(fd)["timings"])
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        profiler.reset()
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.reset()
+
+    def test_that_each_collector_is_timed(self):
+        SysInfo([FakeCollector()])
+        self.assertIn("collect.Fake", profiler.timings)
+
+    def test_that_object_count_is_recorded(self):
+        SysInfo([FakeCollector()])
+        self.assertEqual(2, profiler.counts["objects"])
+
+    def test_that_graph_build_is_timed(self):
+        DiskGraph(SysInfo([FakeCollector()]))
+        self.assertIn("build", profiler.timings)
+
+    def test_that_edge_count_is_recorded(self):
+        DiskGraph(SysInfo([FakeCollector()]))
+        self.assertEqual(2, profiler.counts["edges"])
+
+    def test_that_dot_generation_is_timed(self):
+        DiskGraph(SysInfo([FakeCollector()])).dottext()
+        self.assertIn("dot", profiler.timings)
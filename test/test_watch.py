@@ -0,0 +1,84 @@
+import unittest
+from mock import patch
+from subprocess import CalledProcessError
+from diskgraph.watch import Watcher, signals_for, file_signal, SIGNALS
+
+class FakeSignal(object):
+    """Signal that returns the given values in turn, repeating the last one."""
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        if len(self.values) > 1:
+            return self.values.pop(0)
+        return self.values[0]
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+
+    def watcher(self, *signals):
+        return Watcher(list(signals), interval=10, debounce=2, sleep=self.sleeps.append)
+
+    def test_that_first_change_is_reported_at_start(self):
+        changes = self.watcher(FakeSignal("a")).changes()
+        next(changes)
+        self.assertEqual([], self.sleeps)
+
+    def test_that_change_is_reported_once_settled(self):
+        changes = self.watcher(FakeSignal("a", "a", "b")).changes()
+        next(changes)
+        next(changes)
+        self.assertEqual([10, 10, 2], self.sleeps)
+
+    def test_that_burst_of_changes_is_reported_once(self):
+        signal = FakeSignal("a", "b", "c", "d", "d", "d", "e")
+        changes = self.watcher(signal).changes()
+        next(changes)
+        next(changes)
+        self.assertEqual([10, 2, 2, 2], self.sleeps)
+        self.assertEqual("d", signal())
+
+    def test_that_any_signal_can_trigger_a_change(self):
+        changes = self.watcher(FakeSignal("a"), FakeSignal("x", "y")).changes()
+        next(changes)
+        next(changes)
+        self.assertEqual([10, 2], self.sleeps)
+
+    def test_that_ticks_come_every_interval_with_whether_signals_changed(self):
+        ticks = self.watcher(FakeSignal("a", "a", "b")).ticks()
+        self.assertEqual([True, False, True], [next(ticks), next(ticks), next(ticks)])
+        self.assertEqual([10, 10, 2], self.sleeps)
+
+class TestSignals(unittest.TestCase):
+    def test_that_signals_are_looked_up_by_name(self):
+        self.assertEqual([SIGNALS["mdstat"], SIGNALS["lvm"]], signals_for(["mdstat", "lvm"]))
+
+    def test_that_unknown_signal_is_rejected(self):
+        self.assertRaises(ValueError, signals_for, ["nope"])
+
+    @patch("diskgraph.watch.open", create=True)
+    def test_that_ignored_lines_are_left_out(self, open_mock):
+        handle = open_mock.return_value.__enter__.return_value
+        handle.read.return_value = "md1 : active raid1\n[==>...]  resync = 12.6% finish=20.1min\n"
+        self.assertEqual("md1 : active raid1\n", file_signal("/proc/mdstat", ignore="finish=")())
+
+    @patch("diskgraph.watch.open", create=True)
+    def test_that_missing_file_gives_no_value(self, open_mock):
+        open_mock.side_effect = IOError
+        self.assertEqual(None, file_signal("/proc/swaps")())
+
+    @patch("diskgraph.watch.checker")
+    @patch("diskgraph.watch.exec_cmd")
+    def test_that_vgs_is_run_with_a_timeout(self, exec_mock, checker_mock):
+        checker_mock.has_lvm_commands.return_value = True
+        exec_mock.return_value = "  vg 7\n"
+        self.assertEqual("  vg 7\n", SIGNALS["lvm"]())
+        self.assertIsNotNone(exec_mock.call_args[1].get("timeout"))
+
+    @patch("diskgraph.watch.checker")
+    @patch("diskgraph.watch.exec_cmd")
+    def test_that_killed_vgs_gives_no_value(self, exec_mock, checker_mock):
+        checker_mock.has_lvm_commands.return_value = True
+        exec_mock.side_effect = CalledProcessError(-9, "vgs")
+        self.assertEqual(None, SIGNALS["lvm"]())